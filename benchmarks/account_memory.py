@@ -0,0 +1,121 @@
+"""
+Measures the memory and throughput of Cycle.verify_accounts for large amounts
+of synthetic accounts on SQLite. API calls are replaced by an update that only
+reschedules the account, so the numbers show the database side of the cycle.
+Tracing the memory slows the cycle down, --no-trace measures the throughput only.
+
+Usage: python -m benchmarks.account_memory [--accounts 10000 100000 1000000]
+                                           [--unbatched] [--no-trace]
+"""
+
+import argparse
+import datetime
+import logging
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from ts3bot.config import env
+from ts3bot.cycle import Cycle
+from ts3bot.database import create_session, enums, models
+from ts3bot.database.unit_of_work import commit
+
+
+async def update(account: models.Account, session: Session) -> None:
+    """Stands in for Account.update_async, commits like it"""
+
+    account.last_check = datetime.datetime.now()
+    account.next_check_at = account.last_check + datetime.timedelta(days=1)
+    commit(session)
+
+
+def populate(session: Session, amount: int, chunk: int = 50000) -> None:
+    worlds = list(enums.World)
+    last_check = datetime.datetime(2020, 1, 1)
+    for offset in range(0, amount, chunk):
+        session.execute(
+            insert(models.Account.__table__),
+            [
+                {
+                    "name": f"User.{idx:07d}",
+                    "world": worlds[idx % len(worlds)],
+                    "api_key": f"{idx:072d}",
+                    "is_valid": True,
+                    "retries": 0,
+                    "last_check": last_check,
+                    "next_check_at": last_check,
+                    "created_at": last_check,
+                }
+                for idx in range(offset, min(offset + chunk, amount))
+            ],
+        )
+    session.commit()
+
+
+def run(amount: int, batch_size: int, trace: bool) -> tuple[float, float]:
+    """
+    Checks all accounts once
+
+    :return: Peak of traced memory in MiB (0 if not traced) and accounts per second
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        session = create_session(f"sqlite:///{Path(tmp) / 'bot.db'}", is_test=True)
+
+        # Durability does not matter here, fsyncs would dominate the numbers
+        @event.listens_for(session.get_bind(), "connect")
+        def no_sync(connection: Any, _: Any) -> None:
+            connection.execute("PRAGMA synchronous=OFF")
+
+        populate(session, amount)
+        session.expunge_all()
+
+        cycle = Cycle(
+            session,
+            verify_all=True,
+            verify_linked_worlds=False,
+            verify_ts3=False,
+            connect=False,
+        )
+        with patch.object(models.Account, "update_async", new=update), patch.object(
+            env, "cycle_batch_size", batch_size
+        ):
+            if trace:
+                tracemalloc.start()
+            start = time.perf_counter()
+            cycle.verify_accounts()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        session.close()
+    return peak / 2**20, amount / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("benchmarks.account_memory")
+    parser.add_argument(
+        "--accounts", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--batch-size", type=int, default=env.cycle_batch_size)
+    parser.add_argument(
+        "--unbatched",
+        help="Also load all accounts at once for comparison",
+        action="store_true",
+    )
+    parser.add_argument("--no-trace", action="store_true")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    env.cycle_nickname = env.cycle_username = env.cycle_password = "benchmark"
+
+    print(f"{'accounts':>10} {'batch size':>10} {'peak MiB':>10} {'accounts/s':>10}")
+    for amount in args.accounts:
+        for batch_size in [args.batch_size] + ([amount] if args.unbatched else []):
+            peak, rate = run(amount, batch_size, not args.no_trace)
+            print(f"{amount:>10} {batch_size:>10} {peak:>10.1f} {rate:>10.0f}")
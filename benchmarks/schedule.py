@@ -0,0 +1,106 @@
+"""
+Simulates the cycle's account checks and compares the fixed schedule
+(every cycle_hours) with the adaptive one of Account.schedule().
+
+Usage: python -m benchmarks.schedule [--accounts 10000] [--days 90]
+"""
+
+import argparse
+import random
+import statistics
+from collections.abc import Callable
+
+from ts3bot.config import env
+from ts3bot.database.models import Account
+
+# Returns the hours until the next check, given the hours since the last change
+Schedule = Callable[[float], float]
+
+
+def changes(rng: random.Random, mean_days: float, hours: float) -> list[float]:
+    """Points in time at which an account transfers or changes its guilds"""
+
+    result: list[float] = []
+    t = rng.expovariate(1 / (mean_days * 24))
+    while t < hours:
+        result.append(t)
+        t += rng.expovariate(1 / (mean_days * 24))
+    return result
+
+
+def simulate(
+    schedule: Schedule, timeline: list[tuple[float, list[float]]], hours: float
+) -> tuple[int, list[float]]:
+    """
+    :param timeline: Per account, hours since its last change at the start and
+                     the points in time of its changes
+    :return: Amount of checks and the delays until each change was noticed
+    """
+    checks = 0
+    delays: list[float] = []
+    for stable_hours, account_changes in timeline:
+        last_change = -stable_hours
+        pending = list(account_changes)
+
+        t = 0.0
+        while t < hours:
+            checks += 1
+
+            # Changes since the previous check are noticed now
+            noticed = [c for c in pending if c <= t]
+            if noticed:
+                delays.extend(t - c for c in noticed)
+                pending = pending[len(noticed) :]
+                last_change = t
+
+            t += schedule(t - last_change)
+
+    return checks, delays
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("benchmarks.schedule")
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument(
+        "--volatile",
+        help="Share of accounts that change often",
+        type=float,
+        default=0.1,
+    )
+    parser.add_argument(
+        "--volatile-days", help="Mean days between changes", type=float, default=7
+    )
+    parser.add_argument(
+        "--stable-days", help="Mean days between changes", type=float, default=365
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    hours = args.days * 24.0
+    timeline = []
+    for _ in range(args.accounts):
+        mean_days = (
+            args.volatile_days if rng.random() < args.volatile else args.stable_days
+        )
+        # Hours since the last change when the simulation starts
+        stable_hours = rng.expovariate(1 / (mean_days * 24))
+        timeline.append((stable_hours, changes(rng, mean_days, hours)))
+
+    print(
+        f"{args.accounts} accounts over {args.days} days, "
+        f"{args.volatile:.0%} change every {args.volatile_days:g} days, "
+        f"the others every {args.stable_days:g} days"
+    )
+    print(f"{'schedule':<10} {'calls/day':>10} {'delay avg':>10} {'delay p95':>10}")
+    for name, schedule in [
+        ("fixed", lambda _: env.cycle_hours),
+        ("adaptive", Account.check_interval),
+    ]:
+        checks, delays = simulate(schedule, timeline, hours)
+        p95 = statistics.quantiles(delays, n=20)[-1] if len(delays) > 1 else 0.0
+        print(
+            f"{name:<10} {checks / args.days:>10.0f} "
+            f"{statistics.fmean(delays) if delays else 0:>9.1f}h {p95:>9.1f}h"
+        )
@@ -0,0 +1,134 @@
+"""
+Measures Cycle.verify_accounts throughput against the local stand-in API.
+
+Usage: python -m benchmarks.verify_accounts [--accounts 300] [--latency 0.25]
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from test.api_server import LATENCIES, ApiServer, Dataset
+
+import ts3bot
+from ts3bot.account_cache import AccountCache
+from ts3bot.api_client import ApiClient
+from ts3bot.cache import ResponseCache
+from ts3bot.circuit_breaker import CircuitBreaker
+from ts3bot.config import env
+from ts3bot.cycle import Cycle
+from ts3bot.database import create_session, enums, models
+from ts3bot.group_registry import GroupRegistry
+from ts3bot.negative_cache import NegativeCache
+from ts3bot.ratelimit import TokenBucket
+
+
+def run(server: ApiServer, concurrency: int, burst: bool) -> float:
+    """Verifies all accounts once and returns the accounts per minute"""
+
+    session = create_session("sqlite://", is_test=True)
+    for api_key, account in server.dataset.accounts.items():
+        session.add(
+            models.Account(
+                name=account["name"],
+                world=enums.World(account["world"]),
+                api_key=api_key,
+                last_check=datetime(2020, 1, 1),
+            )
+        )
+    session.commit()
+
+    # Every level starts from scratch, so that earlier levels can't make it
+    # cheaper: empty caches, a new rate limit bucket, a closed circuit, a pool
+    # sized to the level and an empty rate limit window on the server.
+    # Nothing is written to ./data.
+    server.reset_limit()
+    ts3bot.accounts = AccountCache(env.account_cache_size, env.account_cache_seconds)
+    ts3bot.managed_groups = GroupRegistry()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ts3bot.api = ApiClient(
+            server.base_url,
+            rate_limiter=TokenBucket(
+                Path(tmp) / "bucket.json", env.api_rate_limit, env.api_rate_period
+            ),
+            cache=ResponseCache(env.api_cache_ttls, env.api_cache_size),
+            pool_size=concurrency,
+            connect_timeout=env.api_connect_timeout,
+            read_timeout=env.api_read_timeout,
+            breaker=CircuitBreaker(
+                env.api_circuit_threshold,
+                env.api_circuit_cooldown,
+                env.api_circuit_max_cooldown,
+            ),
+            retry_base=env.api_retry_base,
+            retry_max=env.api_retry_max,
+            negative_cache=NegativeCache(
+                env.api_negative_cache_ttl, env.api_negative_cache_size
+            ),
+        )
+        # Measure the sustainable rate instead of the initial burst
+        if not burst:
+            ts3bot.api.rate_limiter.drain()
+
+        cycle = Cycle(
+            session,
+            verify_all=True,
+            verify_linked_worlds=False,
+            verify_ts3=False,
+            concurrency=concurrency,
+            connect=False,
+        )
+
+        start = time.perf_counter()
+        cycle.verify_accounts()
+        elapsed = time.perf_counter() - start
+
+    session.close()
+    return len(server.dataset.accounts) / elapsed * 60
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("benchmarks.verify_accounts")
+    parser.add_argument("--accounts", type=int, default=300)
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.25)
+    parser.add_argument(
+        "--latency-distribution", choices=list(LATENCIES), default="constant"
+    )
+    parser.add_argument(
+        "--error-rate", help="Share of 502 responses", type=float, default=0.0
+    )
+    parser.add_argument(
+        "--bad-data-rate", help="Share of ErrBadData responses", type=float, default=0.0
+    )
+    parser.add_argument(
+        "--rate-limit", help="Requests per minute the API allows", type=int, default=600
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument(
+        "--burst", help="Start with a full rate limit bucket", action="store_true"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    env.cycle_nickname = env.cycle_username = env.cycle_password = "benchmark"
+
+    with ApiServer(
+        Dataset(args.accounts, args.guilds),
+        LATENCIES[args.latency_distribution](args.latency),
+        error_rate=args.error_rate,
+        bad_data_rate=args.bad_data_rate,
+        rate_limit=args.rate_limit,
+    ) as api:
+        print(
+            f"{args.accounts} accounts, {args.latency * 1000:.0f}ms "
+            f"{args.latency_distribution} latency, "
+            f"limit {env.api_rate_limit}/{env.api_rate_period:.0f}s"
+        )
+        for _concurrency in args.concurrency:
+            rate = run(api, _concurrency, args.burst)
+            print(f"concurrency {_concurrency:>3}: {rate:8.1f} accounts/min")
+        print(f"responses: {dict(sorted(api.statuses.items()))}")
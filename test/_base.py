@@ -1,13 +1,21 @@
 import logging
+import tempfile
 import unittest
+from pathlib import Path
 from typing import Any, cast
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import requests_mock  # type: ignore
 
 import ts3bot
+from ts3bot.account_cache import AccountCache
 from ts3bot.bot import Bot
+from ts3bot.cache import ResponseCache
+from ts3bot.config import env
 from ts3bot.database import create_session, enums, models
+from ts3bot.group_registry import GroupRegistry
+from ts3bot.negative_cache import NegativeCache
+from ts3bot.ratelimit import TokenBucket
 from ts3bot.utils import init_logger
 
 from . import sample_data
@@ -56,6 +64,24 @@ class BaseTest(unittest.TestCase):
         self.bot = Bot(self.session, connect=False)
         self.bot.send_message = MagicMock()  # type: ignore
 
+        # Start every test with a private budget and empty, memory-only caches,
+        # a live bot on this host must not be affected
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ts3bot.api.rate_limiter = TokenBucket(
+            Path(tmp.name) / "api_ratelimit.json",
+            env.api_rate_limit,
+            env.api_rate_period,
+        )
+        ts3bot.api.cache = ResponseCache(env.api_cache_ttls, env.api_cache_size)
+        ts3bot.api.negative_cache = NegativeCache(
+            env.api_negative_cache_ttl, env.api_negative_cache_size
+        )
+        ts3bot.managed_groups = GroupRegistry()
+        ts3bot.accounts = AccountCache(
+            env.account_cache_size, env.account_cache_seconds
+        )
+
         # Insert relevant server group
         self.session.add(
             models.WorldGroup(
@@ -90,6 +116,22 @@ class BaseTest(unittest.TestCase):
 
         self.bot.exec_ = mocker  # type: ignore
 
+    def patch_cycle_credentials(self, **settings: Any) -> None:
+        """
+        Lets a Cycle log in with its own query client for the rest of the test
+
+        :param settings: Further settings to patch
+        """
+        patcher = patch.multiple(
+            env,
+            cycle_nickname="cycle",
+            cycle_username="cycle",
+            cycle_password="cycle",
+            **settings,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @classmethod
     def setUpClass(cls) -> None:
         # Set up logger
@@ -97,8 +139,8 @@ class BaseTest(unittest.TestCase):
 
         requests_mock.mock.case_sensitive = True
         cls.adapter = requests_mock.Adapter(case_sensitive=True)
-        ts3bot.session.mount("http://", cls.adapter)
-        ts3bot.session.mount("https://", cls.adapter)
+        ts3bot.api.session.mount("http://", cls.adapter)
+        ts3bot.api.session.mount("https://", cls.adapter)
 
         # Register commonly used URI
         cls.adapter.register_uri(
@@ -0,0 +1,232 @@
+"""
+Local stand-in for the GW2 API, used by benchmarks and integration tests that
+should not hit the real API.
+"""
+
+import collections
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+WORLDS = [2201, 2202, 2203, 2204, 2205, 2206, 2207]
+
+# Returns the delay of a single response in seconds
+Latency = Callable[[random.Random], float]
+
+
+def constant(seconds: float) -> Latency:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Latency:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5) -> Latency:
+    """Long-tailed latency, most responses are close to the median"""
+
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+LATENCIES: dict[str, Callable[[float], Latency]] = {
+    "constant": constant,
+    "uniform": lambda median: uniform(0, 2 * median),
+    "lognormal": lognormal,
+}
+
+
+class Dataset:
+    """Generated accounts and guilds, accounts are looked up by their API key"""
+
+    def __init__(self, accounts: int, guilds: int, seed: int = 0) -> None:
+        rng = random.Random(seed)
+
+        self.guilds: dict[str, dict[str, Any]] = {}
+        for idx in range(guilds):
+            guid = str(uuid.UUID(int=rng.getrandbits(128)))
+            self.guilds[guid] = {"id": guid, "name": f"Guild {idx}", "tag": f"G{idx}"}
+
+        guids = list(self.guilds)
+        self.accounts: dict[str, dict[str, Any]] = {}
+        self.tokens: dict[str, dict[str, Any]] = {}
+        for idx in range(accounts):
+            api_key = self.api_key(idx)
+            account_guilds = rng.sample(guids, k=min(len(guids), rng.randint(0, 5)))
+            self.accounts[api_key] = {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))).upper(),
+                "name": f"User.{idx:04d}",
+                "world": rng.choice(WORLDS),
+                "guilds": account_guilds,
+                "guild_leader": account_guilds[:1],
+            }
+            self.tokens[api_key] = {
+                "id": api_key[:36],
+                "name": f"ts3bot-{idx}",
+                "permissions": ["account", "progression"],
+            }
+
+    @staticmethod
+    def api_key(idx: int) -> str:
+        """Returns a well-formed API key for the account at idx"""
+
+        raw = f"{idx:064X}"
+        return (
+            f"{raw[:8]}-{raw[8:12]}-{raw[12:16]}-{raw[16:20]}-{raw[20:40]}"
+            f"-{raw[40:44]}-{raw[44:48]}-{raw[48:52]}-{raw[52:64]}"
+        )
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops concurrent connection attempts, which are
+    # then retried after a second
+    request_queue_size = 128
+
+
+class ApiServer:
+    def __init__(  # noqa: PLR0913
+        self,
+        dataset: Dataset,
+        latency: float | Latency = 0.0,
+        error_rate: float = 0.0,
+        bad_data_rate: float = 0.0,
+        rate_limit: int | None = 600,
+        rate_period: float = 60,
+        seed: int = 0,
+    ) -> None:
+        """
+        :param dataset: The data that should be served
+        :param latency: Seconds each response is delayed by, or a distribution
+        :param error_rate: Share of requests that fail with a 502
+        :param bad_data_rate: Share of requests that fail with ErrBadData
+        :param rate_limit: Requests per period before responding with 429, None
+                           disables the limit
+        :param rate_period: Seconds of the sliding rate limit window
+        :param seed: Seed for latencies and errors
+        """
+        self.dataset = dataset
+        self.latency = (
+            constant(latency) if isinstance(latency, float | int) else latency
+        )
+        self.error_rate = error_rate
+        self.bad_data_rate = bad_data_rate
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+
+        self.requests = 0
+        self.statuses: collections.Counter[int] = collections.Counter()
+        self._rng = random.Random(seed)
+        self._window: collections.deque[float] = collections.deque()
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                with server._lock:
+                    server.requests += 1
+                    delay = server.latency(server._rng)
+                if delay > 0:
+                    time.sleep(delay)
+
+                status, body, headers = server.respond(
+                    self.path, self.headers.get("Authorization", "")
+                )
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.httpd = _Server(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v2"
+
+    def limit(self) -> float | None:
+        """
+        Counts a request against the sliding window
+
+        :return: Seconds until the next request is allowed, None if this one is
+        """
+        if self.rate_limit is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            while self._window and self._window[0] <= now - self.rate_period:
+                self._window.popleft()
+
+            if len(self._window) >= self.rate_limit:
+                return self._window[0] + self.rate_period - now
+            self._window.append(now)
+            return None
+
+    def respond(self, path: str, authorization: str) -> tuple[int, Any, dict[str, str]]:
+        status, body, headers = self._respond(path, authorization)
+        with self._lock:
+            self.statuses[status] += 1
+        return status, body, headers
+
+    def _respond(  # noqa: PLR0911
+        self, path: str, authorization: str
+    ) -> tuple[int, Any, dict[str, str]]:
+        path = path.split("?", 1)[0]
+
+        if (retry_after := self.limit()) is not None:
+            return (
+                429,
+                {"text": "too many requests"},
+                {"Retry-After": str(math.ceil(retry_after))},
+            )
+
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            return 502, {"text": "Bad Gateway"}, {}
+        elif roll < self.error_rate + self.bad_data_rate:
+            return 400, {"text": "ErrBadData"}, {}
+
+        api_key = authorization.removeprefix("Bearer ")
+        if path in ("/v2/account", "/v2/tokeninfo"):
+            data = (
+                self.dataset.accounts if path == "/v2/account" else self.dataset.tokens
+            )
+            if api_key not in data:
+                return 401, {"text": "Invalid access token"}, {}
+            return 200, data[api_key], {}
+        elif path.startswith("/v2/guild/"):
+            guild = self.dataset.guilds.get(path.removeprefix("/v2/guild/"))
+            if not guild:
+                return 404, {"text": "no such id"}, {}
+            return 200, guild, {}
+
+        return 404, {"text": "not found"}, {}
+
+    def reset_limit(self) -> None:
+        """Forgets the requests counted against the rate limit"""
+
+        with self._lock:
+            self._window.clear()
+
+    def __enter__(self) -> "ApiServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
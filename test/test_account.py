@@ -0,0 +1,203 @@
+import asyncio
+import datetime
+
+from sqlalchemy import event
+
+import ts3bot
+from ts3bot.cache import ResponseCache
+from ts3bot.config import env
+from ts3bot.database import enums, models
+from ts3bot.database.models.account import AccountUpdateDict
+
+from ._base import BaseTest, sample_data
+
+
+class AccountUpdateTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.account = models.Account(
+            name="User.1234",
+            world=enums.World.RIVERSIDE,
+            api_key=sample_data.API_KEY_VALID,
+            last_check=datetime.datetime(2020, 1, 1, 0, 0, 0, 0),
+        )
+        self.session.add(self.account)
+        self.session.commit()
+
+    def test_update_async(self) -> None:
+        result = asyncio.run(self.account.update_async(self.session))
+
+        self.assertEqual(
+            result["transfer"], [enums.World.RIVERSIDE, enums.World.KODASH]
+        )
+        self.assertEqual(result["guilds"], (["ArenaNet"], []))
+        self.assertEqual(self.account.world, enums.World.KODASH)
+        self.assertGreater(self.account.last_check, datetime.datetime(2020, 1, 2))
+
+    def test_update_async_guilds(self) -> None:
+        # Unknown guilds are requested once, even without caching their details
+        ts3bot.api.cache = ResponseCache({}, env.api_cache_size)
+        history = self.adapter.request_history
+        start = len(history)
+
+        result = asyncio.run(self.account.update_async(self.session))
+
+        self.assertEqual(result["guilds"], (["ArenaNet"], []))
+        self.assertEqual(
+            [request.path for request in history[start:]],
+            ["/v2/account", "/v2/guild/4BBB52AA-D768-4FC6-8EDE-C299F2822F0F"],
+        )
+
+    def update_guilds(self, amount: int) -> tuple[list[str], int]:
+        """
+        Links the account to amount guilds, then updates it so that it left
+        one, joined one and lost the lead of one of the others
+
+        :return: Current leader GUIDs and the amount of statements of the update
+        """
+        guilds = [
+            models.Guild(guid=f"guild-{amount}-{idx}", name=f"Guild {idx}", tag="G")
+            for idx in range(amount + 1)
+        ]
+        self.session.query(models.LinkAccountGuild).delete()
+        for guild in guilds[:amount]:
+            self.session.add(
+                models.LinkAccountGuild(
+                    account=self.account, guild=guild, is_leader=True
+                )
+            )
+        self.session.add(guilds[amount])
+        self.account.guid = "guid"
+        self.session.commit()
+
+        statements: list[str] = []
+
+        def count(*args: object) -> None:
+            statements.append(str(args[2]))
+
+        guids = [g.guid for g in guilds]
+        event.listen(self.session.get_bind(), "before_cursor_execute", count)
+        result = self.account.update(
+            self.session,
+            account_info={
+                "world": enums.World.RIVERSIDE.value,
+                "name": self.account.name,
+                "guilds": guids[1:],
+                "guild_leader": guids[2:],
+            },
+        )
+        event.remove(self.session.get_bind(), "before_cursor_execute", count)
+
+        self.assertEqual(result["guilds"], ([f"Guild {amount}"], ["Guild 0"]))
+        leaders = [
+            link.guild.guid
+            for link in self.account.guilds
+            if link.is_leader  # type: ignore
+        ]
+        return leaders, len(statements)
+
+    def test_update_guilds(self) -> None:
+        leaders, few = self.update_guilds(3)
+        self.assertEqual(leaders, ["guild-3-2", "guild-3-3"])
+
+        # The amount of statements does not depend on the amount of guilds
+        leaders, many = self.update_guilds(30)
+        self.assertEqual(len(leaders), 29)
+        self.assertNotIn("guild-30-1", leaders)
+        self.assertEqual(few, many)
+
+    def test_schedule(self) -> None:
+        now = datetime.datetime(2020, 6, 1)
+        unchanged = AccountUpdateDict(transfer=[], guilds=([], []))
+
+        # Stable for a long time, checked rarely
+        self.account.created_at = datetime.datetime(2019, 1, 1)
+        self.account.schedule(unchanged, now)
+        self.assertEqual(
+            self.account.next_check_at,
+            now + datetime.timedelta(hours=env.cycle_max_hours),
+        )
+
+        # Changed just now, checked soon
+        self.account.schedule(
+            AccountUpdateDict(transfer=[], guilds=(["Guild"], [])), now
+        )
+        self.assertEqual(self.account.last_change_at, now)
+        self.assertEqual(
+            self.account.next_check_at,
+            now + datetime.timedelta(hours=env.cycle_min_hours),
+        )
+
+        # Stable in between
+        later = now + datetime.timedelta(days=8)
+        self.account.schedule(unchanged, later)
+        self.assertEqual(
+            self.account.next_check_at,
+            later + datetime.timedelta(hours=8 * 24 * env.cycle_stability_factor),
+        )
+
+    def test_schedule_created(self) -> None:
+        # New accounts were just fetched and are not due right away
+        account = models.Account.create(
+            {"id": "guid", "name": "User.5678", "world": enums.World.KODASH.value},
+            sample_data.API_KEY_VALID,
+        )
+        self.assertEqual(
+            account.next_check_at - account.last_check,
+            datetime.timedelta(hours=env.cycle_min_hours),
+        )
+
+
+class AccountResolveTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+
+        guild = models.Guild(guid="abc", name="Guild", tag="G", group_id=100)
+        for idx, world in enumerate([enums.World.KODASH, enums.World.RIVERSIDE]):
+            account = models.Account(
+                name=f"User.{idx}",
+                world=world,
+                api_key=sample_data.API_KEY_VALID,
+            )
+            self.session.add(
+                models.LinkAccountIdentity(
+                    account=account, identity=models.Identity(guid=f"uid{idx}")
+                )
+            )
+            self.session.add(
+                models.LinkAccountGuild(account=account, guild=guild, is_active=True)
+            )
+
+        # Deleted links are ignored
+        self.session.add(
+            models.LinkAccountIdentity(
+                account=account,
+                identity=models.Identity(guid="old"),
+                is_deleted=True,
+            )
+        )
+        self.session.commit()
+
+    def test_get_by_identities(self) -> None:
+        statements: list[str] = []
+        event.listen(
+            self.session.get_bind(),
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        accounts = models.Account.get_by_identities(
+            self.session, ["uid0", "uid1", "old", "unknown"]
+        )
+        self.assertEqual(set(accounts), {"uid0", "uid1"})
+        self.assertEqual(accounts["uid0"].name, "User.0")
+        loaded = len(statements)
+
+        # Groups were loaded along with the accounts
+        for account in accounts.values():
+            self.assertEqual([g.guild.group_id for g in account.guild_groups()], [100])
+            world_group = account.world_group(self.session)
+            assert world_group
+            self.assertEqual(world_group.world, account.world)
+        self.assertEqual(len(statements), loaded)
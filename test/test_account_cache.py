@@ -0,0 +1,182 @@
+import datetime
+import re
+import tempfile
+from pathlib import Path
+from re import Match
+from typing import Any, cast
+
+from sqlalchemy import event
+
+import ts3bot
+from ts3bot import events, metrics
+from ts3bot.account_cache import AccountCache
+from ts3bot.commands.guild import MESSAGE_REGEX, handle
+from ts3bot.config import env
+from ts3bot.database import enums, models
+from ts3bot.database.unit_of_work import WriteBatch
+
+from ._base import BaseTest, sample_data
+
+
+class AccountCacheTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+
+        self.account = models.Account(
+            name="User.1234",
+            world=enums.World.KODASH,
+            api_key=sample_data.API_KEY_VALID,
+            last_check=datetime.datetime.today(),
+        )
+        self.session.add(
+            models.LinkAccountIdentity(
+                account=self.account, identity=models.Identity(guid="uid", cldbid=1)
+            )
+        )
+        for idx in range(2):
+            self.session.add(
+                models.LinkAccountGuild(
+                    account=self.account,
+                    guild=models.Guild(
+                        guid=f"guild{idx}", name=f"Guild {idx}", tag=f"G{idx}"
+                    ),
+                )
+            )
+        self.session.add(
+            models.LinkAccountGuild(
+                account=self.account,
+                guild=models.Guild(
+                    guid="grouped", name="Grouped", tag="GR", group_id=100
+                ),
+            )
+        )
+        self.session.commit()
+
+        self.statements: list[str] = []
+        event.listen(self.session.get_bind(), "before_cursor_execute", self.count)
+        self.addCleanup(
+            event.remove, self.session.get_bind(), "before_cursor_execute", self.count
+        )
+
+    def count(self, *args: object) -> None:
+        self.statements.append(str(args[2]))
+
+    def guild(self, message: str) -> None:
+        handle(
+            self.bot,
+            events.TextMessage(id="1", uid="uid", name="User", message=message),
+            cast(Match[Any], re.match(MESSAGE_REGEX, message)),
+        )
+
+    def test_get(self) -> None:
+        snapshot = ts3bot.accounts.get(self.session, "uid")
+        assert snapshot
+        self.assertEqual(snapshot.world_group_id, 2201)
+        self.assertEqual([link.tag for link in snapshot.guild_groups], ["GR"])
+        self.assertEqual(len(snapshot.guilds), 3)
+
+        self.statements.clear()
+        self.assertIs(ts3bot.accounts.get(self.session, "uid"), snapshot)
+        self.assertEqual(self.statements, [])
+        self.assertEqual(metrics.gauges["account_cache.hit_rate"], 0.5)
+
+        # Clients without an account are not cached
+        self.assertIsNone(ts3bot.accounts.get(self.session, "unknown"))
+        self.assertEqual(len(ts3bot.accounts), 1)
+
+    def test_invalidate(self) -> None:
+        self.assertIsNotNone(ts3bot.accounts.get(self.session, "uid"))
+
+        self.account.invalidate(self.session)
+        self.assertIsNone(ts3bot.accounts.get(self.session, "uid"))
+
+    def test_shared_versions(self) -> None:
+        other = models.Account(
+            name="Other.1234",
+            world=enums.World.KODASH,
+            api_key=sample_data.API_KEY_VALID,
+            last_check=datetime.datetime.today(),
+        )
+        self.session.add(
+            models.LinkAccountIdentity(
+                account=other, identity=models.Identity(guid="other")
+            )
+        )
+        self.session.commit()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "account_versions.json"
+            bot, cycle = AccountCache(10, 600, path), AccountCache(10, 600, path)
+            snapshot = bot.get(self.session, "uid")
+            other_snapshot = bot.get(self.session, "other")
+            self.assertIs(bot.get(self.session, "uid"), snapshot)
+
+            # Another process changed the account, other accounts are kept
+            cycle.invalidate(self.account.id)
+            self.assertIsNot(bot.get(self.session, "uid"), snapshot)
+            self.assertIs(bot.get(self.session, "other"), other_snapshot)
+
+            # Changes only relevant to the process itself are not shared
+            snapshot = bot.get(self.session, "uid")
+            cycle.invalidate(self.account.id, shared=False)
+            self.assertIs(bot.get(self.session, "uid"), snapshot)
+
+            # Dropped versions only cause a reload
+            AccountCache(1, 600, path).publish([other.id])
+            self.assertIsNot(bot.get(self.session, "uid"), snapshot)
+
+    def test_publish_after_commit(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "account_versions.json"
+            bot = AccountCache(10, 600, path)
+            ts3bot.accounts = AccountCache(10, 600, path)
+            snapshot = bot.get(self.session, "uid")
+
+            with WriteBatch(self.session, size=100, interval=60) as batch:
+                self.account.update(self.session)
+
+                # The changes are not committed yet, the bot keeps the old rows
+                self.assertIs(bot.get(self.session, "uid"), snapshot)
+                batch.commit()
+                self.assertIsNot(bot.get(self.session, "uid"), snapshot)
+
+    def test_guild_command(self) -> None:
+        self.guild("!guild")
+        self.statements.clear()
+
+        # Listing the guilds again is served from the cache
+        self.guild("!guild")
+        self.assertEqual(self.statements, [])
+        self.bot.send_message.assert_called_with(  # type: ignore
+            "1", "guild_selection", guilds="GR"
+        )
+
+        # Toggling a guild drops the snapshot
+        self.guild("!guild GR")
+        self.bot.send_message.assert_called_with(  # type: ignore
+            "1", "guild_set", guild="Grouped"
+        )
+
+        snapshot = ts3bot.accounts.get(self.session, "uid")
+        assert snapshot
+        self.assertEqual([link.tag for link in snapshot.active_guild_groups], ["GR"])
+        self.assertEqual(metrics.counters["account_cache.miss"], 2)
+
+    def test_guild_command_outdated(self) -> None:
+        self.guild("!guild")
+
+        # Another process removed the link, the cached snapshot still lists it
+        self.session.query(models.LinkAccountGuild).filter(
+            models.LinkAccountGuild.guild.has(tag="GR")
+        ).delete(synchronize_session=False)
+        self.session.commit()
+
+        self.guild("!guild GR")
+        self.bot.send_message.assert_called_with(  # type: ignore
+            "1", "guild_invalid_selection", timeout=env.on_join_hours
+        )
+
+        # The next command sees the current guilds
+        self.guild("!guild")
+        self.bot.send_message.assert_called_with("1", "guild_unknown")  # type: ignore
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import ts3bot
+from ts3bot.api_client import ApiClient
+from ts3bot.cache import ResponseCache
+from ts3bot.cycle import Cycle
+
+from ._base import BaseTest, sample_data
+
+
+class ApiClientTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        self.adapter.reset()
+
+    def test_auth_per_request(self) -> None:
+        ts3bot.api.fetch("account", api_key=sample_data.API_KEY_VALID)
+        self.assertEqual(
+            self.adapter.last_request.headers["Authorization"],  # type: ignore
+            f"Bearer {sample_data.API_KEY_VALID}",
+        )
+        self.assertNotIn("Authorization", ts3bot.api.session.headers)
+
+        # Following unauthenticated requests must not carry the key
+        ts3bot.api.fetch("guild/4BBB52AA-D768-4FC6-8EDE-C299F2822F0F")
+        self.assertNotIn(
+            "Authorization", self.adapter.last_request.headers  # type: ignore
+        )
+
+    def test_timeout(self) -> None:
+        ts3bot.api.fetch("account", api_key=sample_data.API_KEY_VALID)
+        self.assertEqual(
+            self.adapter.last_request.timeout, ts3bot.api.timeout  # type: ignore
+        )
+
+    def test_other_hosts(self) -> None:
+        ts3bot.api.fetch("account", api_key=sample_data.API_KEY_VALID)
+        self.assertIn(
+            "X-Schema-Version", self.adapter.last_request.headers  # type: ignore
+        )
+
+        # Other hosts don't get the API's headers
+        self.adapter.register_uri("GET", "https://emblem.werdes.net/emblem/abc/64")
+        ts3bot.api.get("https://emblem.werdes.net/emblem/abc/64")
+        self.assertNotIn(
+            "X-Schema-Version", self.adapter.last_request.headers  # type: ignore
+        )
+
+    def test_grow_pool(self) -> None:
+        client = ApiClient(
+            "https://api.guildwars2.com/v2",
+            ts3bot.api.rate_limiter,
+            ResponseCache({}, 0),
+            pool_size=2,
+        )
+
+        def maxsize() -> int:
+            adapter = client.session.get_adapter("https://api.guildwars2.com")
+            return adapter.poolmanager.connection_pool_kw["maxsize"]  # type: ignore
+
+        client.grow_pool(32)
+        self.assertEqual(maxsize(), 32)
+
+        # Pools are never shrunk
+        client.grow_pool(4)
+        self.assertEqual(maxsize(), 32)
+
+        # The cycle sizes the pool for its concurrency
+        self.patch_cycle_credentials()
+        with patch.object(ts3bot.api, "grow_pool") as grow_pool:
+            Cycle(
+                self.session,
+                verify_all=False,
+                verify_linked_worlds=False,
+                verify_ts3=False,
+                connect=False,
+                concurrency=32,
+            )
+        grow_pool.assert_called_with(32)
@@ -0,0 +1,67 @@
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import ts3bot
+from ts3bot import metrics
+from ts3bot.cache import ResponseCache
+
+from ._base import BaseTest
+
+GUILD_URI = "https://api.guildwars2.com/v2/guild/4BBB52AA-D768-4FC6-8EDE-C299F2822F0F"
+GUILD_ENDPOINT = "guild/4BBB52AA-D768-4FC6-8EDE-C299F2822F0F"
+
+
+class ResponseCacheTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+        self.adapter.reset()
+
+    def test_hit(self) -> None:
+        self.assertEqual(ts3bot.api.fetch(GUILD_ENDPOINT)["name"], "ArenaNet")
+        self.assertEqual(ts3bot.api.fetch(GUILD_ENDPOINT)["name"], "ArenaNet")
+
+        self.assertEqual(self.adapter.call_count, 1)
+        self.assertEqual(
+            ts3bot.api.cache.stats,
+            {"api_cache.hit": 1, "api_cache.miss": 1},
+        )
+
+    def test_authenticated_not_cached(self) -> None:
+        self.assertEqual(ts3bot.api.cache.ttl("account"), 0)
+
+    def test_revalidation(self) -> None:
+        self.adapter.register_uri(
+            "GET",
+            "https://api.guildwars2.com/v2/guild/etag",
+            [
+                {"json": {"name": "Tagged"}, "headers": {"ETag": '"v1"'}},
+                {"status_code": 304},
+            ],
+        )
+        ts3bot.api.fetch("guild/etag")
+
+        # Expired entry is revalidated with its ETag
+        with patch("time.time", return_value=2**40):
+            self.assertEqual(ts3bot.api.fetch("guild/etag"), {"name": "Tagged"})
+        self.assertEqual(
+            self.adapter.last_request.headers["If-None-Match"], '"v1"'  # type: ignore
+        )
+        self.assertEqual(metrics.counters["api_cache.revalidated"], 1)
+
+    def test_lru(self) -> None:
+        cache = ResponseCache({"guild/": 60}, size=2)
+        for idx in range(3):
+            cache.put(f"guild/{idx}", {"id": idx})
+
+        self.assertIsNone(cache.get("guild/0"))
+        self.assertIsNotNone(cache.get("guild/2"))
+
+    def test_disk_shared(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            ResponseCache({"guild/": 60}, 2, Path(tmp)).put("guild/1", {"id": 1})
+
+            entry = ResponseCache({"guild/": 60}, 2, Path(tmp)).get("guild/1")
+            self.assertIsNotNone(entry)
+            self.assertEqual(entry["data"], {"id": 1})  # type: ignore
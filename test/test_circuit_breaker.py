@@ -0,0 +1,107 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import call, patch
+
+import requests
+import requests_mock  # type: ignore
+
+from ts3bot import metrics
+from ts3bot.api_client import ApiClient, RateLimitError
+from ts3bot.cache import ResponseCache
+from ts3bot.circuit_breaker import CircuitBreaker, CircuitOpenError
+from ts3bot.ratelimit import TokenBucket
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_probe(self) -> None:
+        breaker = CircuitBreaker(threshold=2, cooldown=10, max_cooldown=15)
+        with patch("time.monotonic", return_value=1000.0):
+            breaker.record_failure()
+            breaker.before_request()
+            breaker.record_failure()
+            self.assertTrue(breaker.is_open)
+
+            with self.assertRaises(CircuitOpenError) as ctx:
+                breaker.before_request()
+            self.assertAlmostEqual(ctx.exception.retry_after, 10.0)
+
+        # A single probe is let through, failing it doubles the cooldown
+        with patch("time.monotonic", return_value=1010.0):
+            breaker.before_request()
+            with self.assertRaises(CircuitOpenError):
+                breaker.before_request()
+            breaker.record_failure()
+            self.assertAlmostEqual(breaker.retry_in(), 15.0)
+
+        with patch("time.monotonic", return_value=1025.0):
+            breaker.before_request()
+            breaker.record_success()
+            self.assertFalse(breaker.is_open)
+            breaker.before_request()
+
+
+class ApiRetryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        metrics.reset()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.api = ApiClient(
+            "mock://api/v2",
+            rate_limiter=TokenBucket(Path(self.tmp.name) / "bucket.json", 600, 60),
+            cache=ResponseCache({}, 16),
+            breaker=CircuitBreaker(threshold=3, cooldown=30),
+        )
+        self.adapter = requests_mock.Adapter()
+        self.api.session.mount("mock://", self.adapter)
+
+        sleep = patch("time.sleep")
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_retry_after(self) -> None:
+        self.adapter.register_uri(
+            "GET",
+            "mock://api/v2/account",
+            [
+                {"status_code": 429, "headers": {"Retry-After": "7"}},
+                {"status_code": 200, "json": {"name": "User.1234"}},
+            ],
+        )
+        self.assertEqual(self.api.limit_fetch("account"), {"name": "User.1234"})
+        self.sleep.assert_any_call(7.0)
+
+    def test_rate_limit_exhausted(self) -> None:
+        self.adapter.register_uri("GET", "mock://api/v2/account", status_code=429)
+        with self.assertRaises(RateLimitError):
+            self.api.limit_fetch("account")
+        self.assertFalse(self.api.breaker.is_open)
+
+        # Without Retry-After each attempt waits for a full period
+        self.assertEqual(self.sleep.call_args_list.count(call(60)), 3)
+        self.assertIsNone(self.api.rate_limiter.reserve(max_wait=30))
+
+    def test_outage(self) -> None:
+        self.adapter.register_uri(
+            "GET",
+            "mock://api/v2/account",
+            [
+                {"status_code": 502},
+                {"status_code": 503},
+                {"status_code": 200, "json": {"name": "User.1234"}},
+            ],
+        )
+        # Server errors are retried with backoff
+        self.assertEqual(self.api.limit_fetch("account"), {"name": "User.1234"})
+        self.assertEqual(self.sleep.call_count, 2)
+
+        # Persisting errors open the circuit, requests fail without reaching the API
+        self.adapter.register_uri("GET", "mock://api/v2/account", status_code=500)
+        with self.assertRaises(requests.HTTPError):
+            self.api.limit_fetch("account")
+        with self.assertRaises(CircuitOpenError):
+            self.api.limit_fetch("account")
+        self.assertEqual(self.adapter.call_count, 6)
+        self.assertEqual(metrics.counters["api_circuit.opened"], 1)
@@ -1,11 +1,20 @@
+import json
+import tempfile
+import time
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import ts3  # type: ignore
 from sqlalchemy import and_, or_
 
+import ts3bot
+from ts3bot import metrics
+from ts3bot.cycle import Cycle, load_state
 from ts3bot.database import enums, models
 
-from ._base import BaseTest, sample_data
+from ._base import MOCK_RESPONSES, BaseTest, sample_data
 
 
 class CycleAffectWorldsTest(BaseTest):
@@ -101,3 +110,448 @@ class CycleAffectWorldsTest(BaseTest):
             )
         )
         self.assertEqual(accounts.count(), 1)
+
+
+class CycleByGroupTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+
+        identity = models.Identity(guid="registered")
+        account = models.Account(
+            name="User.1234",
+            world=enums.World.KODASH,
+            api_key=sample_data.API_KEY_VALID,
+            last_check=datetime.today(),
+        )
+        self.session.add(models.LinkAccountIdentity(account=account, identity=identity))
+        self.session.commit()
+
+        self.patch_cycle_credentials()
+
+        self.cycle = Cycle(
+            self.session,
+            verify_all=False,
+            verify_linked_worlds=False,
+            verify_ts3=True,
+            connect=False,
+            by_group=True,
+        )
+        self.cycle.bot = self.bot
+        self.bot.ts3c = MagicMock()
+
+    def test_members(self) -> None:
+        groups = [
+            {"sgid": "2201", "name": "Kodash"},
+            {"sgid": "500", "name": "Unmanaged"},
+        ]
+        clients = [
+            {"cldbid": "5", "client_unique_identifier": "registered"},
+            {"cldbid": "6", "client_unique_identifier": "unknown"},
+            {"cldbid": "1", "client_unique_identifier": "ServerQuery"},
+        ]
+        with patch.dict(
+            MOCK_RESPONSES,
+            {"servergrouplist": groups, "servergroupclientlist": clients},
+        ):
+            members = self.cycle.managed_group_members()
+            self.assertEqual(set(members), {"5", "6"})
+            self.assertEqual(members["5"]["groups"], [groups[0]])
+
+            self.cycle.verify_ts3_groups()
+
+        # Only managed groups were listed
+        self.assertEqual(len(self.mock_exec_calls["servergroupclientlist"]), 2)
+
+        # Only the unregistered member's groups were queried to revoke them
+        self.assertEqual(
+            [c["params"] for c in self.mock_exec_calls["servergroupsbyclientid"]],
+            [{"cldbid": "6"}],
+        )
+
+
+class CycleIncrementalTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+
+        self.patch_cycle_credentials()
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        self.cycle = Cycle(
+            self.session,
+            verify_all=False,
+            verify_linked_worlds=False,
+            verify_ts3=True,
+            connect=False,
+            incremental=True,
+        )
+        self.cycle.state_path = Path(self.tmp.name) / "cycle_state.json"
+        self.cycle.bot = self.bot
+        self.cycle.verify_client = MagicMock()  # type: ignore
+        self.bot.ts3c = MagicMock()
+
+        users = [
+            {
+                "cldbid": "5",
+                "client_unique_identifier": "inactive",
+                "client_lastconnected": "100",
+            },
+            {
+                "cldbid": "6",
+                "client_unique_identifier": "active",
+                "client_lastconnected": "2000",
+            },
+        ]
+
+        def exec_(cmd: str, *options: Any, **params: Any) -> list[dict]:
+            if params.get("start"):
+                raise ts3.query.TS3QueryError(
+                    MagicMock(error={"id": "1281"})  # Empty result
+                )
+            return users
+
+        self.bot.exec_ = exec_  # type: ignore
+
+    def verified(self) -> list[str]:
+        calls = self.cycle.verify_client.call_args_list  # type: ignore
+        return [c.args[0] for c in calls]
+
+    def test_skip_inactive(self) -> None:
+        now = time.time()
+        self.cycle.state_path.write_text(
+            json.dumps({"ts3_verified_at": 1000, "full_sweep_at": now})
+        )
+
+        self.cycle.verify_ts3_accounts()
+        self.assertEqual(self.verified(), ["active"])
+        self.assertEqual(metrics.counters["cycle.clients_skipped"], 1)
+
+        state = load_state(self.cycle.state_path)
+        self.assertGreaterEqual(state["ts3_verified_at"], now)
+        self.assertEqual(state["full_sweep_at"], now)
+
+    def test_full_sweep(self) -> None:
+        # First run and outdated full sweeps verify everyone
+        self.cycle.verify_ts3_accounts()
+        self.assertEqual(self.verified(), ["inactive", "active"])
+        self.assertGreater(load_state(self.cycle.state_path)["full_sweep_at"], 0)
+
+
+class CycleActivityTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+
+        self.patch_cycle_credentials()
+
+        now = datetime.now()
+        for name, last_seen, last_check in [
+            ("Active", now - timedelta(days=1), now - timedelta(days=3)),
+            ("Dormant", now - timedelta(days=100), now - timedelta(days=3)),
+            ("DormantDue", now - timedelta(days=100), now - timedelta(days=40)),
+            ("Unlinked", None, now - timedelta(days=3)),
+        ]:
+            account = models.Account(
+                name=name,
+                world=enums.World.KODASH,
+                api_key=sample_data.API_KEY_VALID,
+                last_check=last_check,
+            )
+            self.session.add(account)
+            if last_seen:
+                self.session.add(
+                    models.LinkAccountIdentity(
+                        account=account, identity=models.Identity(guid=name)
+                    )
+                )
+        self.session.commit()
+
+        models.Identity.record_seen(
+            self.session,
+            {
+                "Active": now - timedelta(days=1),
+                "Dormant": now - timedelta(days=100),
+                "DormantDue": now - timedelta(days=100),
+            },
+        )
+
+    def test_dormant_deferred(self) -> None:
+        cycle = Cycle(
+            self.session,
+            verify_all=False,
+            verify_linked_worlds=False,
+            verify_ts3=False,
+            connect=False,
+        )
+        with patch.object(Cycle, "_update_accounts", new=AsyncMock()) as update:
+            cycle.verify_accounts()
+
+        batches, num_accounts = update.call_args.args
+        self.assertEqual(
+            {a.name for batch in batches for a in batch}, {"Active", "DormantDue"}
+        )
+        self.assertEqual(num_accounts, 2)
+
+    def test_dormant_run(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        cycle = Cycle(
+            self.session,
+            verify_all=False,
+            verify_linked_worlds=False,
+            verify_ts3=False,
+            connect=False,
+            online_budget=0,
+        )
+        cycle.state_path = Path(tmp.name) / "cycle_state.json"
+        cycle.bot = self.bot
+        self.bot.ts3c = MagicMock()
+
+        now = datetime.now()
+        users = [
+            {
+                "cldbid": str(idx),
+                "client_unique_identifier": name,
+                "client_lastconnected": str(int((now - age).timestamp())),
+            }
+            for idx, (name, age) in enumerate(
+                [
+                    ("Active", timedelta(days=1)),
+                    ("Dormant", timedelta(days=100)),
+                    ("DormantDue", timedelta(days=100)),
+                ]
+            )
+        ]
+
+        def exec_(cmd: str, *options: Any, **params: Any) -> list[dict]:
+            if params.get("start"):
+                raise ts3.query.TS3QueryError(
+                    MagicMock(error={"id": "1281"})  # Empty result
+                )
+            return users
+
+        self.bot.exec_ = exec_  # type: ignore
+
+        with patch.object(models.Account, "update", autospec=True) as update, patch(
+            "ts3bot.sync_groups"
+        ), patch.object(models.Account, "update_async", autospec=True):
+            cycle.run()
+
+        # The TS3 pass defers dormant users like the pass over all accounts
+        self.assertEqual(
+            [c.args[0].name for c in update.call_args_list], ["Active", "DormantDue"]
+        )
+        # Dormant by both passes, Unlinked by the pass over all accounts
+        self.assertEqual(metrics.counters["cycle.dormant_deferred"], 3)
+
+    def test_record_seen(self) -> None:
+        identity = self.session.query(models.Identity).filter_by(guid="Active").one()
+        last_seen = identity.last_seen
+
+        # Older timestamps are ignored
+        models.Identity.record_seen(
+            self.session, {"Active": last_seen - timedelta(days=1)}
+        )
+        self.assertEqual(identity.last_seen, last_seen)
+
+
+class CycleOnlineTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+
+        self.patch_cycle_credentials()
+
+        for idx in range(3):
+            self.session.add(
+                models.LinkAccountIdentity(
+                    account=models.Account(
+                        name=f"User.{idx}",
+                        world=enums.World.KODASH,
+                        api_key=sample_data.API_KEY_VALID,
+                        last_check=datetime(2020, 1, 1),
+                    ),
+                    identity=models.Identity(guid=f"online{idx}"),
+                )
+            )
+        self.session.commit()
+
+    def test_budget(self) -> None:
+        clients = [
+            {
+                "client_database_id": str(idx),
+                "client_unique_identifier": uid,
+                "client_type": client_type,
+            }
+            for idx, (uid, client_type) in enumerate(
+                [
+                    ("online0", "0"),
+                    ("unregistered", "0"),
+                    ("online1", "1"),  # Query client
+                    ("online2", "0"),
+                ]
+            )
+        ]
+
+        cycle = Cycle(
+            self.session,
+            verify_all=False,
+            verify_linked_worlds=False,
+            verify_ts3=False,
+            connect=False,
+            online_budget=1,
+        )
+        cycle.bot = self.bot
+        cycle.verify_client = MagicMock(return_value=True)  # type: ignore
+
+        with patch.dict(MOCK_RESPONSES, {"clientlist": clients}):
+            cycle.verify_online()
+
+        # Only registered clients count, the budget stops the lane
+        self.assertEqual(
+            [c.args[0] for c in cycle.verify_client.call_args_list],  # type: ignore
+            ["online0"],
+        )
+        self.assertEqual(metrics.counters["cycle.online_checked"], 1)
+
+
+class CycleScheduleTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.patch_cycle_credentials()
+
+        now = datetime.now()
+        for name, last_check, next_check_at in [
+            ("Due", now - timedelta(hours=1), now - timedelta(hours=1)),
+            ("Stable", now - timedelta(days=5), now + timedelta(days=1)),
+        ]:
+            self.session.add(
+                models.LinkAccountIdentity(
+                    account=models.Account(
+                        name=name,
+                        world=enums.World.KODASH,
+                        api_key=sample_data.API_KEY_VALID,
+                        last_check=last_check,
+                        next_check_at=next_check_at,
+                    ),
+                    identity=models.Identity(guid=name, last_seen=now),
+                )
+            )
+        self.session.commit()
+
+        self.cycle = Cycle(
+            self.session,
+            verify_all=False,
+            verify_linked_worlds=False,
+            verify_ts3=True,
+            connect=False,
+        )
+        self.cycle.bot = self.bot
+
+    def verify_client(self, uid: str) -> bool:
+        account = models.Account.get_by_identity(self.session, uid)
+        with patch.object(models.Account, "update") as update, patch(
+            "ts3bot.sync_groups"
+        ):
+            self.assertEqual(self.cycle.verify_client(uid, "5", account), update.called)
+        return update.called
+
+    def test_next_check(self) -> None:
+        # TS3 clients follow the accounts' schedule instead of cycle_hours
+        self.assertTrue(self.verify_client("Due"))
+        self.assertFalse(self.verify_client("Stable"))
+
+
+class CycleStreamTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+
+        # Some accounts became due at the same time
+        for idx in range(7):
+            self.session.add(
+                models.Account(
+                    name=f"User.{idx}",
+                    world=enums.World.KODASH,
+                    api_key=sample_data.API_KEY_VALID,
+                    last_check=datetime(2020, 1, 1),
+                    next_check_at=datetime(2020, 1, 1 + idx // 2),
+                )
+            )
+        self.session.commit()
+        self.session.expunge_all()
+
+        self.patch_cycle_credentials(cycle_batch_size=3)
+
+    def test_stream(self) -> None:
+        checked: list[str] = []
+        loaded: list[int] = []
+
+        async def update(account: models.Account, session: Any) -> None:
+            checked.append(account.name)
+            loaded.append(len(session.identity_map))
+            account.next_check_at = datetime.today() + timedelta(days=1)
+            session.commit()
+
+        cycle = Cycle(
+            self.session,
+            verify_all=False,
+            verify_linked_worlds=False,
+            verify_ts3=False,
+            connect=False,
+        )
+        with patch.object(models.Account, "update_async", new=update):
+            cycle.verify_accounts()
+
+        # Every account was checked once, in the order they became due
+        self.assertEqual(checked, [f"User.{idx}" for idx in range(7)])
+        # Only one batch was held at a time
+        self.assertLessEqual(max(loaded), 3)
+        self.assertEqual(len(self.session.identity_map), 0)
+
+    def test_rate_limited(self) -> None:
+        checked: list[str] = []
+
+        async def update(account: models.Account, session: Any) -> None:
+            # The API keeps rejecting the first request
+            if not checked:
+                checked.append("rate limited")
+                raise ts3bot.RateLimitError()
+            checked.append(account.name)
+            account.next_check_at = datetime.today() + timedelta(days=1)
+
+        cycle = Cycle(
+            self.session,
+            verify_all=False,
+            verify_linked_worlds=False,
+            verify_ts3=False,
+            connect=False,
+        )
+        with patch.object(models.Account, "update_async", new=update):
+            cycle.verify_accounts()
+
+        # The account was retried instead of aborting the cycle
+        self.assertEqual(checked[1:], [f"User.{idx}" for idx in range(7)])
+
+    def test_negative_cached(self) -> None:
+        update = AsyncMock()
+        ts3bot.api.negative_cache.add(sample_data.API_KEY_VALID)
+        metrics.reset()
+
+        cycle = Cycle(
+            self.session,
+            verify_all=False,
+            verify_linked_worlds=False,
+            verify_ts3=False,
+            connect=False,
+        )
+        with patch.object(models.Account, "update_async", new=update):
+            cycle.verify_accounts()
+
+        # Skipped accounts still count towards the write batch
+        update.assert_not_called()
+        self.assertEqual(metrics.counters["api_negative_cache.skipped"], 7)
+        self.assertEqual(metrics.counters["write_batch.committed"], 7)
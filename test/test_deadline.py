@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+import ts3bot
+from ts3bot import deadline, metrics
+from ts3bot.config import env
+
+from ._base import BaseTest, sample_data
+
+
+class DeadlineTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+        self.adapter.reset()
+
+    def test_fetch_fails_fast(self) -> None:
+        with self.assertRaises(deadline.DeadlineExceededError):
+            with deadline.scope("test", 0):
+                ts3bot.api.fetch("account", api_key=sample_data.API_KEY_VALID)
+
+        self.assertEqual(self.adapter.call_count, 0)
+
+    def test_timeout_capped(self) -> None:
+        with deadline.scope("test", 2):
+            ts3bot.api.fetch("account", api_key=sample_data.API_KEY_VALID)
+
+        connect, read = self.adapter.last_request.timeout  # type: ignore
+        self.assertLessEqual(connect, 2)
+        self.assertLessEqual(read, 2)
+
+    def test_handler(self) -> None:
+        def handler() -> str:
+            ts3bot.api.fetch("account", api_key=sample_data.API_KEY_VALID)
+            return "done"
+
+        with patch.object(env, "command_timeouts", {"info": 0}):
+            self.assertIsNone(self.bot.run_with_deadline("info", "1", handler))
+
+        self.bot.send_message.assert_called_with("1", "error_api")  # type: ignore
+        self.assertEqual(metrics.counters["deadline_exceeded.info"], 1)
+
+        # Regular budget
+        self.assertEqual(self.bot.run_with_deadline("info", "1", handler), "done")
+        self.assertEqual(metrics.counters["deadline_exceeded.info"], 1)
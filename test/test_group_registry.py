@@ -0,0 +1,52 @@
+import tempfile
+from pathlib import Path
+
+from ts3bot import metrics
+from ts3bot.config import env
+from ts3bot.database import enums, models
+from ts3bot.group_registry import GroupRegistry
+
+from ._base import BaseTest
+
+
+class GroupRegistryTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+
+        self.session.add(
+            models.Guild(guid="guild", name="Guild", tag="G", group_id=100)
+        )
+        self.session.add(models.Guild(guid="no-group", name="Other", tag="O"))
+        self.session.commit()
+
+    def test_get(self) -> None:
+        registry = GroupRegistry()
+        groups = registry.get(self.session)
+
+        self.assertEqual(groups.world_groups[enums.World.KODASH], 2201)
+        self.assertEqual(groups.guild_groups, {"guild": 100})
+        self.assertIn(env.generic_guild_id, groups.known_ids)
+        self.assertNotIn(100, groups.world_ids)
+
+        # Loaded once
+        self.assertIs(registry.get(self.session), groups)
+        self.assertEqual(metrics.counters["group_registry.loaded"], 1)
+
+        registry.invalidate()
+        self.assertIsNot(registry.get(self.session), groups)
+
+    def test_shared_version(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "managed_groups.version"
+            bot, cycle = GroupRegistry(path), GroupRegistry(path)
+            self.assertNotIn(101, cycle.get(self.session).known_ids)
+
+            # Another process changed the groups
+            self.session.query(models.Guild).filter_by(guid="no-group").update(
+                {"group_id": 101}
+            )
+            bot.invalidate()
+
+            self.assertIn(101, cycle.get(self.session).known_ids)
+            self.assertEqual(bot.version(), 1)
@@ -0,0 +1,121 @@
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from test.api_server import ApiServer, Dataset, uniform
+from unittest.mock import patch
+
+import ts3bot
+from ts3bot.api_client import ApiClient
+from ts3bot.cache import ResponseCache
+from ts3bot.circuit_breaker import CircuitBreaker
+from ts3bot.config import env
+from ts3bot.cycle import Cycle
+from ts3bot.database import enums, models
+from ts3bot.ratelimit import TokenBucket
+
+from ._base import BaseTest
+
+
+class IntegrationTest(BaseTest):
+    """Runs against the local stand-in API instead of mocked responses"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dataset = Dataset(accounts=20, guilds=5)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def serve(self, **kwargs: float) -> ApiServer:
+        """Starts a server and points the shared API client at it"""
+
+        server = ApiServer(self.dataset, **kwargs)  # type: ignore
+        client = ApiClient(
+            server.base_url,
+            rate_limiter=TokenBucket(Path(self.tmp.name) / "bucket.json", 600, 60),
+            cache=ResponseCache(env.api_cache_ttls, env.api_cache_size),
+            breaker=CircuitBreaker(threshold=50),
+            retry_base=0.01,
+        )
+        api = patch.object(ts3bot, "api", client)
+        api.start()
+        self.addCleanup(api.stop)
+        return server
+
+    def add_accounts(self) -> None:
+        for api_key, account in self.dataset.accounts.items():
+            self.session.add(
+                models.Account(
+                    name=account["name"],
+                    world=enums.World(account["world"]),
+                    api_key=api_key,
+                    last_check=datetime(2020, 1, 1),
+                )
+            )
+        self.session.commit()
+
+    def test_fetch(self) -> None:
+        api_key = Dataset.api_key(3)
+        with self.serve():
+            self.assertEqual(
+                ts3bot.api.fetch("account", api_key=api_key)["name"], "User.0003"
+            )
+            self.assertEqual(
+                ts3bot.api.fetch("tokeninfo", api_key=api_key)["name"], "ts3bot-3"
+            )
+
+            guid = next(iter(self.dataset.guilds))
+            self.assertEqual(ts3bot.api.fetch(f"guild/{guid}")["tag"], "G0")
+
+            with self.assertRaises(ts3bot.InvalidKeyError):
+                ts3bot.api.fetch("account", api_key=Dataset.api_key(999))
+            with self.assertRaises(ts3bot.NotFoundError):
+                ts3bot.api.fetch("guild/unknown")
+
+    def test_rate_limit(self) -> None:
+        with self.serve(rate_limit=3) as server:
+            for idx in range(3):
+                ts3bot.api.fetch("account", api_key=Dataset.api_key(idx))
+
+            with self.assertRaises(ts3bot.RateLimitError) as ctx:
+                ts3bot.api.fetch("account", api_key=Dataset.api_key(3))
+            self.assertGreater(ctx.exception.retry_after, 0)
+            self.assertEqual(server.statuses[429], 1)
+
+    def test_account_update(self) -> None:
+        self.add_accounts()
+        account = self.session.query(models.Account).filter_by(name="User.0001").one()
+
+        with self.serve():
+            account.update(self.session)
+
+        expected = self.dataset.accounts[account.api_key]
+        self.assertEqual(
+            {g.guild.guid for g in account.guilds},
+            set(expected["guilds"]),
+        )
+
+    def test_cycle(self) -> None:
+        self.add_accounts()
+        self.patch_cycle_credentials()
+
+        with self.serve(latency=uniform(0, 0.01), error_rate=0.1) as server, patch(
+            "ts3bot.api_client.time.sleep"
+        ):
+            cycle = Cycle(
+                self.session,
+                verify_all=True,
+                verify_linked_worlds=False,
+                verify_ts3=False,
+                concurrency=4,
+                connect=False,
+            )
+            cycle.verify_accounts()
+
+        # Failed requests were retried, every account was checked
+        self.assertGreater(server.statuses[502], 0)
+        unchecked = self.session.query(models.Account).filter(
+            models.Account.last_check < cycle.verify_begin
+        )
+        self.assertEqual(unchecked.count(), 0)
@@ -0,0 +1,122 @@
+import datetime
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import ts3bot
+from ts3bot.config import env
+from ts3bot.database import enums, models
+
+from ._base import MOCK_RESPONSES, BaseTest, sample_data
+
+SERVER_GROUPS = [
+    {"sgid": "8", "name": "Guest"},
+    {"sgid": "2201", "name": "Kodash"},
+]
+
+
+def enter_view(clid: str, uid: str, **fields: str) -> Any:
+    event = MagicMock()
+    event.event = "notifycliententerview"
+    event.__getitem__.return_value = {
+        "clid": clid,
+        "client_database_id": clid,
+        "client_unique_identifier": uid,
+        "client_type": "0",
+        "client_nickname": "User",
+        "client_country": "DE",
+        **fields,
+    }
+    return event
+
+
+class JoinTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+
+        account = models.Account(
+            name="User.1234",
+            world=enums.World.KODASH,
+            api_key=sample_data.API_KEY_VALID,
+            last_check=datetime.datetime.today(),
+        )
+        self.session.add(
+            models.LinkAccountIdentity(
+                account=account, identity=models.Identity(guid="registered")
+            )
+        )
+        self.session.commit()
+
+        responses = patch.dict(MOCK_RESPONSES, {"servergrouplist": SERVER_GROUPS})
+        responses.start()
+        self.addCleanup(responses.stop)
+
+    def test_known_user(self) -> None:
+        for clid in ("1", "2"):
+            self.bot.handle_event(
+                enter_view(clid, "registered", client_servergroups="2201")
+            )
+
+        # Group names were resolved once, nothing else was queried
+        self.assertEqual(list(self.mock_exec_calls.keys()), ["servergrouplist"])
+        self.assertEqual(len(self.mock_exec_calls["servergrouplist"]), 1)
+        self.assertEqual(self.bot.users["2"].locale, "de")
+
+    def test_missing_groups(self) -> None:
+        MOCK_RESPONSES["servergroupsbyclientid"] = SERVER_GROUPS[1:]
+        self.bot.handle_event(enter_view("1", "registered"))
+
+        self.assertEqual(list(self.mock_exec_calls.keys()), ["servergroupsbyclientid"])
+
+    def test_greet_new_user(self) -> None:
+        MOCK_RESPONSES["clientinfo"] = [
+            {
+                "client_database_id": "1",
+                "client_unique_identifier": "new",
+                "client_totalconnections": "1",
+            }
+        ]
+        self.bot.handle_event(enter_view("1", "new", client_servergroups="8"))
+
+        # The event lacked the connection count
+        self.assertEqual(len(self.mock_exec_calls["clientinfo"]), 1)
+        self.bot.send_message.assert_called_with(  # type: ignore
+            "1", "welcome_greet", con_limit=env.annoy_total_connections
+        )
+
+        # It is used if present
+        self.mock_exec_calls.clear()
+        self.bot.handle_event(
+            enter_view("2", "new", client_servergroups="8", client_totalconnections="1")
+        )
+        self.assertNotIn("clientinfo", self.mock_exec_calls)
+
+    def test_cldbid(self) -> None:
+        self.bot.handle_event(enter_view("5", "registered", client_servergroups="2201"))
+
+        identity = self.session.query(models.Identity).filter_by(guid="registered")
+        self.assertEqual(identity.one().cldbid, 5)
+
+        # Commands don't have to ask TS3 anymore
+        self.mock_exec_calls.clear()
+        self.assertEqual(ts3bot.get_cldbid(self.bot, "registered"), "5")
+        self.assertNotIn("clientgetdbidfromuid", self.mock_exec_calls)
+
+        # Also stored for clients that are not verified, e.g. without groups
+        self.bot.handle_event(
+            enter_view(
+                "6", "registered", client_servergroups="8", client_totalconnections="1"
+            )
+        )
+        self.session.expire_all()
+        self.assertEqual(identity.one().cldbid, 6)
+
+    def test_cldbid_lookup(self) -> None:
+        # Unknown clients are looked up every time, without creating an identity
+        for _ in range(2):
+            self.assertEqual(ts3bot.get_cldbid(self.bot, "unknown"), "1")
+        self.assertEqual(len(self.mock_exec_calls["clientgetdbidfromuid"]), 2)
+
+        # Known identities remember it
+        for _ in range(2):
+            ts3bot.get_cldbid(self.bot, "registered")
+        self.assertEqual(len(self.mock_exec_calls["clientgetdbidfromuid"]), 3)
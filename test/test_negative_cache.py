@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import ts3bot
+from ts3bot import metrics
+from ts3bot.negative_cache import NegativeCache
+
+from ._base import BaseTest, sample_data
+
+
+class NegativeCacheTest(unittest.TestCase):
+    def test_ttl(self) -> None:
+        cache = NegativeCache(ttl=60, size=10)
+        with patch("time.time", return_value=1000.0):
+            cache.add("key")
+            self.assertIn("key", cache)
+            self.assertNotIn("other", cache)
+
+        with patch("time.time", return_value=1061.0):
+            self.assertNotIn("key", cache)
+
+    def test_bounded(self) -> None:
+        cache = NegativeCache(ttl=60, size=2)
+        for idx in range(3):
+            with patch("time.time", return_value=1000.0 + idx):
+                cache.add(f"key{idx}")
+
+        with patch("time.time", return_value=1003.0):
+            self.assertNotIn("key0", cache)
+            self.assertIn("key2", cache)
+
+    def test_shared_hashes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "negative.json"
+            NegativeCache(ttl=60, size=10, path=path).add("secret-key")
+
+            self.assertIn("secret-key", NegativeCache(ttl=60, size=10, path=path))
+            self.assertNotIn("secret-key", path.read_text())
+
+    def test_lookup_read_only(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "negative.json"
+            bot = NegativeCache(ttl=60, size=10, path=path)
+            cycle = NegativeCache(ttl=60, size=10, path=path)
+            cycle.add("key")
+
+            # Lookups neither write nor read an unchanged file again
+            self.assertIn("key", bot)
+            mtime = path.stat().st_mtime_ns
+            with patch.object(Path, "open") as open_file:
+                self.assertNotIn("other", bot)
+            open_file.assert_not_called()
+            self.assertEqual(path.stat().st_mtime_ns, mtime)
+
+            # Changes of other processes are picked up
+            cycle.discard("key")
+            self.assertNotIn("key", bot)
+
+
+class NegativeCacheFetchTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+        self.adapter.register_uri(
+            "GET",
+            "https://api.guildwars2.com/v2/account",
+            request_headers={"authorization": f"Bearer {sample_data.API_KEY_INVALID}"},
+            status_code=401,
+            text='{"text":"Invalid access token"}',
+        )
+        self.adapter.reset()
+
+    def test_fetch(self) -> None:
+        for _ in range(2):
+            with self.assertRaises(ts3bot.InvalidKeyError):
+                ts3bot.api.fetch("account", api_key=sample_data.API_KEY_INVALID)
+
+        # The second attempt was answered without a request
+        self.assertEqual(self.adapter.call_count, 1)
+        self.assertEqual(metrics.counters["api_negative_cache.hit"], 1)
+
+        # Admins can still ask the API
+        with self.assertRaises(ts3bot.InvalidKeyError):
+            ts3bot.api.fetch(
+                "account",
+                api_key=sample_data.API_KEY_INVALID,
+                bypass_negative_cache=True,
+            )
+        self.assertEqual(self.adapter.call_count, 2)
@@ -0,0 +1,113 @@
+import unittest
+from typing import Any
+from unittest.mock import patch
+
+from ts3bot import User, metrics
+from ts3bot.bot import Bot
+from ts3bot.online_clients import OnlineClients
+
+from ._base import MOCK_RESPONSES, BaseTest
+
+
+def user(clid: int, uid: str, total_connections: int = -1, **fields: Any) -> User:
+    return User(
+        id=clid,
+        db_id=clid,
+        unique_id=uid,
+        nickname=uid,
+        country="DE",
+        total_connections=total_connections,
+        **fields,
+    )
+
+
+class OnlineClientsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        metrics.reset()
+
+    def test_bounded(self) -> None:
+        clients = OnlineClients(size=2)
+        for clid in range(3):
+            clients[str(clid)] = user(clid, f"uid{clid}")
+
+        self.assertEqual(len(clients), 2)
+        self.assertNotIn("0", clients)
+        self.assertEqual(metrics.counters["online_clients.evicted"], 1)
+
+    def test_reconcile(self) -> None:
+        clients = OnlineClients(size=10)
+        clients["1"] = user(1, "stays", total_connections=5)
+        clients["2"] = user(2, "left")
+        clients["3"] = user(3, "reused")
+
+        added, removed = clients.reconcile(
+            [user(1, "stays"), user(3, "new-client"), user(4, "missed")]
+        )
+
+        self.assertEqual((added, removed), (2, 2))
+        self.assertNotIn("2", clients)
+        self.assertEqual(clients["3"].unique_id, "new-client")
+        # Known clients keep their details
+        self.assertEqual(clients["1"].total_connections, 5)
+        # Filling the registry is no drift
+        self.assertNotIn("online_clients.drift", metrics.counters)
+
+        # Groups and idle times are refreshed
+        clients.reconcile(
+            [
+                user(1, "stays", server_groups=["8"], idle_time=100),
+                user(3, "new-client"),
+                user(4, "missed"),
+                user(5, "joined"),
+            ]
+        )
+        clients.reconcile(
+            [
+                user(1, "stays", server_groups=["8", "2201"], idle_time=200),
+                user(3, "new-client"),
+                user(4, "missed"),
+            ]
+        )
+        self.assertEqual(clients["1"].server_groups, ["8", "2201"])
+        self.assertEqual(clients["1"].idle_time, 200)
+        self.assertEqual(metrics.counters["online_clients.drift"], 2)
+        self.assertEqual(metrics.counters["online_clients.group_drift"], 1)
+
+
+class BotClientsTest(BaseTest):
+    def test_locale(self) -> None:
+        clients = [
+            {
+                "clid": "1",
+                "client_database_id": "10",
+                "client_unique_identifier": "uid",
+                "client_nickname": "User",
+                "client_country": "DE",
+                "client_type": "0",
+                "client_servergroups": "8,2201",
+                "client_idle_time": "1500",
+            },
+            {
+                "clid": "2",
+                "client_database_id": "11",
+                "client_unique_identifier": "query",
+                "client_type": "1",
+            },
+        ]
+        with patch.dict(MOCK_RESPONSES, {"clientlist": clients, "sendtextmessage": []}):
+            self.bot.reconcile_clients()
+            self.assertEqual(len(self.bot.users), 1)
+            self.assertEqual(self.bot.users["1"].server_groups, ["8", "2201"])
+            self.assertEqual(
+                self.mock_exec_calls["clientlist"][0]["options"],
+                ("uid", "country", "groups", "times"),
+            )
+
+            # Messages are localized without asking TS3 about the client
+            with patch("i18n.set") as set_locale:
+                Bot.send_message(self.bot, "1", "welcome")
+                set_locale.assert_called_with("locale", "de")
+
+        self.assertEqual(
+            list(self.mock_exec_calls.keys()), ["clientlist", "sendtextmessage"]
+        )
@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from ts3bot.ratelimit import TokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "bucket.json"
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_budget(self) -> None:
+        bucket = TokenBucket(self.path, capacity=10, period=1)
+        with patch("time.time", return_value=1000.0):
+            for _ in range(10):
+                self.assertEqual(bucket.reserve(), 0.0)
+            self.assertAlmostEqual(bucket.fill_level, 0.0)
+
+            # Out of budget, next caller has to wait for one token
+            self.assertAlmostEqual(bucket.reserve(), 0.1)
+            self.assertAlmostEqual(bucket.reserve(), 0.2)
+
+        # Refilled after the period has passed
+        with patch("time.time", return_value=1002.0):
+            self.assertAlmostEqual(bucket.fill_level, 10.0)
+
+    def test_shared(self) -> None:
+        bot = TokenBucket(self.path, capacity=10, period=1)
+        cycle = TokenBucket(self.path, capacity=10, period=1)
+        with patch("time.time", return_value=1000.0):
+            for _ in range(5):
+                bot.reserve()
+            self.assertAlmostEqual(cycle.fill_level, 5.0)
+
+            cycle.drain()
+            self.assertAlmostEqual(bot.fill_level, 0.0)
+
+    def test_blocked(self) -> None:
+        bot = TokenBucket(self.path, capacity=10, period=1)
+        cycle = TokenBucket(self.path, capacity=10, period=1)
+        with patch("time.time", return_value=1000.0):
+            cycle.drain(block_for=5)
+
+        # The other process neither gets nor refills tokens during the block
+        with patch("time.time", return_value=1004.0):
+            self.assertAlmostEqual(bot.fill_level, 0.0)
+            self.assertAlmostEqual(bot.reserve(), 1.1)
+
+        # Refilled as usual afterwards
+        with patch("time.time", return_value=1007.0):
+            self.assertAlmostEqual(cycle.fill_level, 10.0)
+
+    def test_acquire_sleeps(self) -> None:
+        bucket = TokenBucket(self.path, capacity=1, period=1)
+        with patch("time.time", return_value=1000.0), patch("time.sleep") as sleep:
+            self.assertEqual(bucket.acquire(), 0.0)
+            sleep.assert_not_called()
+
+            self.assertAlmostEqual(bucket.acquire(), 1.0)
+            sleep.assert_called_once()
+
+    def test_max_wait(self) -> None:
+        bucket = TokenBucket(self.path, capacity=1, period=1)
+        with patch("time.time", return_value=1000.0):
+            self.assertEqual(bucket.reserve(max_wait=0), 0.0)
+
+            # Budget would only be available in a second, nothing is taken
+            self.assertIsNone(bucket.reserve(max_wait=0.5))
+            self.assertAlmostEqual(bucket.fill_level, 0.0)
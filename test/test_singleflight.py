@@ -0,0 +1,107 @@
+import threading
+import time
+from unittest.mock import patch
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Query
+
+from ts3bot import metrics
+from ts3bot.database import models
+from ts3bot.singleflight import SingleFlight
+
+from ._base import BaseTest
+
+ARENANET_GUID = "4BBB52AA-D768-4FC6-8EDE-C299F2822F0F"
+
+
+class SingleFlightTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+
+    def test_shared_result(self) -> None:
+        flight: SingleFlight[int] = SingleFlight("test")
+        calls = []
+        results = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow() -> int:
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 42
+
+        def run() -> None:
+            results.append(flight.do("key", slow))
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+
+        # Finish the call once the others wait for it
+        deadline = time.monotonic() + 5
+        while (
+            metrics.counters.get("test.deduplicated", 0) < len(threads) - 1
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [42] * 4)
+        self.assertEqual(metrics.counters["test.deduplicated"], 3)
+
+    def test_shared_error(self) -> None:
+        flight: SingleFlight[int] = SingleFlight("test")
+
+        def fail() -> int:
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            flight.do("key", fail)
+
+        # Failed calls are not remembered
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+
+    def test_guild_insert_race(self) -> None:
+        def create(
+            guid: str, group_id: int | None = None, data: dict | None = None
+        ) -> models.Guild:
+            # Another process inserts the guild while we were fetching it
+            self.session.execute(
+                models.Guild.__table__.insert().values(
+                    guid=guid, name="ArenaNet", tag="ArenaNet"
+                )
+            )
+            return models.Guild(guid=guid, name="ArenaNet", tag="ArenaNet")
+
+        with patch.object(models.Guild, "create", side_effect=create):
+            guild = models.Guild.get_or_create(self.session, ARENANET_GUID, 5)
+
+        self.assertEqual(guild.group_id, 5)
+        self.assertEqual(self.session.query(models.Guild).count(), 1)
+
+    def test_guild_insert_race_not_visible(self) -> None:
+        def create(
+            guid: str, group_id: int | None = None, data: dict | None = None
+        ) -> models.Guild:
+            self.session.execute(
+                models.Guild.__table__.insert().values(
+                    guid=guid, name="ArenaNet", tag="ArenaNet"
+                )
+            )
+            return models.Guild(guid=guid, name="ArenaNet", tag="ArenaNet")
+
+        # The conflicting row is not visible to this transaction yet
+        with patch.object(models.Guild, "create", side_effect=create), patch.object(
+            Query, "one_or_none", return_value=None
+        ), self.assertRaises(IntegrityError):
+            models.Guild.get_or_create(self.session, ARENANET_GUID, 5)
+
+        # Only the failed insert was rolled back
+        self.assertEqual(self.session.query(models.Guild).count(), 1)
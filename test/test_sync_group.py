@@ -159,3 +159,68 @@ class CommonTest(BaseTest):
             self.mock_exec_calls["servergroupaddclient"][0]["params"],
             {"sgid": "1001", "cldbid": "1"},
         )
+
+    def test_sync_delta(self) -> None:
+        MOCK_RESPONSES["servergroupsbyclientid"] = [
+            {"name": "Generic World", "sgid": str(env.generic_world_id)},
+            {"name": "Kodash", "sgid": "2201"},
+        ]
+        unchanged = models.AccountUpdateDict(transfer=[], guilds=([], []))
+
+        # The first sync queries the groups and records them
+        sync_groups(self.bot, "1", self.account, update_result=unchanged)
+        self.assertEqual(list(self.mock_exec_calls.keys()), ["servergroupsbyclientid"])
+        synced = models.SyncedGroups.get(self.session, "1")
+        assert synced
+        self.assertEqual(synced.groups, {env.generic_world_id, 2201})
+
+        # Nothing changed, TS3 is not queried
+        self.mock_exec_calls.clear()
+        sync_groups(self.bot, "1", self.account, update_result=unchanged)
+        self.assertEqual(self.mock_exec_calls, {})
+
+        # The account changed
+        sync_groups(
+            self.bot,
+            "1",
+            self.account,
+            update_result=models.AccountUpdateDict(
+                transfer=[], guilds=(["Arenanet"], [])
+            ),
+        )
+        self.assertEqual(list(self.mock_exec_calls.keys()), ["servergroupsbyclientid"])
+
+        # The last full sync is too old
+        self.mock_exec_calls.clear()
+        synced.synced_at -= datetime.timedelta(hours=env.sync_full_hours)
+        sync_groups(self.bot, "1", self.account, update_result=unchanged)
+        self.assertEqual(list(self.mock_exec_calls.keys()), ["servergroupsbyclientid"])
+
+    def test_sync_delta_server_groups(self) -> None:
+        unchanged = models.AccountUpdateDict(transfer=[], guilds=([], []))
+        groups = [
+            {"name": "Generic World", "sgid": str(env.generic_world_id)},
+            {"name": "Kodash", "sgid": "2201"},
+        ]
+        sync_groups(self.bot, "1", self.account, update_result=unchanged)
+        self.mock_exec_calls.clear()
+
+        # The client's groups match
+        sync_groups(
+            self.bot, "1", self.account, server_groups=groups, update_result=unchanged
+        )
+        self.assertEqual(self.mock_exec_calls, {})
+
+        # An admin removed the world group since the last sync
+        sync_groups(
+            self.bot,
+            "1",
+            self.account,
+            server_groups=groups[:1],
+            update_result=unchanged,
+        )
+        self.assertEqual(list(self.mock_exec_calls.keys()), ["servergroupaddclient"])
+        self.assertEqual(
+            self.mock_exec_calls["servergroupaddclient"][0]["params"],
+            {"sgid": "2201", "cldbid": "1"},
+        )
@@ -0,0 +1,132 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from ts3bot import metrics
+from ts3bot.database import enums, models
+from ts3bot.database.unit_of_work import WriteBatch, after_commit, commit, savepoint
+
+from ._base import BaseTest, sample_data
+
+
+class WriteBatchTest(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset()
+
+        self.commits = 0
+
+        def count(_: object) -> None:
+            self.commits += 1
+
+        event.listen(self.session, "after_commit", count)
+        self.addCleanup(event.remove, self.session, "after_commit", count)
+
+    def add_account(self, idx: int) -> None:
+        self.session.add(
+            models.Account(
+                name=f"User.{idx}",
+                world=enums.World.KODASH,
+                api_key=sample_data.API_KEY_VALID,
+                last_check=datetime(2020, 1, 1),
+            )
+        )
+        commit(self.session)
+
+    def test_size(self) -> None:
+        with WriteBatch(self.session, size=2, interval=60) as batch:
+            for idx in range(3):
+                self.add_account(idx)
+                batch.done()
+            # Only the first two accounts were committed so far
+            self.assertEqual(self.commits, 1)
+
+        self.assertEqual(self.commits, 2)
+        self.assertEqual(self.session.query(models.Account).count(), 3)
+        self.assertEqual(metrics.counters["write_batch.committed"], 3)
+
+        # Commits are not batched anymore
+        self.add_account(3)
+        self.assertEqual(self.commits, 3)
+
+    def test_interval(self) -> None:
+        with patch("time.monotonic", return_value=0.0):
+            batch = WriteBatch(self.session, size=100, interval=5)
+        with batch:
+            self.add_account(0)
+            with patch("time.monotonic", return_value=6.0):
+                batch.done()
+            self.assertEqual(self.commits, 1)
+
+    def test_failed_commit(self) -> None:
+        with WriteBatch(self.session, size=100, interval=60) as batch:
+            self.add_account(0)
+            batch.done()
+
+            with patch.object(
+                self.session, "commit", side_effect=OperationalError("", {}, None)
+            ):
+                batch.commit()
+
+        # The account is processed again next time
+        self.assertEqual(self.session.query(models.Account).count(), 0)
+        self.assertEqual(metrics.counters["write_batch.discarded"], 1)
+
+    def test_exception(self) -> None:
+        with self.assertRaises(RuntimeError), WriteBatch(
+            self.session, size=100, interval=60
+        ) as batch:
+            self.add_account(0)
+            batch.done()
+            raise RuntimeError()
+
+        self.assertEqual(self.session.query(models.Account).count(), 0)
+        self.assertEqual(self.commits, 0)
+
+    def test_savepoint(self) -> None:
+        with WriteBatch(self.session, size=100, interval=60) as batch:
+            self.add_account(0)
+            batch.done()
+
+            # A conflicting account only loses its own changes
+            with self.assertRaises(IntegrityError), savepoint(self.session):
+                self.add_account(0)
+
+            with savepoint(self.session):
+                self.add_account(1)
+            batch.done()
+
+        self.assertEqual(self.session.query(models.Account).count(), 2)
+        self.assertEqual(metrics.counters["write_batch.failed"], 1)
+        self.assertEqual(metrics.counters["write_batch.committed"], 2)
+
+    def test_after_commit(self) -> None:
+        callback = MagicMock()
+
+        # Without a batch the changes are committed already
+        after_commit(self.session, callback)
+        self.assertEqual(callback.call_count, 1)
+
+        with WriteBatch(self.session, size=100, interval=60) as batch:
+            after_commit(self.session, callback)
+            self.assertEqual(callback.call_count, 1)
+
+            batch.commit()
+            self.assertEqual(callback.call_count, 2)
+
+            # Callbacks of discarded changes are dropped
+            after_commit(self.session, callback)
+            with patch.object(
+                self.session, "commit", side_effect=OperationalError("", {}, None)
+            ):
+                batch.commit()
+
+        with self.assertRaises(RuntimeError), WriteBatch(
+            self.session, size=100, interval=60
+        ):
+            after_commit(self.session, callback)
+            raise RuntimeError()
+
+        self.assertEqual(callback.call_count, 2)
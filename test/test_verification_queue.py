@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import patch
+
+from ts3bot.verification_queue import VerificationQueue
+
+
+class VerificationQueueTest(unittest.TestCase):
+    def test_backoff(self) -> None:
+        queue = VerificationQueue(base_delay=10, max_delay=25, max_attempts=3)
+        with patch("time.monotonic", return_value=1000.0):
+            self.assertTrue(queue.defer("uid", "1", "5"))
+            self.assertAlmostEqual(queue.next_due(), 10.0)
+            self.assertEqual(queue.pop_due(), [])
+
+            # Clients are only queued once
+            self.assertTrue(queue.defer("uid", "1", "5"))
+            self.assertEqual(len(queue), 1)
+
+        with patch("time.monotonic", return_value=1010.0):
+            due = queue.pop_due()
+            self.assertEqual([p["cldbid"] for p in due], ["1"])
+            self.assertEqual(due[0]["attempts"], 1)
+            self.assertIsNone(queue.next_due())
+
+            # Delay is doubled and capped
+            queue.defer("uid", "1", "5", attempts=2)
+            self.assertAlmostEqual(queue.next_due(), 25.0)
+
+    def test_dropped(self) -> None:
+        queue = VerificationQueue(max_attempts=2)
+        self.assertFalse(queue.defer("uid", "1", "5", attempts=2))
+        self.assertEqual(len(queue), 0)
@@ -1,36 +1,73 @@
 import logging.handlers
-import time
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import Any, Literal, TypedDict, cast
 
 import requests
 import ts3  # type: ignore
+from pydantic import Field
 from pydantic.main import BaseModel
-from sqlalchemy.orm import load_only
 
 from ts3bot import bot as ts3_bot
-from ts3bot import events
+from ts3bot import events, metrics
+from ts3bot.account_cache import AccountCache
+from ts3bot.api_client import (
+    ApiClient,
+    ApiErrBadDataError,
+    InvalidKeyError,
+    NotFoundError,
+    RateLimitError,
+)
+from ts3bot.cache import ResponseCache
+from ts3bot.circuit_breaker import CircuitBreaker, CircuitOpenError
+from ts3bot.config import env
 from ts3bot.database import models
-from ts3bot.utils import VERSION, data_path
-
-# Global session
-session = requests.Session()
-
-
-class NotFoundError(Exception):
-    pass
-
-
-class RateLimitError(Exception):
-    pass
-
-
-class InvalidKeyError(Exception):
-    pass
-
-
-class ApiErrBadDataError(Exception):
-    pass
+from ts3bot.database.unit_of_work import commit
+from ts3bot.group_registry import GroupRegistry
+from ts3bot.negative_cache import NegativeCache
+from ts3bot.ratelimit import TokenBucket
+from ts3bot.utils import data_path
+
+# API client shared by all threads, its budget is shared with other processes
+api = ApiClient(
+    env.api_base_url,
+    rate_limiter=TokenBucket(
+        data_path("api_ratelimit.json", create=False),
+        env.api_rate_limit,
+        env.api_rate_period,
+    ),
+    cache=ResponseCache(
+        env.api_cache_ttls,
+        env.api_cache_size,
+        data_path("api_cache", is_folder=True, create=False)
+        if env.api_cache_disk
+        else None,
+    ),
+    pool_size=max(env.api_concurrency, env.api_pool_size),
+    connect_timeout=env.api_connect_timeout,
+    read_timeout=env.api_read_timeout,
+    breaker=CircuitBreaker(
+        env.api_circuit_threshold,
+        env.api_circuit_cooldown,
+        env.api_circuit_max_cooldown,
+    ),
+    retry_base=env.api_retry_base,
+    retry_max=env.api_retry_max,
+    negative_cache=NegativeCache(
+        env.api_negative_cache_ttl,
+        env.api_negative_cache_size,
+        data_path("api_negative_cache.json", create=False),
+    ),
+)
+
+# Server groups managed by the bot, shared by all threads
+managed_groups = GroupRegistry(data_path("managed_groups.version", create=False))
+
+# Accounts of online clients, shared by all threads
+accounts = AccountCache(
+    env.account_cache_size,
+    env.account_cache_seconds,
+    data_path("account_versions.json", create=False),
+)
 
 
 class ServerGroup(TypedDict):
@@ -43,81 +80,6 @@ class SyncGroupChanges(TypedDict):
     added: list[str]
 
 
-def limit_fetch_api(
-    endpoint: str,
-    api_key: str | None = None,
-    level: int = 0,
-    exc: Exception | None = None,
-) -> dict:
-    if level >= 3:
-        if isinstance(exc, RateLimitError):
-            raise RateLimitError("Encountered rate limit after waiting 3 times.")
-        else:
-            raise ApiErrBadDataError(
-                "Encountered ErrBadData even after retrying 3 times."
-            )
-
-    try:
-        return fetch_api(endpoint, api_key)
-    except ApiErrBadDataError as e:
-        logging.warning("Got ErrBadData from API, retrying.")
-        return limit_fetch_api(endpoint, api_key, level=level + 1, exc=e)
-    except RateLimitError as e:
-        logging.warning("Got rate-limited, waiting 1 minute.")
-        time.sleep(60)
-        return limit_fetch_api(endpoint, api_key, level=level + 1, exc=e)
-
-
-def fetch_api(endpoint: str, api_key: str | None = None) -> dict[str, Any]:
-    """
-
-    :param endpoint: The API (v2) endpoint to request
-    :param api_key: Optional api key
-    :return: Optional[dict]
-    :raises InvalidKeyError An invalid API key was given
-    :raises NotFoundError The endpoint was not found
-    :raises RateLimitError Rate limit of 600/60s was hit, try again later
-    :raises RequestException API on fire
-    """
-    session.headers.update(
-        {
-            "User-Agent": f"github/AxForest/teamspeak_bot@{VERSION}",
-            "Accept": "application/json",
-            "Accept-Language": "en",
-            "X-Schema-Version": "2019-12-19T00:00:00.000Z",
-        }
-    )
-
-    # Set API key
-    if api_key:
-        session.headers.update({"Authorization": f"Bearer {api_key}"})
-    elif "authorization" in session.headers:
-        del session.headers["authorization"]
-
-    response = session.get(f"https://api.guildwars2.com/v2/{endpoint}")
-
-    if (
-        400 <= response.status_code < 500
-        and api_key
-        and ("Invalid" in response.text or "invalid" in response.text)
-    ):  # Invalid API key
-        raise InvalidKeyError()
-
-    if response.status_code == 400 and "ErrBadData" in response.text:
-        raise ApiErrBadDataError()
-
-    if response.status_code == 200:
-        return cast(dict[str, Any], response.json())
-    elif response.status_code == 404:
-        raise NotFoundError()
-    elif response.status_code == 429:  # Rate limit
-        raise RateLimitError()
-
-    logging.warning(response.text)
-    logging.exception("Failed to fetch API")
-    raise requests.RequestException()  # API down
-
-
 def timedelta_hours(td: timedelta) -> float:
     """
     Convert a timedelta to hours with up to two digits after comma.
@@ -129,6 +91,32 @@ def timedelta_hours(td: timedelta) -> float:
     return round(td.days * 24 + td.seconds / 3600, 2)
 
 
+def get_cldbid(bot: ts3_bot.Bot, uid: str) -> str:
+    """
+    Returns the client database id of a unique id. It is stored on the identity,
+    TS3 is only asked if it is not known yet.
+
+    :param bot: The current bot instance
+    :param uid: The client's unique id
+    :return: The client database id
+    :raises ts3.TS3Error: The client is not known to TS3
+    """
+    identity = (
+        bot.session.query(models.Identity)
+        .filter(models.Identity.guid == uid)
+        .one_or_none()
+    )
+    if identity and identity.cldbid is not None:
+        return str(identity.cldbid)
+
+    metrics.incr("identity.cldbid_lookup")
+    cldbid = bot.exec_("clientgetdbidfromuid", cluid=uid)[0]["cldbid"]
+    if identity:
+        identity.cldbid = int(cldbid)
+        commit(bot.session)
+    return str(cldbid)
+
+
 def transfer_registration(  # noqa: PLR0913
     bot: ts3_bot.Bot,
     account: models.Account,
@@ -156,9 +144,7 @@ def transfer_registration(  # noqa: PLR0913
     # Get database id if necessary
     if not target_dbid:
         try:
-            target_dbid = cast(
-                str, bot.exec_("clientgetdbidfromuid", cluid=event.uid)[0]["cldbid"]
-            )
+            target_dbid = get_cldbid(bot, event.uid)
         except ts3.TS3Error:
             # User might not exist in the db
             logging.exception("Failed to get database id from event's user")
@@ -180,9 +166,7 @@ def transfer_registration(  # noqa: PLR0913
     if previous_identity:
         # Get cldbid and sync groups
         try:
-            cldbid = bot.exec_(
-                "clientgetdbidfromuid", cluid=previous_identity.identity.guid
-            )[0]["cldbid"]
+            cldbid = get_cldbid(bot, previous_identity.identity.guid)
 
             result = sync_groups(bot, cldbid, account, remove_all=True)
 
@@ -217,6 +201,7 @@ def transfer_registration(  # noqa: PLR0913
         ).update({"is_active": True})
 
     bot.session.commit()
+    accounts.invalidate(account.id)
 
     # Sync group
     sync_groups(bot, target_dbid, account)
@@ -247,14 +232,47 @@ def set_client_description(bot: ts3_bot.Bot, clid: str, description: str) -> Non
         )
 
 
-def sync_groups(  # noqa: PLR0912, PLR0915
+def expected_groups(bot: ts3_bot.Bot, account: models.Account | None) -> set[int]:
+    """
+    Returns the ids of the managed groups sync_groups would leave the account's
+    clients with
+    """
+
+    if not account or not account.is_valid:
+        return set()
+
+    groups = {cast(int, link.guild.group_id) for link in account.guild_groups()}
+    world_group = account.world_group(bot.session)
+    if groups:
+        groups.add(env.generic_guild_id)
+    elif world_group and world_group.is_linked:
+        groups.add(env.generic_world_id)
+    if world_group:
+        groups.add(world_group.group_id)
+    return groups
+
+
+def sync_groups(  # noqa: PLR0912, PLR0913, PLR0915
     bot: ts3_bot.Bot,
     cldbid: str,
     account: models.Account | None,
     remove_all: bool = False,
     skip_whitelisted: bool = False,
+    server_groups: list[dict] | None = None,
+    update_result: models.AccountUpdateDict | None = None,
 ) -> SyncGroupChanges:
-    from ts3bot.config import env
+    """
+    Adds and removes the client's managed groups to match the account
+
+    :param server_groups: The client's current groups, queried if not given. Must
+                          contain at least all managed and additional guild groups.
+    :param update_result: The result of refreshing the account just now. If it
+                          changed nothing and the client's groups already match,
+                          nothing is changed. Without server_groups the groups of
+                          the client's last sync are compared instead and TS3 is
+                          not queried at all, clients are still synced every
+                          sync_full_hours.
+    """
 
     def _add_group(group: ServerGroup) -> bool:
         """
@@ -309,7 +327,39 @@ def sync_groups(  # noqa: PLR0912, PLR0915
                 )
         return False
 
-    server_groups = bot.exec_("servergroupsbyclientid", cldbid=cldbid)
+    if (
+        update_result is not None
+        and not remove_all
+        and not update_result["transfer"]
+        and not any(update_result["guilds"])
+    ):
+        expected = expected_groups(bot, account)
+        if server_groups is not None:
+            # The client's actual groups are known, an admin may have changed them
+            current = {int(_["sgid"]) for _ in server_groups} & managed_groups.get(
+                bot.session
+            ).known_ids
+            in_sync = current == expected and (
+                env.generic_guild_id in expected
+                or not any(
+                    _["name"] in env.additional_guild_groups for _ in server_groups
+                )
+            )
+        else:
+            synced = models.SyncedGroups.get(bot.session, cldbid)
+            in_sync = bool(
+                synced
+                and timedelta_hours(datetime.now() - synced.synced_at)
+                < env.sync_full_hours
+                and synced.groups == expected
+            )
+
+        if in_sync:
+            metrics.incr("sync_groups.skipped")
+            return {"removed": [], "added": []}
+
+    if server_groups is None:
+        server_groups = bot.exec_("servergroupsbyclientid", cldbid=cldbid)
     server_group_ids = [int(_["sgid"]) for _ in server_groups]
 
     group_changes: SyncGroupChanges = {"removed": [], "added": []}
@@ -328,18 +378,9 @@ def sync_groups(  # noqa: PLR0912, PLR0915
     valid_guild_mapper = {g.guild.group_id: g for g in valid_guild_groups}
 
     # Get all valid groups
-    world_groups: list[int] = [
-        _.group_id
-        for _ in bot.session.query(models.WorldGroup).options(
-            load_only(models.WorldGroup.group_id)
-        )
-    ]
-    guild_groups: list[int] = [
-        _.group_id
-        for _ in bot.session.query(models.Guild)
-        .filter(models.Guild.group_id.isnot(None))
-        .options(load_only(models.Guild.group_id))
-    ]
+    managed = managed_groups.get(bot.session)
+    world_groups = managed.world_ids
+    guild_groups = managed.guild_ids
     generic_world = ServerGroup(sgid=env.generic_world_id, name="Generic World")
     generic_guild = ServerGroup(sgid=env.generic_guild_id, name="Generic Guild")
 
@@ -444,6 +485,14 @@ def sync_groups(  # noqa: PLR0912, PLR0915
             )
         )
 
+    # Remember the result for delta-aware syncs
+    models.SyncedGroups.record(
+        bot.session,
+        cldbid,
+        set(server_group_ids) & managed.known_ids,
+    )
+    commit(bot.session)
+
     return group_changes
 
 
@@ -454,6 +503,10 @@ class User(BaseModel):
     nickname: str
     country: str
     total_connections: int
+    # Server group ids, None if unknown
+    server_groups: list[str] | None = Field(None, repr=False)
+    # Milliseconds since the client's last activity, -1 if unknown
+    idle_time: int = Field(-1, repr=False)
 
     @property
     def locale(self) -> Literal["de", "en"]:
@@ -28,6 +28,35 @@ if __name__ == "__main__":
         action="store_true",
     )
     sub_cycle.add_argument("--world", help="Verify world (id)", type=int)
+    sub_cycle.add_argument(
+        "--online-budget",
+        help=(
+            "Amount of online users whose accounts are checked first, defaults "
+            "to cycle_online_budget"
+        ),
+        type=int,
+    )
+    sub_cycle.add_argument(
+        "--incremental",
+        help=(
+            "With --ts3, skip clients that did not connect since the last run, "
+            "all clients are verified every cycle_full_sweep_days"
+        ),
+        action="store_true",
+    )
+    sub_cycle.add_argument(
+        "--by-group",
+        help=(
+            "With --ts3, only visit members of managed groups instead of every "
+            "known client"
+        ),
+        action="store_true",
+    )
+    sub_cycle.add_argument(
+        "--concurrency",
+        help="Amount of concurrent API requests, defaults to api_concurrency",
+        type=int,
+    )
     sub.add_parser("bot", help="Runs the main bot")
 
     args = parser.parse_args()
@@ -43,6 +72,10 @@ if __name__ == "__main__":
             verify_linked_worlds=args.relink,
             verify_ts3=args.ts3,
             verify_world=args.world,
+            concurrency=args.concurrency,
+            by_group=args.by_group,
+            incremental=args.incremental,
+            online_budget=args.online_budget,
         ).run()
     else:
         parser.print_help()
@@ -0,0 +1,188 @@
+"""
+Snapshots of the accounts of online clients by their unique id, so repeated
+joins and commands don't have to load the account, its guilds and its world
+group again. Snapshots are plain values, the bot's session is closed between
+events. Writes to an account invalidate its snapshot. Processes share a
+version per account in a file under data_path(), so changes made by other
+processes are picked up on the next lookup, as are changed managed groups.
+"""
+
+import datetime
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+import ts3bot
+from ts3bot import metrics
+from ts3bot.database import enums, models
+from ts3bot.shared_version import SharedVersions
+
+
+class GuildLink:
+    def __init__(  # noqa: PLR0913
+        self, link_id: int, name: str, tag: str, group_id: int | None, is_active: bool
+    ) -> None:
+        self.link_id = link_id
+        self.name = name
+        self.tag = tag
+        self.group_id = group_id
+        self.is_active = is_active
+
+
+class AccountSnapshot:
+    def __init__(
+        self,
+        account: models.Account,
+        guilds: list[GuildLink],
+        world_group: models.WorldGroup | None,
+    ) -> None:
+        self.account_id: int = account.id
+        self.name: str = account.name
+        self.world: enums.World = account.world
+        self.api_key: str = account.api_key
+        self.is_valid: bool = account.is_valid
+        self.last_check: datetime.datetime = account.last_check
+        self.guilds = guilds
+        self.world_group_id = world_group.group_id if world_group else None
+        self.world_is_linked = bool(world_group and world_group.is_linked)
+
+    @property
+    def guild_groups(self) -> list[GuildLink]:
+        """Guilds that have a server group, see Account.guild_groups()"""
+        return [link for link in self.guilds if link.group_id is not None]
+
+    @property
+    def active_guild_groups(self) -> list[GuildLink]:
+        return [link for link in self.guild_groups if link.is_active]
+
+    def load(self, session: Session) -> models.Account:
+        """Returns the account itself, e.g. to update it"""
+        return session.get(models.Account, self.account_id)
+
+
+class AccountCache:
+    def __init__(self, size: int, ttl: float, path: Path | None = None) -> None:
+        """
+        :param size: Maximum amount of snapshots, the oldest ones are dropped
+        :param ttl: Seconds until a snapshot is loaded again
+        :param path: File that holds the shared versions, memory-only if None
+        """
+        self.size = size
+        self.ttl = ttl
+        self._snapshots: OrderedDict[
+            str, tuple[AccountSnapshot, float, tuple[int, int]]
+        ] = OrderedDict()
+        self._versions = SharedVersions(size, path)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        # Increased by invalidate(), snapshots loaded meanwhile are not kept
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def get(self, session: Session, uid: str) -> AccountSnapshot | None:
+        """
+        Returns the snapshot of the account linked to the unique id, it is
+        loaded if necessary. Clients without an account are not cached.
+        """
+
+        groups_version = ts3bot.managed_groups.version()
+        versions = self._versions.get_all()
+        with self._lock:
+            entry = self._snapshots.get(uid)
+            if (
+                entry
+                and entry[1] > time.monotonic()
+                and entry[2]
+                == (groups_version, versions.get(str(entry[0].account_id), 0))
+            ):
+                self._snapshots.move_to_end(uid)
+                self._record(hit=True)
+                return entry[0]
+            self._record(hit=False)
+            generation = self._generation
+
+        account = models.Account.get_by_identity(session, uid)
+        if not account:
+            self.discard(uid)
+            return None
+
+        snapshot = AccountSnapshot(
+            account,
+            [
+                GuildLink(*row)
+                for row in session.query(
+                    models.LinkAccountGuild.id,
+                    models.Guild.name,
+                    models.Guild.tag,
+                    models.Guild.group_id,
+                    models.LinkAccountGuild.is_active,
+                )
+                .join(models.Guild)
+                .filter(models.LinkAccountGuild.account_id == account.id)
+                .order_by(models.Guild.tag)
+            ],
+            account.world_group(session),
+        )
+
+        version = (groups_version, versions.get(str(account.id), 0))
+        with self._lock:
+            if generation != self._generation:
+                return snapshot
+
+            self._snapshots[uid] = (snapshot, time.monotonic() + self.ttl, version)
+            self._snapshots.move_to_end(uid)
+            while len(self._snapshots) > self.size:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self._hits += 1
+            metrics.incr("account_cache.hit")
+        else:
+            self._misses += 1
+            metrics.incr("account_cache.miss")
+        metrics.gauge(
+            "account_cache.hit_rate", round(self._hits / (self._hits + self._misses), 3)
+        )
+
+    def discard(self, uid: str) -> None:
+        """Drops the snapshot of a unique id, e.g. when the client left"""
+
+        with self._lock:
+            self._snapshots.pop(uid, None)
+
+    def invalidate(self, account_id: int, shared: bool = True) -> None:
+        """
+        Drops all snapshots of an account, call after changing it
+
+        :param shared: Make the other processes drop their snapshots as well,
+                       see publish()
+        """
+
+        if shared:
+            self.publish([account_id])
+
+        with self._lock:
+            self._generation += 1
+            for uid in [
+                uid
+                for uid, (snapshot, _, _) in self._snapshots.items()
+                if snapshot.account_id == account_id
+            ]:
+                del self._snapshots[uid]
+
+    def publish(self, account_ids: Iterable[int]) -> None:
+        """
+        Makes the other processes drop their snapshots of the accounts, call
+        once the changes are committed
+        """
+
+        self._versions.bump(str(account_id) for account_id in account_ids)
@@ -0,0 +1,338 @@
+"""
+Client for the GW2 API, safe to share between threads.
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from typing import Any, cast
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ts3bot import deadline, metrics
+from ts3bot.cache import ResponseCache
+from ts3bot.circuit_breaker import CircuitBreaker
+from ts3bot.negative_cache import NegativeCache
+from ts3bot.ratelimit import TokenBucket
+from ts3bot.utils import VERSION
+
+
+class NotFoundError(Exception):
+    pass
+
+
+class RateLimitError(Exception):
+    def __init__(self, *args: Any, retry_after: float | None = None) -> None:
+        super().__init__(*args)
+        self.retry_after = retry_after
+
+
+class InvalidKeyError(Exception):
+    pass
+
+
+class ApiErrBadDataError(Exception):
+    pass
+
+
+class ApiClient:
+    def __init__(  # noqa: PLR0913
+        self,
+        base_url: str,
+        rate_limiter: TokenBucket,
+        cache: ResponseCache,
+        pool_size: int = 10,
+        connect_timeout: float = 5,
+        read_timeout: float = 30,
+        breaker: CircuitBreaker | None = None,
+        retry_base: float = 1,
+        retry_max: float = 60,
+        negative_cache: NegativeCache | None = None,
+    ) -> None:
+        """
+        :param base_url: The API's base URL, without a trailing slash
+        :param rate_limiter: Budget that has to be acquired before each request
+        :param cache: Cache for unauthenticated responses
+        :param pool_size: Amount of kept-alive connections per host
+        :param connect_timeout: Seconds to wait for a connection
+        :param read_timeout: Seconds to wait for a response
+        :param breaker: Stops requests while the API is down
+        :param retry_base: Seconds to back off before the first retry
+        :param retry_max: Upper bound of the backoff
+        :param negative_cache: API keys that were rejected recently
+        """
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.negative_cache = negative_cache or NegativeCache(ttl=0, size=0)
+
+        # The session is only configured here, requests don't modify it. It is
+        # also used for other hosts, GW2-specific headers are sent by fetch()
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "User-Agent": f"github/AxForest/teamspeak_bot@{VERSION}",
+                "Connection": "keep-alive",
+            }
+        )
+        self.api_headers = {
+            "Accept": "application/json",
+            "Accept-Language": "en",
+            "X-Schema-Version": "2019-12-19T00:00:00.000Z",
+        }
+        self.pool_size = pool_size
+        self._adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+    def grow_pool(self, pool_size: int) -> None:
+        """
+        Keeps up to pool_size connections per host, e.g. for more concurrent
+        requests. Requests wait for a free connection, so the pool limits how
+        many are in flight. It is never shrunk.
+        """
+        if pool_size <= self.pool_size:
+            return
+
+        adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        for prefix, mounted in list(self.session.adapters.items()):
+            if mounted is self._adapter:
+                self.session.mount(prefix, adapter)
+        self._adapter = adapter
+        self.pool_size = pool_size
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        """
+        Requests an arbitrary URL using the connection pool and timeouts, without
+        the API's headers or rate limit
+        """
+
+        connect_timeout, read_timeout = kwargs.pop("timeout", self.timeout)
+        kwargs["timeout"] = (deadline.cap(connect_timeout), deadline.cap(read_timeout))
+
+        try:
+            return self.session.get(url, **kwargs)
+        except requests.Timeout:
+            # Turn timeouts caused by the deadline into deadline errors
+            if (current := deadline.current()) is not None:
+                current.check()
+            raise
+
+    def backoff(self, level: int, retry_after: float | None = None) -> None:
+        """
+        Sleeps before a retry, either as long as the API asked for or a random
+        time up to an exponentially growing limit
+
+        :raises DeadlineExceededError: The wait would exceed the current deadline
+        """
+        if retry_after is None:
+            retry_after = random.uniform(
+                0, min(self.retry_max, self.retry_base * 2**level)
+            )
+
+        if (current := deadline.current()) is not None and retry_after > (
+            current.check()
+        ):
+            current.fail()
+
+        metrics.incr("api.retries")
+        time.sleep(retry_after)
+
+    def limit_fetch(
+        self,
+        endpoint: str,
+        api_key: str | None = None,
+        level: int = 0,
+        exc: Exception | None = None,
+    ) -> dict:
+        if level > 0 and (current := deadline.current()) is not None:
+            current.check()
+
+        if level >= 3:
+            if isinstance(exc, RateLimitError):
+                raise RateLimitError("Encountered rate limit after waiting 3 times.")
+            elif isinstance(exc, ApiErrBadDataError):
+                raise ApiErrBadDataError(
+                    "Encountered ErrBadData even after retrying 3 times."
+                )
+            raise cast(Exception, exc)
+
+        try:
+            return self.fetch(endpoint, api_key)
+        except ApiErrBadDataError as e:
+            logging.warning("Got ErrBadData from API, retrying.")
+            self.backoff(level)
+            return self.limit_fetch(endpoint, api_key, level=level + 1, exc=e)
+        except RateLimitError as e:
+            # Another client used up the budget, block all processes until the
+            # API allows requests again, a full period if it didn't say
+            logging.warning("Got rate-limited, waiting for the rate limiter.")
+            retry_after = (
+                e.retry_after if e.retry_after is not None else self.rate_limiter.period
+            )
+            self.rate_limiter.drain(block_for=retry_after)
+            self.backoff(level, retry_after)
+            return self.limit_fetch(endpoint, api_key, level=level + 1, exc=e)
+        except (requests.HTTPError, requests.ConnectionError, requests.Timeout) as e:
+            # Retry server and connection errors, the circuit breaker takes
+            # over once they persist
+            if isinstance(e, deadline.DeadlineExceededError) or (
+                isinstance(e, requests.HTTPError)
+                and (e.response is None or e.response.status_code < 500)
+            ):
+                raise
+            logging.warning("API request failed (%s), retrying.", e)
+            self.backoff(level)
+            return self.limit_fetch(endpoint, api_key, level=level + 1, exc=e)
+
+    async def async_limit_fetch(
+        self, endpoint: str, api_key: str | None = None
+    ) -> dict:
+        """
+        Same as limit_fetch, but runs the request in the event loop's executor.
+        The amount of requests in flight is bounded by the executor's size and
+        the shared rate limiter.
+        """
+        return await asyncio.to_thread(self.limit_fetch, endpoint, api_key)
+
+    async def async_fetch(
+        self, endpoint: str, api_key: str | None = None
+    ) -> dict[str, Any]:
+        """
+        Same as fetch, but runs the request in the event loop's executor.
+        """
+        return await asyncio.to_thread(self.fetch, endpoint, api_key)
+
+    def fetch(  # noqa: PLR0912,PLR0915
+        self,
+        endpoint: str,
+        api_key: str | None = None,
+        revalidate: bool = False,
+        bypass_negative_cache: bool = False,
+    ) -> dict[str, Any]:
+        """
+
+        :param endpoint: The API (v2) endpoint to request
+        :param api_key: Optional api key
+        :param revalidate: Check a cached response with the API even if it's fresh
+        :param bypass_negative_cache: Ask the API even if the key was rejected recently
+        :return: Optional[dict]
+        :raises InvalidKeyError An invalid API key was given
+        :raises NotFoundError The endpoint was not found
+        :raises RateLimitError Rate limit of 600/60s was hit, try again later
+        :raises CircuitOpenError The API failed too often, try again later
+        :raises RequestException API on fire
+        """
+        # Only unauthenticated responses are shared
+        cacheable = not api_key and self.cache.ttl(endpoint) > 0
+        entry = self.cache.get(endpoint) if cacheable else None
+        if entry and not revalidate and self.cache.is_fresh(entry):
+            metrics.incr("api_cache.hit")
+            return entry["data"]
+        elif cacheable:
+            metrics.incr("api_cache.miss")
+
+        # Answer right away if the key was rejected recently
+        if api_key and not bypass_negative_cache and api_key in self.negative_cache:
+            metrics.incr("api_negative_cache.hit")
+            raise InvalidKeyError()
+
+        # Headers are passed per request, the session is shared between threads
+        headers = dict(self.api_headers)
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+
+        # Ask the API whether the cached response is still valid
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        # Don't spend any budget while the API is down
+        self.breaker.before_request()
+        try:
+            # Wait for our share of the rate limit, unless it's longer than the deadline
+            if (current := deadline.current()) is None:
+                self.rate_limiter.acquire()
+            elif self.rate_limiter.acquire(max_wait=current.check()) is None:
+                current.fail()
+
+            response = self.get(f"{self.base_url}/{endpoint}", headers=headers)
+        except deadline.DeadlineExceededError:
+            self.breaker.record_aborted()
+            raise
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        if response.status_code == 304 and entry:
+            metrics.incr("api_cache.revalidated")
+            self.cache.refresh(endpoint, entry)
+            return entry["data"]
+
+        if (
+            400 <= response.status_code < 500
+            and api_key
+            and ("Invalid" in response.text or "invalid" in response.text)
+        ):  # Invalid API key
+            self.negative_cache.add(api_key)
+            raise InvalidKeyError()
+
+        if response.status_code == 400 and "ErrBadData" in response.text:
+            raise ApiErrBadDataError()
+
+        if response.status_code == 200:
+            data = cast(dict[str, Any], response.json())
+            if api_key and bypass_negative_cache:
+                self.negative_cache.discard(api_key)
+            if cacheable:
+                self.cache.put(
+                    endpoint,
+                    data,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+            return data
+        elif response.status_code == 404:
+            raise NotFoundError()
+        elif response.status_code == 429:
+            raise RateLimitError(retry_after=_retry_after(response))
+
+        logging.warning(response.text)
+        logging.exception("Failed to fetch API")
+        raise requests.HTTPError(
+            f"API returned {response.status_code}", response=response
+        )  # API down
+
+
+def _retry_after(response: requests.Response) -> float | None:
+    """Parses the Retry-After header, given in seconds or as a date"""
+
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(
+            0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        )
+    except (TypeError, ValueError):
+        return None
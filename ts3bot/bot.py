@@ -1,23 +1,32 @@
 import datetime
 import logging
 import re
+import time
 import types
+from collections.abc import Callable
 from importlib import import_module
 from pathlib import Path
 from re import Match
-from typing import Any, AnyStr, cast
+from typing import Any, AnyStr, TypeVar, cast
 
 import i18n  # type: ignore
 import requests
 import ts3  # type: ignore
 from sqlalchemy import exc
-from sqlalchemy.orm import Session, load_only
+from sqlalchemy.orm import Session
 from ts3.response import TS3QueryResponse  # type: ignore
 
 import ts3bot
-from ts3bot import commands, events
+from ts3bot import commands, deadline, events, metrics
 from ts3bot.config import env
 from ts3bot.database import models
+from ts3bot.online_clients import OnlineClients
+from ts3bot.verification_queue import VerificationQueue
+
+# Seconds between metric summaries in the log
+METRICS_INTERVAL = 3600
+
+T = TypeVar("T")
 
 
 class Command(types.ModuleType):
@@ -34,7 +43,11 @@ class Bot:
     def __init__(
         self, session: Session, connect: bool = True, is_cycle: bool = False
     ) -> None:
-        self.users: dict[str, ts3bot.User] = {}
+        self.users = OnlineClients(env.online_clients_size)
+        self.next_reconcile = 0.0
+        # Server group names by sgid, see resolve_server_groups()
+        self.server_group_names: dict[int, str] = {}
+        self.verification_queue = VerificationQueue()
         self.session = session
         self.is_cycle = is_cycle
 
@@ -111,20 +124,58 @@ class Bot:
             if current_nick[0]["client_channel_id"] != env.channel_id:
                 self.exec_("clientmove", clid=self.own_id, cid=env.channel_id)
 
+            # Events keep the clients up to date from now on
+            self.reconcile_clients()
+
     def exec_(self, cmd: str, *options: Any, **params: Any) -> TS3QueryResponse:
         if not self.ts3c:
             raise ConnectionError("Not connected yet.")
 
-        return self.ts3c.exec_(cmd, *options, **params)
+        # Wait as long as the current deadline allows, if there is one
+        if (current := deadline.current()) is None:
+            return self.ts3c.exec_(cmd, *options, **params)
+
+        try:
+            return self.ts3c.exec_query(
+                self.ts3c.query(cmd, *options, **params), timeout=current.check()
+            )
+        except ts3.query.TS3TimeoutError:
+            # The response is still pending, reconnect to get back in sync
+            logging.warning("Query %s exceeded the deadline, reconnecting", cmd)
+            self.ts3c.close()
+            with deadline.scope("reconnect", env.command_timeout):
+                self.connect()
+            current.fail()
+            raise
 
     def loop(self) -> None:
         if not self.ts3c:
             raise ConnectionError("Not connected yet.")
 
+        last_metrics = time.monotonic()
         while True:
             self.ts3c.send_keepalive()
+
+            # Log metrics regularly
+            if time.monotonic() - last_metrics >= METRICS_INTERVAL:
+                metrics.log_summary()
+                last_metrics = time.monotonic()
+
+            # Correct drift of the online clients, e.g. due to missed events
+            if time.monotonic() >= self.next_reconcile:
+                try:
+                    self.reconcile_clients()
+                except ts3.TS3Error:
+                    logging.exception("Failed to reconcile online clients")
+
+            # Retry deferred verifications, wake up in time for the next one
+            self.process_verification_queue()
+            timeout = min(60.0, max(self.next_reconcile - time.monotonic(), 1.0))
+            if (next_due := self.verification_queue.next_due()) is not None:
+                timeout = min(timeout, max(next_due, 1.0))
+
             try:
-                event: ts3.response.TS3Event = self.ts3c.wait_for_event(timeout=60)
+                event: ts3.response.TS3Event = self.ts3c.wait_for_event(timeout=timeout)
             except ts3.query.TS3TimeoutError:
                 pass  # Ignore wait timeout
             else:
@@ -139,7 +190,9 @@ class Bot:
 
                 self.handle_event(event)
 
-    def handle_event(self, event: ts3.response.TS3Event) -> None:  # noqa: PLR0912
+    def handle_event(  # noqa: PLR0912,PLR0915
+        self, event: ts3.response.TS3Event
+    ) -> None:
         evt = events.Event.from_event(event)
 
         # Drop event silently if invalid
@@ -166,11 +219,38 @@ class Bot:
             if evt.client_type != "0":
                 return
 
-            was_created = self.create_user(evt.id)
-            is_known = self.verify_user(evt.uid, evt.database_id, evt.id)
+            # The event carries everything the join needs
+            self.users[evt.id] = ts3bot.User(
+                id=int(evt.id),
+                db_id=int(evt.database_id),
+                unique_id=evt.uid,
+                nickname=evt.nickname,
+                country=evt.country,
+                total_connections=evt.total_connections,
+                server_groups=evt.server_groups,
+            )
+            is_known = self.run_with_deadline(
+                "join",
+                evt.id,
+                lambda: self.verify_user(
+                    evt.uid,
+                    evt.database_id,
+                    evt.id,
+                    server_group_ids=evt.server_groups,
+                ),
+                notify=False,
+            )
 
-            # Skip next check if user could not be cached
-            if not was_created:
+            # Verification was aborted, don't greet the user either
+            if is_known is None:
+                return
+
+            # Only new users are greeted, ask TS3 if the event lacked the count
+            if (
+                not is_known
+                and evt.total_connections < 0
+                and not self.create_user(evt.id)
+            ):
                 return
 
             # Message user if total_connections is below n and user is new
@@ -187,8 +267,13 @@ class Bot:
 
         elif isinstance(evt, events.ClientLeftView):
             if evt.id in self.users:
+                ts3bot.accounts.discard(self.users[evt.id].unique_id)
                 del self.users[evt.id]
         elif isinstance(evt, events.ClientMoved):
+            # Missed the client's join, look for more drift soon
+            if evt.id not in self.users:
+                self.next_reconcile = 0.0
+
             if evt.channel_id == str(env.channel_id):
                 logging.info("User id:%s joined channel", evt.id)
                 self.send_message(evt.id, "welcome")
@@ -209,7 +294,11 @@ class Bot:
                 if match:
                     valid_command = True
                     try:
-                        command.handle(self, evt, match)
+                        self.run_with_deadline(
+                            command.__name__.rsplit(".", 1)[-1],
+                            evt.id,
+                            lambda: command.handle(self, evt, match),  # noqa: B023
+                        )
                     except ts3.query.TS3QueryError:
                         logging.exception(
                             "Unexpected TS3QueryError in command handler."
@@ -221,6 +310,63 @@ class Bot:
         else:
             logging.warning("Unexpected event: %s", event.data)
 
+    def run_with_deadline(
+        self,
+        name: str,
+        client_id: str,
+        handler: Callable[[], T],
+        notify: bool = True,
+    ) -> T | None:
+        """
+        Runs an event handler with the time budget of `name`. If the budget runs
+        out, the user is told that the API failed instead of blocking the loop.
+
+        :param notify: Whether to send error_api if the deadline was exceeded
+        :return: The handler's result, None if the deadline was exceeded
+        """
+        timeout = env.command_timeouts.get(name, env.command_timeout)
+        try:
+            with deadline.scope(name, timeout) as current:
+                return handler()
+        except deadline.DeadlineExceededError:
+            # Handled below, handlers might also swallow the error themselves
+            pass
+        finally:
+            if current.exceeded:
+                metrics.incr(f"deadline_exceeded.{name}")
+
+        logging.warning("%s exceeded its deadline of %ss", name, timeout)
+        self.session.rollback()
+        if notify:
+            self.send_message(client_id, "error_api")
+        return None
+
+    def reconcile_clients(self) -> None:
+        """
+        Loads all online voice clients with a single clientlist, known clients
+        get their groups and idle time refreshed
+        """
+
+        self.next_reconcile = time.monotonic() + env.online_clients_reconcile_seconds
+        self.users.reconcile(
+            ts3bot.User(
+                id=int(client["clid"]),
+                db_id=int(client["client_database_id"]),
+                unique_id=client["client_unique_identifier"],
+                nickname=client.get("client_nickname", "Unknown"),
+                country=client.get("client_country", ""),
+                total_connections=-1,
+                server_groups=(
+                    [sgid for sgid in client["client_servergroups"].split(",") if sgid]
+                    if "client_servergroups" in client
+                    else None
+                ),
+                idle_time=int(client.get("client_idle_time", -1)),
+            )
+            for client in self.exec_("clientlist", "uid", "country", "groups", "times")
+            if client.get("client_type") == "0"
+        )
+
     def create_user(self, client_id: str) -> bool:
         """
         Caches the user into our local user list, returns False if an error occured or
@@ -250,6 +396,25 @@ class Bot:
 
         return False
 
+    def resolve_server_groups(self, sgids: list[str]) -> list[dict]:
+        """
+        Returns sgid and name of the given server groups, like
+        servergroupsbyclientid. The names are cached, servergrouplist is only
+        queried for unknown groups.
+        """
+        if any(int(sgid) not in self.server_group_names for sgid in sgids):
+            self.server_group_names = {
+                int(group["sgid"]): group["name"]
+                for group in self.exec_("servergrouplist")
+            }
+            # Don't ask again for groups that do not exist (anymore)
+            for sgid in sgids:
+                self.server_group_names.setdefault(int(sgid), "")
+
+        return [
+            {"sgid": sgid, "name": self.server_group_names[int(sgid)]} for sgid in sgids
+        ]
+
     def send_message(
         self,
         recipient: str,
@@ -262,11 +427,12 @@ class Bot:
             return
 
         if is_translation:
-            # Look up user's locale
-            if recipient not in self.users:
-                self.create_user(recipient)
-
-            i18n.set("locale", self.users[recipient].locale)
+            # Look up user's locale, unknown clients most likely left already
+            if recipient in self.users:
+                i18n.set("locale", self.users[recipient].locale)
+            else:
+                metrics.incr("online_clients.miss")
+                i18n.set("locale", "en")
 
             msg = i18n.t(msg, **i18n_kwargs)
 
@@ -278,8 +444,29 @@ class Bot:
                 "Seems like the user I tried to message vanished into thin air"
             )
 
-    def verify_user(
-        self, client_unique_id: str, client_database_id: str, client_id: str
+    def process_verification_queue(self) -> None:
+        """Retries deferred verifications that are due"""
+
+        for pending in self.verification_queue.pop_due():
+            self.run_with_deadline(
+                "join",
+                pending["clid"],
+                lambda: self.verify_user(
+                    pending["uid"],  # noqa: B023
+                    pending["cldbid"],  # noqa: B023
+                    pending["clid"],  # noqa: B023
+                    attempts=pending["attempts"],  # noqa: B023
+                ),
+                notify=False,
+            )
+
+    def verify_user(  # noqa: PLR0911,PLR0912,PLR0913
+        self,
+        client_unique_id: str,
+        client_database_id: str,
+        client_id: str,
+        attempts: int = 0,
+        server_group_ids: list[str] | None = None,
     ) -> bool:
         """
         Verify a user if they are in a known group, otherwise nothing is done.
@@ -288,6 +475,9 @@ class Bot:
         :param client_unique_id: The client's UUID
         :param client_database_id: The database ID
         :param client_id: The client's temporary ID during the session
+        :param attempts: Previous attempts, if this is a deferred verification
+        :param server_group_ids: The client's server groups if known, e.g. from
+                                 the join event, queried otherwise
         :return: True if the user has/had a known group and False if the user is new
         """
 
@@ -314,24 +504,23 @@ class Bot:
             )
             self.send_message(client_id, response)
 
+        # Remember the identity's client, even if it is skipped below. Dormant
+        # accounts are only refreshed rarely by the cycle.
+        models.Identity.record_seen(
+            self.session,
+            {client_unique_id: datetime.datetime.now()},
+            cldbids={client_unique_id: int(client_database_id)},
+        )
+
         # Get all current groups
-        server_groups = self.exec_("servergroupsbyclientid", cldbid=client_database_id)
+        if server_group_ids is not None:
+            server_groups = self.resolve_server_groups(server_group_ids)
+        else:
+            server_groups = self.exec_(
+                "servergroupsbyclientid", cldbid=client_database_id
+            )
 
-        known_groups: list[int] = (
-            [
-                _.group_id
-                for _ in self.session.query(ts3bot.database.models.WorldGroup).options(
-                    load_only(ts3bot.database.models.WorldGroup.group_id)
-                )
-            ]
-            + [
-                _.group_id
-                for _ in self.session.query(ts3bot.database.models.Guild)
-                .filter(ts3bot.database.models.Guild.group_id.isnot(None))
-                .options(load_only(ts3bot.database.models.Guild.group_id))
-            ]
-            + [env.generic_world_id, env.generic_guild_id]
-        )
+        known_groups = ts3bot.managed_groups.get(self.session).known_ids
 
         # Check if user has any known groups
         has_group = False
@@ -354,27 +543,47 @@ class Bot:
         if has_skip_group:
             return True
 
-        # Grab user's account info
-        account = models.Account.get_by_identity(self.session, client_unique_id)
+        # Grab user's account info, usually cached since the last join
+        account: models.Account | None = None
+        snapshot = ts3bot.accounts.get(self.session, client_unique_id)
 
         # User does not exist in DB
-        if not account:
+        if not snapshot:
             revoked("groups_revoked_missing_key")
             return True
 
         # User was checked, don't check again
         if (
-            ts3bot.timedelta_hours(datetime.datetime.today() - account.last_check)
+            ts3bot.timedelta_hours(datetime.datetime.today() - snapshot.last_check)
             < env.on_join_hours
         ):
             return True
 
+        # Key was rejected recently, keep the groups until the next check
+        if snapshot.api_key in ts3bot.api.negative_cache:
+            metrics.incr("api_negative_cache.skipped")
+            return True
+
+        # Don't wait for the rate limiter during a join, try again later instead
+        if ts3bot.api.rate_limiter.fill_level < 1:
+            self.verification_queue.defer(
+                client_unique_id, client_database_id, client_id, attempts
+            )
+            return True
+
+        account = snapshot.load(self.session)
         logging.debug("Checking %s/%s", account, client_unique_id)
 
         try:
-            account.update(self.session)
-            # Sync groups
-            ts3bot.sync_groups(self, client_database_id, account)
+            result = account.update(self.session)
+            # Sync groups, the client's groups did not change since the query above
+            ts3bot.sync_groups(
+                self,
+                client_database_id,
+                account,
+                server_groups=server_groups,
+                update_result=result,
+            )
         except ts3bot.InvalidKeyError:
             revoked("groups_revoked_invalid_key")
         except (
@@ -382,6 +591,9 @@ class Bot:
             ts3bot.RateLimitError,
             ts3bot.ApiErrBadDataError,
         ):
-            logging.exception("Error during API call")
+            logging.warning("Error during API call, deferring", exc_info=True)
+            self.verification_queue.defer(
+                client_unique_id, client_database_id, client_id, attempts
+            )
 
         return True
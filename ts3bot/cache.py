@@ -0,0 +1,129 @@
+"""
+Response cache for unauthenticated API endpoints.
+Entries are kept in an in-memory LRU and optionally in a folder under
+data_path() that is shared between the bot and the cycle.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, TypedDict
+
+from ts3bot import metrics
+
+
+class CacheEntry(TypedDict):
+    data: dict[str, Any]
+    expires: float
+    etag: str | None
+    last_modified: str | None
+
+
+class ResponseCache:
+    def __init__(
+        self, ttls: dict[str, float], size: int, path: Path | None = None
+    ) -> None:
+        """
+        :param ttls: Endpoint prefixes mapped to their TTL in seconds
+        :param size: Maximum amount of entries in memory
+        :param path: Folder for the on-disk tier, disabled if None
+        """
+        self.ttls = ttls
+        self.size = size
+        self.path = path
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl(self, endpoint: str) -> float:
+        """Returns the TTL of an endpoint, 0 if it should not be cached"""
+
+        for prefix, ttl in self.ttls.items():
+            if endpoint.startswith(prefix):
+                return ttl
+        return 0
+
+    def _file(self, endpoint: str) -> Path | None:
+        if not self.path:
+            return None
+        return self.path / f"{hashlib.sha1(endpoint.encode()).hexdigest()}.json"
+
+    def get(self, endpoint: str) -> CacheEntry | None:
+        """Returns the entry of an endpoint, it might be expired already"""
+
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry:
+                self._entries.move_to_end(endpoint)
+                return entry
+
+        if (file := self._file(endpoint)) is None:
+            return None
+
+        try:
+            entry = CacheEntry(**json.loads(file.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError):
+            logging.warning("Ignoring corrupt cache file %s", file)
+            return None
+
+        self._remember(endpoint, entry)
+        return entry
+
+    def put(
+        self,
+        endpoint: str,
+        data: dict[str, Any],
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        entry = CacheEntry(
+            data=data,
+            expires=time.time() + self.ttl(endpoint),
+            etag=etag,
+            last_modified=last_modified,
+        )
+        self._remember(endpoint, entry)
+
+        if (file := self._file(endpoint)) is None:
+            return
+
+        # Write atomically, other processes might be reading the file
+        try:
+            file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=file.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump(entry, fp)
+            os.replace(tmp, file)
+        except OSError:
+            logging.warning("Failed to write cache file %s", file, exc_info=True)
+
+    def refresh(self, endpoint: str, entry: CacheEntry) -> None:
+        """Extends an entry's lifetime after it was revalidated"""
+
+        self.put(endpoint, entry["data"], entry["etag"], entry["last_modified"])
+
+    def _remember(self, endpoint: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[endpoint] = entry
+            self._entries.move_to_end(endpoint)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def is_fresh(entry: CacheEntry) -> bool:
+        return entry["expires"] > time.time()
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return metrics.snapshot("api_cache.")
@@ -0,0 +1,114 @@
+"""
+Circuit breaker for the GW2 API. After too many consecutive server or
+connection errors requests are rejected without touching the API, until a
+single probe request succeeds again.
+"""
+
+import logging
+import threading
+import time
+
+import requests
+
+from ts3bot import metrics
+
+
+class CircuitOpenError(requests.RequestException):
+    """The API is considered down, handled like any other API error"""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"API circuit is open, next probe in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(
+        self, threshold: int = 5, cooldown: float = 30, max_cooldown: float = 300
+    ) -> None:
+        """
+        :param threshold: Consecutive failures until the circuit opens
+        :param cooldown: Seconds until the first probe, doubled on every failed probe
+        :param max_cooldown: Upper bound of the cooldown
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened = 0  # Times the circuit was opened since the last success
+        self._probe_at: float | None = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._probe_at is not None
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe, 0 if requests are allowed"""
+
+        with self._lock:
+            if self._probe_at is None:
+                return 0.0
+            return max(0.0, self._probe_at - time.monotonic())
+
+    def before_request(self) -> None:
+        """
+        Has to be called before each request, lets one probe through once the
+        cooldown has passed
+
+        :raises CircuitOpenError: The circuit is open
+        """
+        with self._lock:
+            if self._probe_at is None:
+                return
+
+            now = time.monotonic()
+            if self._probing or now < self._probe_at:
+                # Check back in a second at the earliest while a probe is running
+                metrics.incr("api_circuit.rejected")
+                raise CircuitOpenError(max(1.0, self._probe_at - now))
+
+            self._probing = True
+            logging.info("Probing the API")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._probe_at is not None:
+                logging.info("API recovered, closing circuit")
+                metrics.incr("api_circuit.closed")
+
+            self._failures = 0
+            self._opened = 0
+            self._probe_at = None
+            self._probing = False
+
+    def record_aborted(self) -> None:
+        """The request neither failed nor succeeded, e.g. its deadline ran out"""
+
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            # Requests that were in flight when the circuit opened don't count
+            if self._probe_at is not None and not self._probing:
+                return
+
+            self._failures += 1
+            if not self._probing and self._failures < self.threshold:
+                return
+
+            cooldown = min(self.max_cooldown, self.cooldown * 2**self._opened)
+            self._opened += 1
+            self._probe_at = time.monotonic() + cooldown
+            self._probing = False
+
+            logging.warning(
+                "API failed %s times in a row, pausing requests for %.0fs",
+                self._failures,
+                cooldown,
+            )
+            metrics.incr("api_circuit.opened")
+            metrics.gauge("api_circuit.cooldown_seconds", cooldown)
@@ -159,6 +159,7 @@ def _linking(  # noqa: PLR0912
             # Update world group
             _filter.group_id = args.group_id
             bot.session.commit()
+        ts3bot.managed_groups.invalidate()
 
         logging.info(
             "Created new WorldGroup for %s (%s) as requested by %s",
@@ -213,6 +214,7 @@ def _linking(  # noqa: PLR0912
         # Set world linking status
         _filter.is_linked = args.choice == "add"
         bot.session.commit()
+        ts3bot.managed_groups.invalidate()
         bot.send_message(
             event.id,
             f"{args.world_id.proper_name} was updated to linked = {_filter.is_linked}.",
@@ -355,6 +357,7 @@ def _guild(  # noqa: PLR0911,PLR0912,PLR0915
 
         guild.group_id = new_group_id
         bot.session.commit()
+        ts3bot.managed_groups.invalidate()
 
         logging.info(
             "Created new guild group %s (%s) for %s as requested by %s",
@@ -492,6 +495,7 @@ def _guild(  # noqa: PLR0911,PLR0912,PLR0915
 
         guild.group_id = None
         bot.session.commit()
+        ts3bot.managed_groups.invalidate()
 
         logging.info(
             "Removed guild group of %s as requested by %s", guild.name, event.uid
@@ -503,28 +507,31 @@ def _download_emblem(guild_id: str) -> BytesIO | None:
 
     logging.debug("Fetching guild emblem of %s", guild_id)
 
-    with requests.Session() as sess:
-        response = sess.get(
+    try:
+        response = ts3bot.api.get(
             f"https://emblem.werdes.net/emblem/{guild_id}/64",
             params={"options": "BackgroundMaximizeAlpha,ForegroundMaximizeAlpha"},
         )
+    except requests.RequestException:
+        logging.warning("Failed to download emblem for %s", guild_id, exc_info=True)
+        return None
+
+    # Request was unsuccessful
+    if response.status_code != 200:  # noqa: PLR2004
+        logging.warning(
+            "Failed to download emblem for %s, response was %s",
+            guild_id,
+            response.status_code,
+        )
+        return None
 
-        # Request was unsuccessful
-        if response.status_code != 200:  # noqa: PLR2004
-            logging.warning(
-                "Failed to download emblem for %s, response was %s",
-                guild_id,
-                response.status_code,
-            )
-            return None
-
-        # Check for Emblem-Status header
-        # https://github.com/werdes/Gw2_GuildEmblems/issues/2
-        if response.headers.get("Emblem-Status") != "OK":
-            logging.info("No emblem found or server-side error")
-            return None
+    # Check for Emblem-Status header
+    # https://github.com/werdes/Gw2_GuildEmblems/issues/2
+    if response.headers.get("Emblem-Status") != "OK":
+        logging.info("No emblem found or server-side error")
+        return None
 
-        return BytesIO(response.content)
+    return BytesIO(response.content)
 
 
 def _upload_file(
@@ -12,8 +12,8 @@ from ts3bot import (
     ApiErrBadDataError,
     InvalidKeyError,
     RateLimitError,
+    api,
     events,
-    fetch_api,
     sync_groups,
 )
 from ts3bot.bot import Bot
@@ -31,7 +31,11 @@ def handle(  # noqa: PLR0912,PLR0915
 
     # Check with ArenaNet's API
     try:
-        account_info = fetch_api("account", api_key=key)
+        account_info = api.fetch(
+            "account",
+            api_key=key,
+            bypass_negative_cache=event.uid in env.admin_whitelist,
+        )
 
         # Grab server info from database
         server_group: models.WorldGroup | None = (
@@ -60,9 +64,7 @@ def handle(  # noqa: PLR0912,PLR0915
                 if linked_identity.identity.guid != event.uid:
                     try:
                         # Get user's DB id
-                        cldbid: str = bot.exec_(
-                            "clientgetdbidfromuid", cluid=event.uid
-                        )[0]["cldbid"]
+                        cldbid = ts3bot.get_cldbid(bot, event.uid)
                     except ts3.TS3Error:
                         logging.error("Failed to get user's dbid", exc_info=True)
                         bot.send_message(event.id, "error_critical")
@@ -71,7 +73,7 @@ def handle(  # noqa: PLR0912,PLR0915
                     force_key_name = f"ts3bot-{cldbid}"
 
                     # Fetch token info
-                    token_info = fetch_api("tokeninfo", api_key=key)
+                    token_info = api.fetch("tokeninfo", api_key=key)
 
                     # Override registration, same as !register
                     if token_info.get("name", "").strip() == force_key_name:
@@ -111,6 +113,7 @@ def handle(  # noqa: PLR0912,PLR0915
                         account.api_key = key
                         account.is_valid = True
                         bot.session.commit()
+                        ts3bot.accounts.invalidate(account.id)
                         bot.send_message(event.id, "registration_exists")
                         return
 
@@ -126,9 +129,7 @@ def handle(  # noqa: PLR0912,PLR0915
                         account.update(bot.session)
                         try:
                             # Get user's DB id
-                            cldbid = bot.exec_("clientgetdbidfromuid", cluid=event.uid)[
-                                0
-                            ]["cldbid"]
+                            cldbid = ts3bot.get_cldbid(bot, event.uid)
 
                             # Sync groups
                             ts3bot.sync_groups(bot, cldbid, account)
@@ -153,7 +154,7 @@ def handle(  # noqa: PLR0912,PLR0915
                 bot.session.commit()
 
                 # Get user's DB id
-                cldbid = bot.exec_("clientgetdbidfromuid", cluid=event.uid)[0]["cldbid"]
+                cldbid = ts3bot.get_cldbid(bot, event.uid)
 
                 # Unlink previous account from identity
                 current_account = models.Account.get_by_identity(bot.session, event.uid)
@@ -179,6 +180,7 @@ def handle(  # noqa: PLR0912,PLR0915
                         )
                     ).update({"is_active": True}, synchronize_session="fetch")
                     bot.session.commit()
+                    ts3bot.accounts.invalidate(account.id)
 
                 # Sync groups
                 sync_groups(bot, cldbid, account)
@@ -6,11 +6,13 @@ from typing import cast
 import requests
 from sqlalchemy.orm.dynamic import AppenderQuery
 
+import ts3bot
 from ts3bot import (
     ApiErrBadDataError,
     InvalidKeyError,
     RateLimitError,
     events,
+    get_cldbid,
     sync_groups,
     timedelta_hours,
 )
@@ -22,26 +24,26 @@ MESSAGE_REGEX = "!guild *([\\w ]+)?"
 USAGE = "!guild [Guild Tag]"
 
 
-def handle(  # noqa: PLR0912,PLR0915
+def handle(  # noqa: PLR0911,PLR0912,PLR0915
     bot: Bot, event: events.TextMessage, match: Match
 ) -> None:
-    cldbid = bot.exec_("clientgetdbidfromuid", cluid=event.uid)[0]["cldbid"]
-
     # Grab user's account
-    account = models.Account.get_by_identity(bot.session, event.uid)
+    snapshot = ts3bot.accounts.get(bot.session, event.uid)
 
-    if not account or not account.is_valid:
+    if not snapshot or not snapshot.is_valid:
         bot.send_message(event.id, "missing_token")
         return
 
     # Saved account is older than x hours or has no guilds
     if (
-        timedelta_hours(datetime.datetime.today() - account.last_check)
+        timedelta_hours(datetime.datetime.today() - snapshot.last_check)
         >= env.on_join_hours
-        or cast(AppenderQuery, account.guilds).count() == 0
+        or len(snapshot.guilds) == 0
     ):
         bot.send_message(event.id, "account_updating")
 
+        account = snapshot.load(bot.session)
+        cldbid = get_cldbid(bot, event.uid)
         try:
             account.update(bot.session)
 
@@ -59,30 +61,27 @@ def handle(  # noqa: PLR0912,PLR0915
             logging.exception("Error during API call")
             bot.send_message(event.id, "error_api")
 
+        snapshot = ts3bot.accounts.get(bot.session, event.uid)
+        if not snapshot:
+            return
+
     # User requested guild removal
     if match.group(1) and match.group(1).lower() == "remove":
-        # Get active guilds
-        has_active_guilds: int = (
-            cast(AppenderQuery, account.guilds)
-            .join(models.Guild)
-            .filter(models.Guild.group_id.isnot(None))
-            .filter(models.LinkAccountGuild.is_active.is_(True))
-            .count()
-        )
-
         # There are no active guilds, no need to remove anything
-        if not has_active_guilds:
+        if not snapshot.active_guild_groups:
             bot.send_message(event.id, "guild_already_removed")
             return
 
         # Remove guilds
+        account = snapshot.load(bot.session)
         cast(AppenderQuery, account.guilds).filter(
             models.LinkAccountGuild.is_active.is_(True)
         ).update({"is_active": False})
         bot.session.commit()
+        ts3bot.accounts.invalidate(account.id)
 
         # Sync groups
-        changes = sync_groups(bot, cldbid, account)
+        changes = sync_groups(bot, get_cldbid(bot, event.uid), account)
         if len(changes["removed"]) > 0:
             bot.send_message(event.id, "guild_removed")
         else:
@@ -90,32 +89,36 @@ def handle(  # noqa: PLR0912,PLR0915
 
         return
 
-    available_guilds = (
-        cast(AppenderQuery, account.guilds)
-        .join(models.Guild)
-        .filter(models.Guild.group_id.isnot(None))
-    )
+    available_guilds = snapshot.guild_groups
 
     # No guild specified
     if not match.group(1):
-        available_guilds = available_guilds.all()
         if len(available_guilds) > 0:
             bot.send_message(
                 event.id,
                 "guild_selection",
-                guilds="\n- ".join([_.guild.tag for _ in available_guilds]),
+                guilds="\n- ".join([_.tag for _ in available_guilds]),
             )
         else:
             bot.send_message(event.id, "guild_unknown")
     else:
         guild = match.group(1).lower()
 
-        selected_guild: models.LinkAccountGuild | None = available_guilds.filter(
-            models.Guild.tag.ilike(guild)
-        ).one_or_none()
+        selected = next((_ for _ in available_guilds if _.tag.lower() == guild), None)
 
         # Guild not found or user not in guild
-        if not selected_guild:
+        if not selected:
+            bot.send_message(
+                event.id, "guild_invalid_selection", timeout=env.on_join_hours
+            )
+            return
+
+        account = snapshot.load(bot.session)
+        selected_guild = bot.session.get(models.LinkAccountGuild, selected.link_id)
+
+        # The snapshot was outdated, e.g. the guild was left meanwhile
+        if not account or not selected_guild:
+            ts3bot.accounts.invalidate(snapshot.account_id, shared=False)
             bot.send_message(
                 event.id, "guild_invalid_selection", timeout=env.on_join_hours
             )
@@ -134,14 +137,13 @@ def handle(  # noqa: PLR0912,PLR0915
                 ).update({"is_active": False})
 
         bot.session.commit()
+        ts3bot.accounts.invalidate(account.id)
 
         # Sync groups
-        changes = sync_groups(bot, cldbid, account)
+        changes = sync_groups(bot, get_cldbid(bot, event.uid), account)
         if selected_guild.is_active and len(changes["added"]):
-            bot.send_message(event.id, "guild_set", guild=selected_guild.guild.name)
+            bot.send_message(event.id, "guild_set", guild=selected.name)
         elif not selected_guild.is_active and len(changes["removed"]):
-            bot.send_message(
-                event.id, "guild_removed_one", guild=selected_guild.guild.name
-            )
+            bot.send_message(event.id, "guild_removed_one", guild=selected.name)
         else:
             bot.send_message(event.id, "guild_error")
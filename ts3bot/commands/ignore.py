@@ -3,7 +3,14 @@ from re import Match
 
 import ts3  # type: ignore
 
-from ts3bot import ApiErrBadDataError, InvalidKeyError, events, fetch_api, sync_groups
+from ts3bot import (
+    ApiErrBadDataError,
+    InvalidKeyError,
+    api,
+    events,
+    get_cldbid,
+    sync_groups,
+)
 from ts3bot.bot import Bot
 from ts3bot.config import env
 from ts3bot.database import models
@@ -17,7 +24,7 @@ def handle(bot: Bot, event: events.TextMessage, match: Match) -> None:
         return
 
     try:
-        json = fetch_api("account", api_key=match.group(1))
+        json = api.fetch("account", api_key=match.group(1), bypass_negative_cache=True)
         account = models.Account.get_by_api_info(
             bot.session, guid=json.get("id", ""), name=json.get("name", "")
         )
@@ -41,9 +48,7 @@ def handle(bot: Bot, event: events.TextMessage, match: Match) -> None:
         if previous_identity:
             # Get cldbid and sync groups
             try:
-                cldbid = bot.exec_(
-                    "clientgetdbidfromuid", cluid=previous_identity.identity.guid
-                )[0]["cldbid"]
+                cldbid = get_cldbid(bot, previous_identity.identity.guid)
 
                 result = sync_groups(bot, cldbid, account, remove_all=True)
 
@@ -8,10 +8,11 @@ from ts3bot import (
     ApiErrBadDataError,
     InvalidKeyError,
     RateLimitError,
+    api,
     events,
-    fetch_api,
 )
 from ts3bot.bot import Bot
+from ts3bot.config import env
 from ts3bot.database import enums, models
 
 MESSAGE_REGEX = "!info \\s*(\\w{8}(-\\w{4}){3}-\\w{20}(-\\w{4}){3}-\\w{12})\\s*"
@@ -20,7 +21,11 @@ USAGE = "!info <API-Key>"
 
 def handle(bot: Bot, event: events.TextMessage, match: Match) -> None:
     try:
-        account = fetch_api("account", api_key=match.group(1))
+        account = api.fetch(
+            "account",
+            api_key=match.group(1),
+            bypass_negative_cache=event.uid in env.admin_whitelist,
+        )
         server = enums.World(account.get("world"))
 
         guilds = (
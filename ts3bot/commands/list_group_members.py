@@ -1,7 +1,7 @@
 from re import Match
 from typing import cast
 
-from ts3bot import events
+from ts3bot import events, get_cldbid
 from ts3bot.bot import Bot
 from ts3bot.config import env
 
@@ -13,7 +13,7 @@ MAX_MESSAGE_SIZE = 1024
 
 
 def handle(bot: Bot, event: events.TextMessage, match: Match) -> None:  # noqa: PLR0912
-    cldbid = bot.exec_("clientgetdbidfromuid", cluid=event.uid)[0]["cldbid"]
+    cldbid = get_cldbid(bot, event.uid)
     user_groups = bot.exec_("servergroupsbyclientid", cldbid=cldbid)
     allowed = False
 
@@ -8,8 +8,8 @@ from ts3bot import (
     ApiErrBadDataError,
     InvalidKeyError,
     RateLimitError,
+    api,
     events,
-    fetch_api,
     transfer_registration,
 )
 from ts3bot.bot import Bot
@@ -33,7 +33,7 @@ def handle(bot: Bot, event: events.TextMessage, match: Match) -> None:
         return
 
     try:
-        json = fetch_api("account", api_key=match.group(2))
+        json = api.fetch("account", api_key=match.group(2), bypass_negative_cache=True)
         account = models.Account.get_or_create(bot.session, json, match.group(2))
         identity: models.Identity = models.Identity.get_or_create(
             bot.session, client_uid
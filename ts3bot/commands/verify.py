@@ -3,7 +3,13 @@ from re import Match
 import requests
 import ts3  # type: ignore
 
-from ts3bot import ApiErrBadDataError, InvalidKeyError, events, sync_groups
+from ts3bot import (
+    ApiErrBadDataError,
+    InvalidKeyError,
+    events,
+    get_cldbid,
+    sync_groups,
+)
 from ts3bot.bot import Bot
 from ts3bot.config import env
 from ts3bot.database import enums, models
@@ -23,8 +29,7 @@ def handle(bot: Bot, event: events.TextMessage, match: Match) -> None:
             cldbid = match.group(1)
             cluid = user[0]["cluid"]
         else:
-            user = bot.exec_("clientgetnamefromuid", cluid=match.group(1))
-            cldbid = user[0]["cldbid"]
+            cldbid = get_cldbid(bot, match.group(1))
             cluid = match.group(1)
     except ts3.query.TS3QueryError:
         bot.send_message(event.id, "user_not_found")
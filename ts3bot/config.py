@@ -114,9 +114,41 @@ class Environment(pydantic.BaseSettings):
     # List of groups whose member should be ignored during join verification
     join_verification_ignore: list[str] = ["Guest"]
 
-    # How long users should not be checked again in the cronjob or on join
+    # How long users should not be checked again by cycle --world, other runs
+    # check accounts when they are due instead
     cycle_hours: float = 48
+    # Accounts are checked again after the time they were stable for, multiplied
+    # by this factor and limited to the bounds in hours
+    cycle_stability_factor: float = 0.25
+    cycle_min_hours: float = 24
+    cycle_max_hours: float = 168
+    # Users that were seen on the server within this many days are active,
+    # accounts of the others are checked every cycle_dormant_hours instead
+    # (0: only when they join)
+    cycle_active_days: float = 30
+    cycle_dormant_hours: float = 720
+    # Amount of online users whose accounts are checked first in each cycle
+    cycle_online_budget: int = 300
+    # Incremental cycles still verify all TS3 clients after this many days
+    cycle_full_sweep_days: float = 7
+    # Accounts that are loaded and checked at a time, finished batches are
+    # released from memory
+    cycle_batch_size: int = 100
+    # The cycle commits its changes after this many accounts or seconds
+    cycle_commit_size: int = 100
+    cycle_commit_seconds: float = 5
     on_join_hours: float = 24
+    # Clients whose accounts did not change are only synced with TS3 after
+    # this many hours, to catch group changes made outside the bot
+    sync_full_hours: float = 24
+
+    # Maximum amount of cached online clients
+    online_clients_size: int = 4096
+    # Seconds between corrections of the online clients via clientlist
+    online_clients_reconcile_seconds: float = 300
+    # Maximum amount and lifetime of cached account snapshots of online clients
+    account_cache_size: int = 4096
+    account_cache_seconds: float = 600
 
     # Allow users to have multiple guilds
     allow_multiple_guilds: bool = False
@@ -129,5 +161,45 @@ class Environment(pydantic.BaseSettings):
     # Invalid API retry amount
     retry_invalid_api_key: int = 5
 
+    # GW2 API base URL, can be pointed at a local stand-in server
+    api_base_url: str = "https://api.guildwars2.com/v2"
+
+    # Amount of concurrent API requests during the cycle
+    api_concurrency: int = 8
+
+    # Kept-alive API connections and request timeouts in seconds
+    api_pool_size: int = 10
+    api_connect_timeout: float = 5
+    api_read_timeout: float = 30
+
+    # Backoff between API retries in seconds, the actual wait is random up to
+    # base * 2^attempt, capped to max. Retry-After is honoured if sent.
+    api_retry_base: float = 1
+    api_retry_max: float = 60
+
+    # Pause API requests after this many consecutive server/connection errors,
+    # the API is probed again after the cooldown (doubled on every failed probe)
+    api_circuit_threshold: int = 5
+    api_circuit_cooldown: float = 30
+    api_circuit_max_cooldown: float = 300
+
+    # Time budget in seconds for handling a command or a join, per command module
+    command_timeout: float = 30
+    command_timeouts: dict[str, float] = {}
+
+    # GW2 API rate limit, shared by the bot and the cycle
+    api_rate_limit: int = 600
+    api_rate_period: float = 60
+
+    # Cache for unauthenticated API responses, TTLs are in seconds per endpoint prefix
+    api_cache_ttls: dict[str, float] = {"guild/": 86400}
+    api_cache_size: int = 1024
+    # Store the cache in the data folder as well, shared by the bot and the cycle
+    api_cache_disk: bool = True
+
+    # Seconds API keys are remembered after the API rejected them, admins bypass it
+    api_negative_cache_ttl: float = 3600
+    api_negative_cache_size: int = 10000
+
 
 env = Environment()
@@ -1,17 +1,47 @@
+import asyncio
 import datetime
+import itertools
+import json
 import logging
-from collections.abc import Iterable
-from typing import Any, cast
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, TypedDict
 
 import requests
 import ts3  # type: ignore
-from sqlalchemy import and_, func, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, or_, select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Query, Session
 
 import ts3bot
+from ts3bot import metrics
 from ts3bot.bot import Bot
 from ts3bot.config import env
 from ts3bot.database import enums, models
+from ts3bot.database.unit_of_work import WriteBatch
+from ts3bot.utils import data_path
+
+
+class GroupMember(TypedDict):
+    uid: str
+    groups: list[dict]
+
+
+class CycleState(TypedDict):
+    # Start of the last completed TS3 pass, clients that connected before
+    # are skipped by incremental runs
+    ts3_verified_at: float
+    # Start of the last completed pass over all clients
+    full_sweep_at: float
+
+
+def load_state(path: Path) -> CycleState:
+    try:
+        return CycleState(**json.loads(path.read_text(encoding="utf-8")))
+    except (OSError, ValueError, TypeError):
+        return CycleState(ts3_verified_at=0, full_sweep_at=0)
 
 
 class Cycle:
@@ -22,6 +52,11 @@ class Cycle:
         verify_linked_worlds: bool,
         verify_ts3: bool,
         verify_world: int | None = None,
+        concurrency: int | None = None,
+        connect: bool = True,
+        by_group: bool = False,
+        incremental: bool = False,
+        online_budget: int | None = None,
     ):
         if any(
             x is None
@@ -29,11 +64,20 @@ class Cycle:
         ):
             raise Exception("Cycle credentials are not set correctly.")
 
-        self.bot = Bot(session, is_cycle=True)
+        self.bot = Bot(session, connect=connect, is_cycle=True)
         self.session = session
         self.verify_all = verify_all
         self.verify_linked_worlds = verify_linked_worlds
         self.verify_ts3 = verify_ts3
+        self.concurrency = concurrency or env.api_concurrency
+        # Requests beyond the pool's size would wait for a connection
+        ts3bot.api.grow_pool(self.concurrency)
+        self.by_group = by_group
+        self.incremental = incremental
+        self.online_budget = (
+            env.cycle_online_budget if online_budget is None else online_budget
+        )
+        self.state_path = data_path("cycle_state.json", create=False)
 
         if verify_world:
             self.verify_world: enums.World | None = enums.World(verify_world)
@@ -85,28 +129,93 @@ class Cycle:
         if not env.allow_multiple_guilds:
             self.fix_user_guilds()
 
+        # Users that are online notice wrong groups first
+        if self.online_budget > 0 and self.bot.ts3c:
+            self.verify_online()
+
         # Run if --ts3 is set or nothing was passed
         if self.verify_ts3 or not (
             self.verify_all or self.verify_linked_worlds or self.verify_world
         ):
-            self.verify_ts3_accounts()
+            if self.by_group:
+                self.verify_ts3_groups()
+            else:
+                self.verify_ts3_accounts()
 
         self.verify_accounts()
 
         # Clean up "empty" guilds
         models.Guild.cleanup(self.session)
 
+        logging.info(
+            "Avoided %s duplicate guild fetches.",
+            metrics.counters["guild_fetch.deduplicated"],
+        )
+        metrics.log_summary()
+
+    def incremental_since(self, state: CycleState) -> float | None:
+        """
+        Returns the timestamp clients have to have connected after to be
+        verified, None if all clients should be verified
+        """
+        if not self.incremental or self.verify_all:
+            return None
+
+        full_sweep_age = time.time() - state["full_sweep_at"]
+        if not state["ts3_verified_at"] or full_sweep_age >= (
+            env.cycle_full_sweep_days * 86400
+        ):
+            logging.info("Last full sweep is too old, verifying all clients")
+            return None
+
+        return state["ts3_verified_at"]
+
     def verify_ts3_accounts(self) -> None:  # noqa: PLR0912
         if not self.bot.ts3c:
             raise ConnectionError("Not connected yet.")
 
+        started = time.time()
+        state = load_state(self.state_path)
+        since = self.incremental_since(state)
+        skipped = 0
+
         # Retrieve users
         users = self.bot.exec_("clientdblist", duration=200)
         start = 0
         while len(users) > 0:
+            # Remember when registered clients were last connected
+            models.Identity.record_seen(
+                self.session,
+                {
+                    user["client_unique_identifier"]: datetime.datetime.fromtimestamp(
+                        int(user["client_lastconnected"])
+                    )
+                    for user in users
+                    if int(user.get("client_lastconnected", 0)) > 0
+                },
+                cldbids={
+                    user["client_unique_identifier"]: int(user["cldbid"])
+                    for user in users
+                },
+            )
+
+            # Skip clients that did not connect since the last run
+            page_size = len(users)
+            if since is not None:
+                users = [
+                    user
+                    for user in users
+                    if int(user.get("client_lastconnected", 0)) >= since
+                ]
+                skipped += page_size - len(users)
+
+            # Resolve the page's accounts at once
+            accounts = models.Account.get_by_identities(
+                self.session, [user["client_unique_identifier"] for user in users]
+            )
+
             for counter, user in enumerate(users):
                 uid = user["client_unique_identifier"]
-                cldbid = user["cldbid"]
 
                 # Skip SQ account
                 if "ServerQuery" in uid:
@@ -116,40 +225,10 @@ class Cycle:
                 if counter % 100 == 0:
                     self.bot.ts3c.send_keepalive()
 
-                # Get user's account
-                account = models.Account.get_by_identity(self.session, uid)
-
-                if not account:
-                    self.revoke(None, cldbid)
-                else:
-                    # User was checked, don't check again
-                    if (
-                        ts3bot.timedelta_hours(
-                            datetime.datetime.today() - account.last_check
-                        )
-                        < env.cycle_hours
-                        and not self.verify_all
-                    ):
-                        continue
-
-                    logging.info("Checking %s/%s", account, uid)
-
-                    try:
-                        account.update(self.session)
-                        # Sync groups
-                        ts3bot.sync_groups(self.bot, cldbid, account)
-                    except ts3bot.InvalidKeyError:
-                        self.revoke(account, cldbid)
-                    except ts3bot.ApiErrBadDataError:
-                        logging.warning(
-                            "Got ErrBadData for this account after multiple attempts."
-                        )
-                    except requests.RequestException:
-                        logging.exception("Error during API call")
-                        raise
+                self.verify_client(uid, user["cldbid"], accounts.get(uid))
 
             # Skip to next user block
-            start += len(users)
+            start += page_size
             try:
                 users = self.bot.exec_("clientdblist", start=start, duration=200)
             except ts3.query.TS3QueryError as e:
@@ -158,10 +237,235 @@ class Cycle:
                     logging.exception("Error retrieving user list")
                 users = []
 
+        # Remember the completed run for the next incremental one
+        state["ts3_verified_at"] = started
+        if since is None:
+            state["full_sweep_at"] = started
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(state), encoding="utf-8")
+
+        if since is not None:
+            logging.info(
+                "Skipped %s clients that did not connect since %s",
+                skipped,
+                datetime.datetime.fromtimestamp(since).isoformat(timespec="seconds"),
+            )
+        metrics.incr("cycle.clients_skipped", skipped)
+
+    def verify_online(self) -> None:
+        """
+        Verifies the accounts of everyone that is currently online, until
+        online_budget accounts were checked with the API
+        """
+        clients = [
+            client
+            for client in self.bot.exec_("clientlist", "uid")
+            if client.get("client_type") == "0"  # Skip query clients
+        ]
+        accounts = models.Account.get_by_identities(
+            self.session, [client["client_unique_identifier"] for client in clients]
+        )
+        logging.info(
+            "%s of %s online clients are registered", len(accounts), len(clients)
+        )
+
+        checked = 0
+        for client in clients:
+            uid = client["client_unique_identifier"]
+            if uid not in accounts:
+                continue
+
+            if checked >= self.online_budget:
+                logging.info("Online budget of %s is used up", self.online_budget)
+                break
+
+            if self.verify_client(uid, client["client_database_id"], accounts[uid]):
+                checked += 1
+
+        metrics.incr("cycle.online_checked", checked)
+
+    def verify_ts3_groups(self) -> None:
+        """
+        Same as verify_ts3_accounts, but only visits clients that hold a managed
+        group. Members are retrieved once per group instead of querying every
+        client's groups, registered clients without any managed group are
+        handled on join instead.
+        """
+        if not self.bot.ts3c:
+            raise ConnectionError("Not connected yet.")
+
+        members = list(self.managed_group_members().items())
+        logging.info("%s clients hold a managed group", len(members))
+
+        for counter, (cldbid, member) in enumerate(members):
+            # Send keepalive and resolve the next accounts at once
+            if counter % 200 == 0:
+                self.bot.ts3c.send_keepalive()
+                accounts = models.Account.get_by_identities(
+                    self.session,
+                    [m["uid"] for _, m in members[counter : counter + 200]],
+                )
+
+            self.verify_client(
+                member["uid"], cldbid, accounts.get(member["uid"]), member["groups"]
+            )
+
+    def managed_group_members(self) -> dict[str, GroupMember]:
+        """
+        Retrieves the members of all groups managed by the bot
+
+        :return: Members by their cldbid
+        """
+        managed_ids = ts3bot.managed_groups.get(self.session).known_ids
+
+        members: dict[str, GroupMember] = {}
+        for group in self.bot.exec_("servergrouplist"):
+            if (
+                int(group["sgid"]) not in managed_ids
+                and group["name"] not in env.additional_guild_groups
+            ):
+                continue
+
+            try:
+                clients = self.bot.exec_(
+                    "servergroupclientlist", "names", sgid=group["sgid"]
+                )
+            except ts3.query.TS3QueryError as e:
+                # Group is empty
+                if e.args[0].error["id"] != "1281":
+                    raise
+                continue
+
+            for client in clients:
+                # Skip SQ accounts
+                if "ServerQuery" in client["client_unique_identifier"]:
+                    continue
+
+                member = members.setdefault(
+                    client["cldbid"],
+                    GroupMember(uid=client["client_unique_identifier"], groups=[]),
+                )
+                member["groups"].append(group)
+
+        return members
+
+    def verify_client(  # noqa: PLR0912
+        self,
+        uid: str,
+        cldbid: str,
+        account: models.Account | None,
+        server_groups: list[dict] | None = None,
+    ) -> bool:
+        """
+        Updates a client's account if necessary and syncs their groups
+
+        :param account: The client's account, see Account.get_by_identities()
+        :param server_groups: The client's current groups, queried if not given
+        :return: Whether the account was checked with the API
+        """
+        if not account:
+            # Whitelisted groups are not part of server_groups, query all of them
+            self.revoke(None, cldbid)
+            return False
+
+        # Account is not due yet, see Account.schedule()
+        if account.next_check_at > datetime.datetime.today() and not self.verify_all:
+            return False
+
+        # Users that were not seen recently are deferred, see verify_accounts()
+        if (
+            not self.verify_all
+            and self.session.query(models.Account.id)
+            .filter(models.Account.id == account.id, self.is_awake())
+            .first()
+            is None
+        ):
+            metrics.incr("cycle.dormant_deferred")
+            return False
+
+        # Key was rejected recently, check again after the TTL
+        if account.api_key in ts3bot.api.negative_cache:
+            metrics.incr("api_negative_cache.skipped")
+            return False
+
+        logging.info("Checking %s/%s", account, uid)
+
+        while True:
+            try:
+                result = account.update(self.session)
+                # Sync groups
+                ts3bot.sync_groups(
+                    self.bot,
+                    cldbid,
+                    account,
+                    server_groups=server_groups,
+                    update_result=result,
+                )
+            except ts3bot.CircuitOpenError as e:
+                # API is down, wait for it instead of aborting
+                logging.warning("API unavailable, pausing for %.0fs", e.retry_after)
+                time.sleep(e.retry_after)
+                if self.bot.ts3c:
+                    self.bot.ts3c.send_keepalive()
+                continue
+            except ts3bot.RateLimitError:
+                # The shared rate limiter is blocked, the retry waits for it
+                logging.warning("API rate limit persists, retrying %s", account.name)
+                if self.bot.ts3c:
+                    self.bot.ts3c.send_keepalive()
+                continue
+            except ts3bot.InvalidKeyError:
+                self.revoke(account, cldbid)
+            except ts3bot.ApiErrBadDataError:
+                logging.warning(
+                    "Got ErrBadData for this account after multiple attempts."
+                )
+            except requests.RequestException:
+                logging.exception("Error during API call, skipping")
+            return True
+
+    @staticmethod
+    def is_active() -> Any:
+        """Whether an account's identity was seen within cycle_active_days"""
+
+        return (
+            select(models.LinkAccountIdentity.id)
+            .join(models.Identity)
+            .where(
+                models.LinkAccountIdentity.account_id == models.Account.id,
+                models.LinkAccountIdentity.is_deleted.is_(False),
+                models.Identity.last_seen
+                >= datetime.datetime.today()
+                - datetime.timedelta(days=env.cycle_active_days),
+            )
+            .exists()
+        )
+
+    @classmethod
+    def is_awake(cls) -> Any:
+        """
+        Whether an account's user is active or its dormant check is due.
+        Accounts of users that were not seen recently are checked less often,
+        or on their next join.
+        """
+
+        is_awake = cls.is_active()
+        if env.cycle_dormant_hours > 0:
+            is_awake = or_(
+                is_awake,
+                models.Account.last_check
+                <= datetime.datetime.today()
+                - datetime.timedelta(hours=env.cycle_dormant_hours),
+            )
+        return is_awake
+
     def verify_accounts(self) -> None:
         """
         Removes users from known groups if no account is known or the account is invalid
         """
+        # Accounts are streamed in this order, it has to be unique
+        order_by: tuple[Any, ...] = (models.Account.id,)
+
         # Update all other accounts
         if self.verify_all:
             # Check all accounts that were not verified just now
@@ -209,24 +513,127 @@ class Cycle:
                 )
             )
         else:
-            # Check all accounts which were not checked <x hours ago
+            # Check all accounts that are due, in the order they became due
             accounts = self.session.query(models.Account).filter(
                 and_(
-                    models.Account.last_check
-                    <= datetime.datetime.today()
-                    - datetime.timedelta(hours=env.cycle_hours),
+                    models.Account.next_check_at <= datetime.datetime.today(),
                     models.Account.is_valid.is_(True),
                 )
             )
+            order_by = (models.Account.next_check_at, models.Account.id)
+
+            is_due = self.is_awake()
+            num_dormant = accounts.filter(~is_due).count()
+            if num_dormant:
+                logging.info("Deferring %s accounts of dormant users", num_dormant)
+            metrics.incr("cycle.dormant_deferred", num_dormant)
+            accounts = accounts.filter(is_due)
 
         num_accounts = accounts.count()
 
-        for idx, account in enumerate(cast(Iterable[models.Account], accounts)):
-            if idx % 100 == 0 or idx - 1 == num_accounts:
+        asyncio.run(
+            self._update_accounts(
+                self.stream_accounts(accounts, order_by, env.cycle_batch_size),
+                num_accounts,
+            )
+        )
+
+    def stream_accounts(
+        self, accounts: Query, order_by: tuple[Any, ...], batch_size: int
+    ) -> Iterator[list[models.Account]]:
+        """
+        Yields the accounts of the query in batches, paginated by the values of
+        order_by of each batch's last account instead of an offset.
+        order_by has to be unique, e.g. end with the primary key.
+        """
+        accounts = accounts.order_by(*order_by)
+        cursor: tuple[Any, ...] | None = None
+        while True:
+            query = accounts
+            if cursor is not None:
+                query = query.filter(tuple_(*order_by) > tuple_(*cursor))
+            batch = query.limit(batch_size).all()
+            if not batch:
+                return
+
+            # Read before the batch is updated, commits expire the attributes
+            cursor = tuple(getattr(batch[-1], column.key) for column in order_by)
+            yield batch
+
+            if len(batch) < batch_size:
+                return
+
+    async def _update_accounts(
+        self, batches: Iterable[list[models.Account]], num_accounts: int
+    ) -> None:
+        """
+        Updates accounts with up to `concurrency` API requests in flight.
+        The workers share one iterator per batch and the database session,
+        writes happen between awaits and are therefore serialized.
+        Finished batches are expunged so that the session does not grow with
+        the amount of accounts. Changes are committed every cycle_commit_size
+        accounts or cycle_commit_seconds instead of after each account.
+        """
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="cycle-api"
+            )
+        )
+        counter = itertools.count()
+        with WriteBatch(
+            self.session, env.cycle_commit_size, env.cycle_commit_seconds
+        ) as write_batch:
+            for batch in batches:
+                iterator = iter(batch)
+                await asyncio.gather(
+                    *(
+                        self._worker(iterator, counter, num_accounts, write_batch)
+                        for _ in range(self.concurrency)
+                    )
+                )
+                # Changes were flushed, the objects are not needed anymore
+                self.session.expunge_all()
+
+    async def _worker(
+        self,
+        iterator: Iterator[models.Account],
+        counter: Iterator[int],
+        num_accounts: int,
+        write_batch: WriteBatch,
+    ) -> None:
+        for account in iterator:
+            idx = next(counter)
+            if idx % 100 == 0 or idx + 1 == num_accounts:
                 logging.info("%s/%s: Checking %s", idx + 1, num_accounts, account.name)
 
             try:
-                account.update(self.session)
+                await self._verify_account(account, write_batch)
+            finally:
+                # Every account counts towards the batch, even if it was skipped
+                write_batch.done()
+
+    async def _verify_account(
+        self, account: models.Account, write_batch: WriteBatch
+    ) -> None:
+        # Key was rejected recently, check again after the TTL
+        if account.api_key in ts3bot.api.negative_cache:
+            metrics.incr("api_negative_cache.skipped")
+            return
+
+        while True:
+            try:
+                await account.update_async(self.session)
+            except ts3bot.CircuitOpenError as e:
+                # API is down, wait for it instead of aborting
+                logging.warning("API unavailable, pausing for %.0fs", e.retry_after)
+                write_batch.commit()
+                await asyncio.sleep(e.retry_after)
+                continue
+            except ts3bot.RateLimitError:
+                # The shared rate limiter is blocked, the retry waits for it
+                logging.warning("API rate limit persists, retrying %s", account.name)
+                write_batch.commit()
+                continue
             except ts3bot.InvalidKeyError:
                 pass
             except ts3bot.ApiErrBadDataError:
@@ -235,5 +642,9 @@ class Cycle:
                     "multiple attempts, ignoring for now."
                 )
             except requests.RequestException:
-                logging.exception("Error during API call")
-                raise
+                # Checked again in the next run
+                logging.exception("Error during API call, skipping")
+            except SQLAlchemyError:
+                # Only this account's changes were rolled back, see savepoint()
+                logging.exception("Failed to save %s, skipping", account.name)
+            break
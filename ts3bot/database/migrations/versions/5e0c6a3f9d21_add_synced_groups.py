@@ -0,0 +1,29 @@
+"""Add synced groups
+
+Revision ID: 5e0c6a3f9d21
+Revises: 81215f7957f8
+Create Date: 2026-10-18 16:02:44.318205
+
+"""
+import sqlalchemy as sa
+from alembic import op  # type: ignore
+
+# revision identifiers, used by Alembic.
+revision = "5e0c6a3f9d21"
+down_revision = "81215f7957f8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "synced_groups",
+        sa.Column("cldbid", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("group_ids", sa.String(length=1024), nullable=False),
+        sa.Column("synced_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("cldbid", name=op.f("pk_synced_groups")),
+    )
+
+
+def downgrade():
+    op.drop_table("synced_groups")
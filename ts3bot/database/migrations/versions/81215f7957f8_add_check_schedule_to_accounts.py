@@ -0,0 +1,61 @@
+"""Add check schedule to accounts
+
+Revision ID: 81215f7957f8
+Revises: c36ba642d9e3
+Create Date: 2026-10-18 13:41:07.902117
+
+"""
+import datetime
+
+import sqlalchemy as sa
+from alembic import op  # type: ignore
+
+from ts3bot.config import env
+
+# revision identifiers, used by Alembic.
+revision = "81215f7957f8"
+down_revision = "c36ba642d9e3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("accounts", sa.Column("next_check_at", sa.DateTime(), nullable=True))
+    op.add_column("accounts", sa.Column("last_change_at", sa.DateTime(), nullable=True))
+
+    # Existing accounts are due when the cycle would have checked them anyway
+    accounts = sa.table(
+        "accounts",
+        sa.column("id", sa.Integer),
+        sa.column("last_check", sa.DateTime),
+        sa.column("next_check_at", sa.DateTime),
+    )
+    connection = op.get_bind()
+    interval = datetime.timedelta(hours=env.cycle_hours)
+    rows = connection.execute(
+        sa.select(accounts.c.id, accounts.c.last_check)
+    ).fetchall()
+    for start in range(0, len(rows), 1000):
+        connection.execute(
+            accounts.update()
+            .where(accounts.c.id == sa.bindparam("account_id"))
+            .values(next_check_at=sa.bindparam("next_check")),
+            [
+                {"account_id": account_id, "next_check": last_check + interval}
+                for account_id, last_check in rows[start : start + 1000]
+            ],
+        )
+
+    with op.batch_alter_table("accounts") as batch_op:
+        batch_op.alter_column(
+            "next_check_at", existing_type=sa.DateTime(), nullable=False
+        )
+    op.create_index(
+        op.f("ix_accounts_next_check_at"), "accounts", ["next_check_at"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_accounts_next_check_at"), table_name="accounts")
+    op.drop_column("accounts", "last_change_at")
+    op.drop_column("accounts", "next_check_at")
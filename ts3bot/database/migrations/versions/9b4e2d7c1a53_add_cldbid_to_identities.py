@@ -0,0 +1,27 @@
+"""Add cldbid to identities
+
+Revision ID: 9b4e2d7c1a53
+Revises: 5e0c6a3f9d21
+Create Date: 2026-10-18 18:21:07.514302
+
+"""
+import sqlalchemy as sa
+from alembic import op  # type: ignore
+
+# revision identifiers, used by Alembic.
+revision = "9b4e2d7c1a53"
+down_revision = "5e0c6a3f9d21"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("identities", sa.Column("cldbid", sa.Integer(), nullable=True))
+    op.create_index(
+        op.f("ix_identities_cldbid"), "identities", ["cldbid"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_identities_cldbid"), table_name="identities")
+    op.drop_column("identities", "cldbid")
@@ -0,0 +1,27 @@
+"""Add last_seen to identities
+
+Revision ID: c36ba642d9e3
+Revises: db168dafe179
+Create Date: 2026-10-18 12:04:51.318204
+
+"""
+import sqlalchemy as sa
+from alembic import op  # type: ignore
+
+# revision identifiers, used by Alembic.
+revision = "c36ba642d9e3"
+down_revision = "db168dafe179"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("identities", sa.Column("last_seen", sa.DateTime(), nullable=True))
+    op.create_index(
+        op.f("ix_identities_last_seen"), "identities", ["last_seen"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_identities_last_seen"), table_name="identities")
+    op.drop_column("identities", "last_seen")
@@ -7,6 +7,7 @@ from .guild import Guild
 from .identity import Identity
 from .link_account_guild import LinkAccountGuild
 from .link_account_identity import LinkAccountIdentity
+from .synced_groups import SyncedGroups
 from .world_group import WorldGroup
 
 if TYPE_CHECKING:
@@ -1,17 +1,18 @@
+import asyncio
 import datetime
 import logging
-from collections.abc import Iterable
 from typing import TYPE_CHECKING, Optional, TypedDict, cast
 
 import requests
-from sqlalchemy import Column, and_, or_, types
-from sqlalchemy.orm import Session, relationship
+from sqlalchemy import Column, and_, case, insert, inspect, or_, types
+from sqlalchemy.orm import Session, joinedload, relationship, selectinload
 from sqlalchemy.orm.dynamic import AppenderQuery
 
 import ts3bot
 from ts3bot.config import env
 from ts3bot.database import enums
 from ts3bot.database.models.base import Base
+from ts3bot.database.unit_of_work import after_commit, commit, savepoint
 
 from .guild import Guild
 from .identity import Identity
@@ -52,10 +53,38 @@ class Account(Base):  # type: ignore
         "LinkAccountIdentity", lazy="dynamic", back_populates="account", uselist=True
     )
 
+    # Read-only views that can be eager-loaded, see get_by_identities()
+    active_guilds = relationship(
+        "LinkAccountGuild",
+        primaryjoin=(
+            "and_(Account.id == LinkAccountGuild.account_id, "
+            "LinkAccountGuild.is_active.is_(True))"
+        ),
+        viewonly=True,
+    )
+    world_group_entry = relationship(
+        "WorldGroup",
+        primaryjoin="foreign(Account.world) == remote(WorldGroup.world)",
+        viewonly=True,
+        uselist=False,
+    )
+
     is_valid = Column(types.Boolean, default=True, nullable=False)
     retries = Column(types.Integer, default=0, nullable=False)
 
     last_check = Column(types.DateTime, default=datetime.datetime.now, nullable=False)
+    next_check_at = Column(
+        types.DateTime,
+        default=datetime.datetime.now,
+        nullable=False,
+        index=True,
+        doc="When the cycle should check the account again, see schedule()",
+    )
+    last_change_at = Column(
+        types.DateTime,
+        nullable=True,
+        doc="Last time a world transfer or guild change was noticed",
+    )
     created_at = Column(types.DateTime, default=datetime.datetime.now, nullable=False)
 
     def __str__(self) -> str:
@@ -65,6 +94,9 @@ class Account(Base):  # type: ignore
         return str(self)
 
     def world_group(self, session: Session) -> Optional["WorldGroup"]:
+        if "world_group_entry" not in inspect(self).unloaded:
+            return cast(WorldGroup | None, self.world_group_entry)
+
         return cast(
             WorldGroup | None,
             session.query(WorldGroup)
@@ -73,6 +105,13 @@ class Account(Base):  # type: ignore
         )
 
     def guild_groups(self) -> list["LinkAccountGuild"]:
+        if "active_guilds" not in inspect(self).unloaded:
+            return [
+                link
+                for link in cast(list[LinkAccountGuild], self.active_guilds)
+                if link.guild.group_id is not None
+            ]
+
         return cast(
             list["LinkAccountGuild"],
             cast(AppenderQuery, self.guilds)
@@ -95,6 +134,31 @@ class Account(Base):  # type: ignore
             .one_or_none(),
         )
 
+    @staticmethod
+    def get_by_identities(session: Session, guids: list[str]) -> dict[str, "Account"]:
+        """
+        Resolves the accounts of multiple identities in one query, their active
+        guilds and world group are loaded as well
+
+        :return: Accounts by identity guid, identities without account are missing
+        """
+        if not guids:
+            return {}
+
+        rows = (
+            session.query(Identity.guid, Account)
+            .select_from(Account)
+            .join(LinkAccountIdentity)
+            .join(Identity)
+            .filter(LinkAccountIdentity.is_deleted.is_(False))
+            .filter(Identity.guid.in_(guids))
+            .options(
+                selectinload(Account.active_guilds).joinedload(LinkAccountGuild.guild),
+                joinedload(Account.world_group_entry),
+            )
+        )
+        return {guid: account for guid, account in rows}
+
     @staticmethod
     def get_by_api_info(session: Session, guid: str, name: str) -> Optional["Account"]:
         # TODO: Remove name after GUID migration
@@ -134,13 +198,20 @@ class Account(Base):  # type: ignore
         """
         Returns an instance based on given information
         """
-        return Account(
+        now = datetime.datetime.now()
+        account = Account(
             guid=account_info.get("id", ""),
             name=account_info.get("name", ""),
             world=enums.World(account_info.get("world")),
             api_key=api_key,
+            last_check=now,
+            created_at=now,
         )
 
+        # The account was just fetched from the API, no need to check it again
+        account.schedule(AccountUpdateDict(transfer=[], guilds=([], [])), now)
+        return account
+
     @property
     def valid_identities(self) -> AppenderQuery:
         return cast(AppenderQuery, self.identities).filter(
@@ -159,11 +230,205 @@ class Account(Base):  # type: ignore
         cast(AppenderQuery, self.guilds).update({"is_active": False})
 
         session.commit()
+        ts3bot.accounts.invalidate(self.id)
+
+    async def update_async(self, session: Session) -> AccountUpdateDict:
+        """
+        Same as update(), but the API request does not block the event loop.
+        Database changes are still applied synchronously, so concurrent updates
+        can share one session.
+
+        :raises InvalidKeyError
+        :raises RateLimitError
+        :raises RequestException
+        """
+        try:
+            account_info = await ts3bot.api.async_limit_fetch(
+                "account", api_key=self.api_key
+            )
+        except ts3bot.InvalidKeyError:
+            with savepoint(session):
+                try:
+                    self._invalid_key()
+                finally:
+                    commit(session)
+                    self._invalidate_snapshots(session)
+            return AccountUpdateDict(transfer=[], guilds=([], []))
+
+        # Fetch unknown guilds concurrently and hand them to update(). Errors are
+        # ignored here, update() requests those guilds again and reports them.
+        guids = account_info.get("guilds", [])
+        known_guids = {
+            guid for guid, in session.query(Guild.guid).filter(Guild.guid.in_(guids))
+        }
+        unknown_guids = [guid for guid in guids if guid not in known_guids]
+        results = await asyncio.gather(
+            *(asyncio.to_thread(Guild.fetch, guid) for guid in unknown_guids),
+            return_exceptions=True,
+        )
+        guild_details = {
+            guid: data
+            for guid, data in zip(unknown_guids, results, strict=True)
+            if isinstance(data, dict)
+        }
+
+        # Only this account's changes are lost if writing them fails
+        with savepoint(session):
+            return self.update(
+                session, account_info=account_info, guild_details=guild_details
+            )
+
+    @staticmethod
+    def check_interval(stable_hours: float) -> float:
+        """
+        Returns the hours until the next check of an account that did not
+        change for stable_hours
+        """
+        return min(
+            env.cycle_max_hours,
+            max(env.cycle_min_hours, stable_hours * env.cycle_stability_factor),
+        )
+
+    def schedule(self, result: AccountUpdateDict, now: datetime.datetime) -> None:
+        """
+        Sets the next check, accounts that changed recently are checked sooner
+        than those that were stable for a long time
 
-    def update(self, session: Session) -> AccountUpdateDict:  # noqa: PLR0912,PLR0915
+        :param result: The result of the current update
+        """
+        if result["transfer"] or any(result["guilds"]):
+            self.last_change_at = now
+
+        stable_since = self.last_change_at or self.created_at or now
+        self.next_check_at = now + datetime.timedelta(
+            hours=self.check_interval(ts3bot.timedelta_hours(now - stable_since))
+        )
+
+    def _invalidate_snapshots(self, session: Session, shared: bool = True) -> None:
+        """
+        Drops the cached snapshots of the account. Other processes drop theirs
+        once the changes are committed, so they can't load the old rows again.
+        """
+        account_id = self.id
+        ts3bot.accounts.invalidate(account_id, shared=False)
+        if shared:
+            after_commit(session, lambda: ts3bot.accounts.publish([account_id]))
+
+    def _invalid_key(self) -> None:
+        """
+        Counts a failed attempt with the saved API key
+
+        :raises InvalidKeyError: The key failed too often, account is now invalid
+        """
+        if self.retries >= env.retry_invalid_api_key:
+            self.is_valid = False
+            logging.info(
+                "%s was invalid after 3 retries, marking as invalid.", self.name
+            )
+            raise ts3bot.InvalidKeyError()
+
+        logging.info(
+            "%s was invalid in this attempt, increasing counter to %s",
+            self.name,
+            self.retries + 1,
+        )
+        self.retries += 1
+
+    def _update_guilds(
+        self,
+        session: Session,
+        guids: list[str],
+        leader_guids: set[str],
+        guild_details: dict[str, dict] | None = None,
+    ) -> tuple[list[str], list[str]]:
+        """
+        Applies the account's current guilds with a constant amount of
+        statements, no matter how many guilds the account is in
+
+        :param guids: GUIDs of the account's guilds
+        :param leader_guids: GUIDs of the guilds the account leads
+        :param guild_details: Already fetched details of unknown guilds by GUID
+        :return: Names of the joined and the left guilds
+        """
+        if self.id is None:
+            session.flush()
+
+        # Current links by guild GUID, in one query
+        links = {
+            guid: (link_id, is_leader, name)
+            for link_id, is_leader, guid, name in session.query(
+                LinkAccountGuild.id, LinkAccountGuild.is_leader, Guild.guid, Guild.name
+            )
+            .join(Guild, LinkAccountGuild.guild_id == Guild.id)
+            .filter(LinkAccountGuild.account_id == self.id)
+        }
+
+        guids_joined = [guid for guid in dict.fromkeys(guids) if guid not in links]
+        guids_left = links.keys() - set(guids)
+
+        # Process guild leaves
+        if guids_left:
+            session.query(LinkAccountGuild).filter(
+                LinkAccountGuild.id.in_([links[guid][0] for guid in guids_left])
+            ).delete(synchronize_session="fetch")
+
+        # Update leader status of the remaining guilds
+        changed = [
+            link_id
+            for guid, (link_id, is_leader, _) in links.items()
+            if guid not in guids_left and is_leader != (guid in leader_guids)
+        ]
+        if changed:
+            leader_ids = [links[guid][0] for guid in leader_guids if guid in links]
+            session.query(LinkAccountGuild).filter(
+                LinkAccountGuild.id.in_(changed)
+            ).update(
+                {
+                    LinkAccountGuild.is_leader: case(
+                        (LinkAccountGuild.id.in_(leader_ids), True), else_=False
+                    )
+                },
+                synchronize_session="fetch",
+            )
+
+        # Process guild joins, unknown guilds are created first
+        guilds_joined: list[str] = []
+        if guids_joined:
+            guilds = {
+                guild.guid: guild
+                for guild in session.query(Guild).filter(Guild.guid.in_(guids_joined))
+            }
+            new_links = []
+            for guid in guids_joined:
+                guild = guilds.get(guid) or Guild.get_or_create(
+                    session, guid, data=(guild_details or {}).get(guid)
+                )
+                guilds_joined.append(guild.name)
+                new_links.append(
+                    {
+                        "account_id": self.id,
+                        "guild_id": guild.id,
+                        "is_leader": guid in leader_guids,
+                        # Set LAGs to active automatically if newly joined
+                        "is_active": env.allow_multiple_guilds
+                        and guild.group_id is not None,
+                    }
+                )
+            session.execute(insert(LinkAccountGuild), new_links)
+
+        return guilds_joined, [links[guid][2] for guid in guids_left]
+
+    def update(
+        self,
+        session: Session,
+        account_info: dict | None = None,
+        guild_details: dict[str, dict] | None = None,
+    ) -> AccountUpdateDict:
         """
         Updates and saves an accounts's detail
 
+        :param account_info: Response of /v2/account, fetched if not given
+        :param guild_details: Already fetched details of unknown guilds by GUID
         :raises InvalidKeyError
         :raises RateLimitError
         :raises RequestException
@@ -171,9 +436,11 @@ class Account(Base):  # type: ignore
         logging.info("Updating account record for %s", self.name)
 
         result: AccountUpdateDict = AccountUpdateDict(transfer=[], guilds=([], []))
+        was_valid = self.is_valid
 
         try:
-            account_info = ts3bot.limit_fetch_api("account", api_key=self.api_key)
+            if account_info is None:
+                account_info = ts3bot.api.limit_fetch("account", api_key=self.api_key)
 
             # TODO: Remove after GUID migration is done
             if not self.guid:
@@ -198,65 +465,12 @@ class Account(Base):  # type: ignore
                 logging.info("%s got renamed to %s", self.name, new_name)
 
             # Update guilds
-            account_guilds = account_info.get("guilds", [])
-            guids_joined: list[str] = []
-            links_left: list[int] = []
-            guilds_left: list[str] = []
-            old_guilds: list[str] = []
-
-            # Collect left guilds
-            link_guild: LinkAccountGuild
-            for link_guild in cast(AppenderQuery, self.guilds):
-                old_guilds.append(link_guild.guild.guid)
-
-                if link_guild.guild.guid not in account_guilds:
-                    links_left.append(link_guild.id)
-                    guilds_left.append(link_guild.guild.name)
-
-            # Collect new guilds
-            guild_guid: str
-            for guild_guid in account_guilds:
-                if guild_guid not in old_guilds:
-                    guids_joined.append(guild_guid)
-
-            # Process guild leaves
-            if len(links_left) > 0:
-                session.query(LinkAccountGuild).filter(
-                    LinkAccountGuild.id.in_(links_left)
-                ).delete(synchronize_session="fetch")
-
-            # Process guild joins
-            guilds_joined = []
-            for guild_guid in guids_joined:
-                guild = Guild.get_or_create(session, guild_guid)
-                guilds_joined.append(guild.name)
-                is_leader = guild.guid in account_info.get("guild_leader", [])
-
-                # Set LAGs to active automatically if newly joined
-                if env.allow_multiple_guilds:
-                    is_active = guild.group_id is not None
-                else:
-                    is_active = False
-
-                LinkAccountGuild.get_or_create(
-                    session,
-                    self,
-                    guild,
-                    is_leader,
-                    is_active=is_active,
-                )
-
-            # Process all current guilds for leader status
-            for link_guild in cast(Iterable[LinkAccountGuild], self.guilds):
-                # Skip new guilds
-                if link_guild.guild.guid in guids_joined:
-                    continue
-
-                # Update leader status
-                link_guild.is_leader = link_guild.guild.guid in account_info.get(
-                    "guild_leader", []
-                )
-
+            guilds_joined, guilds_left = self._update_guilds(
+                session,
+                account_info.get("guilds", []),
+                set(account_info.get("guild_leader", [])),
+                guild_details,
+            )
             result["guilds"] = (guilds_joined, guilds_left)
 
             if len(guilds_joined) > 0:
@@ -265,6 +479,7 @@ class Account(Base):  # type: ignore
                 logging.info("%s left guilds: %s", self.name, guilds_left)
 
             self.last_check = datetime.datetime.now()
+            self.schedule(result, self.last_check)
             self.is_valid = True
             if self.retries > 0:
                 logging.info(
@@ -272,20 +487,15 @@ class Account(Base):  # type: ignore
                 )
                 self.retries = 0
         except ts3bot.InvalidKeyError:
-            if self.retries >= env.retry_invalid_api_key:
-                self.is_valid = False
-                logging.info(
-                    "%s was invalid after 3 retries, marking as invalid.", self.name
-                )
-                raise
-            else:
-                logging.info(
-                    "%s was invalid in this attempt, increasing counter to %s",
-                    self.name,
-                    self.retries + 1,
-                )
-                self.retries += 1
+            self._invalid_key()
         finally:
-            session.commit()
+            commit(session)
+            # Other processes only drop their snapshots if more than the time
+            # of the last check changed
+            self._invalidate_snapshots(
+                session,
+                shared=bool(result["transfer"] or any(result["guilds"]))
+                or self.is_valid != was_valid,
+            )
 
         return result
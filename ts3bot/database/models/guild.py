@@ -3,14 +3,20 @@ import logging
 from typing import TYPE_CHECKING, cast
 
 from sqlalchemy import Column, types
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, relationship
 
 import ts3bot
 from ts3bot.database.models.base import Base
+from ts3bot.database.unit_of_work import commit
+from ts3bot.singleflight import SingleFlight
 
 if TYPE_CHECKING:
     from .link_account_guild import LinkAccountGuild  # noqa: F401
 
+# In-flight guild detail requests
+guild_fetches: SingleFlight[dict] = SingleFlight("guild_fetch")
+
 
 class Guild(Base):  # type: ignore
     """
@@ -37,38 +43,63 @@ class Guild(Base):  # type: ignore
         return str(self)
 
     @staticmethod
-    def get_or_create(session: Session, guid: str, group_id: int = None) -> "Guild":
+    def get_or_create(
+        session: Session, guid: str, group_id: int = None, data: dict | None = None
+    ) -> "Guild":
         """
         Returns existing or inserted instance
         :param session: The current database session
         :param guid: The guild's GUID
         :param group_id: The guild's TS3 group_id, can be empty
+        :param data: The guild's details if already fetched
         """
         instance = session.query(Guild).filter_by(guid=guid).one_or_none()
         if not instance:
             logging.debug("Creating guild %s", guid)
-            instance = Guild.create(guid, group_id=group_id)
-            session.add(instance)
-            session.commit()
+            instance = Guild.create(guid, group_id=group_id, data=data)
+            try:
+                with session.begin_nested():
+                    session.add(instance)
+            except IntegrityError:
+                # Another process inserted the guild in the meantime, reuse it.
+                # A locking read sees the latest committed row instead of the
+                # transaction's snapshot, e.g. on MySQL's REPEATABLE READ.
+                logging.debug("Guild %s was created concurrently", guid)
+                existing = (
+                    session.query(Guild)
+                    .filter_by(guid=guid)
+                    .with_for_update()
+                    .one_or_none()
+                )
+                if not existing:
+                    # The other insert is not visible yet, try again later
+                    raise
+                instance = existing
+                if group_id:
+                    instance.group_id = group_id
+            commit(session)
         else:
             if group_id:
                 instance.group_id = group_id
-            session.commit()
+            commit(session)
 
         return cast(Guild, instance)
 
     @staticmethod
-    def create(guid: str, group_id: int = None) -> "Guild":
+    def create(guid: str, group_id: int = None, data: dict | None = None) -> "Guild":
         """
         Retrieves guild details from the API and returns an instance or
         None if the guild was not found
 
+        :param data: The guild's details if already fetched, skips the request
+
         :raises NotFoundError:
         :raises RateLimitError:
         :raises requests.RequestException:
         """
 
-        data = ts3bot.fetch_api(f"guild/{guid}")
+        if data is None:
+            data = Guild.fetch(guid)
         return Guild(
             guid=guid,
             name=data.get("name", "undefined"),
@@ -76,6 +107,19 @@ class Guild(Base):  # type: ignore
             group_id=group_id,
         )
 
+    @staticmethod
+    def fetch(guid: str) -> dict:
+        """
+        Retrieves the guild's details from the API, concurrent requests for the
+        same guild share one API call
+
+        :raises NotFoundError:
+        :raises RateLimitError:
+        :raises requests.RequestException:
+        """
+
+        return guild_fetches.do(guid, lambda: ts3bot.api.fetch(f"guild/{guid}"))
+
     @staticmethod
     def cleanup(session: Session) -> None:
         """
@@ -97,6 +141,8 @@ class Guild(Base):  # type: ignore
             .delete(synchronize_session="fetch")
         )
         session.commit()
+        if deleted:
+            ts3bot.managed_groups.invalidate()
 
         logging.info(f"Deleted {deleted} empty guilds")
 
@@ -111,7 +157,7 @@ class Guild(Base):  # type: ignore
 
         logging.info("Updating guild record for %s [%s]", self.name, self.tag)
 
-        data = ts3bot.fetch_api(f"guild/{self.guid}")
+        data = ts3bot.api.fetch(f"guild/{self.guid}", revalidate=True)
 
         self.name = data.get("name", self.name)
         self.tag = data.get("tag", self.tag)
@@ -23,6 +23,18 @@ class Identity(Base):  # type: ignore
         "LinkAccountIdentity", lazy="dynamic", back_populates="identity"
     )
 
+    last_seen = Column(
+        types.DateTime,
+        nullable=True,
+        index=True,
+        doc="Last time the identity was connected to the server",
+    )
+    cldbid = Column(
+        types.Integer,
+        nullable=True,
+        index=True,
+        doc="The identity's TS3 client database id",
+    )
     created_at = Column(types.DateTime, default=datetime.datetime.now, nullable=False)
 
     def __str__(self) -> str:
@@ -42,3 +54,29 @@ class Identity(Base):  # type: ignore
             session.add(instance)
             session.commit()
         return cast("Identity", instance)
+
+    @staticmethod
+    def record_seen(
+        session: Session,
+        seen: dict[str, datetime.datetime],
+        cldbids: dict[str, int] | None = None,
+    ) -> None:
+        """
+        Updates last_seen of known identities, older timestamps are ignored
+
+        :param seen: Timestamps by identity guid
+        :param cldbids: Client database ids by identity guid, stored if missing
+        """
+        if not seen:
+            return
+
+        cldbids = cldbids or {}
+        for identity in session.query(Identity).filter(Identity.guid.in_(seen)):
+            timestamp = seen[identity.guid]
+            if identity.last_seen is None or identity.last_seen < timestamp:
+                identity.last_seen = timestamp
+
+            cldbid = cldbids.get(identity.guid)
+            if cldbid is not None and identity.cldbid != cldbid:
+                identity.cldbid = cldbid
+        session.commit()
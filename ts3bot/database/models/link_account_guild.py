@@ -5,6 +5,7 @@ from sqlalchemy import Column, ForeignKey, and_, types
 from sqlalchemy.orm import Session, relationship
 
 from ts3bot.database.models.base import Base
+from ts3bot.database.unit_of_work import commit
 
 if TYPE_CHECKING:
     from .account import Account  # noqa: F401
@@ -74,5 +75,5 @@ class LinkAccountGuild(Base):  # type: ignore
                 account=account, guild=guild, is_leader=is_leader, is_active=is_active
             )
             session.add(instance)
-            session.commit()
+            commit(session)
         return cast("LinkAccountGuild", instance)
@@ -0,0 +1,50 @@
+import datetime
+from typing import cast
+
+from sqlalchemy import Column, types
+from sqlalchemy.orm import Session
+
+from ts3bot.database.models.base import Base
+
+
+class SyncedGroups(Base):  # type: ignore
+    """
+    Managed groups a client had after its last full sync
+    """
+
+    __tablename__ = "synced_groups"
+
+    cldbid = Column(types.Integer, primary_key=True, autoincrement=False)
+    group_ids = Column(
+        types.String(1024),
+        nullable=False,
+        doc="Comma-separated, sorted server group ids",
+    )
+    synced_at = Column(types.DateTime, nullable=False)
+
+    def __str__(self) -> str:
+        return f"<SyncedGroups cldbid={self.cldbid} group_ids={self.group_ids}>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    @property
+    def groups(self) -> set[int]:
+        return {int(sgid) for sgid in self.group_ids.split(",") if sgid}
+
+    @staticmethod
+    def get(session: Session, cldbid: str | int) -> "SyncedGroups | None":
+        return cast(
+            SyncedGroups | None, session.get(SyncedGroups, int(cldbid))  # type: ignore
+        )
+
+    @staticmethod
+    def record(session: Session, cldbid: str | int, groups: set[int]) -> None:
+        """Remembers the client's managed groups, does not commit"""
+
+        instance = SyncedGroups.get(session, cldbid)
+        if not instance:
+            instance = SyncedGroups(cldbid=int(cldbid))
+            session.add(instance)
+        instance.group_ids = ",".join(str(sgid) for sgid in sorted(groups))
+        instance.synced_at = datetime.datetime.now()
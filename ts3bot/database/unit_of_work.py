@@ -0,0 +1,145 @@
+"""
+Batched writes for sessions that update many accounts in a row, e.g. the cycle.
+While a WriteBatch is active, commit() only flushes and the changes of many
+accounts are committed together. Accounts whose changes were not committed
+keep their old next_check_at and are simply checked again after a crash.
+"""
+
+import logging
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from types import TracebackType
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ts3bot import metrics
+
+SESSION_KEY = "write_batch"
+
+
+def commit(session: Session) -> None:
+    """Commits the session, or only flushes it while a WriteBatch is active"""
+
+    if SESSION_KEY in session.info:
+        session.flush()
+    else:
+        session.commit()
+
+
+def after_commit(session: Session, callback: Callable[[], None]) -> None:
+    """
+    Runs the callback once the changes passed to commit() are committed, e.g.
+    to tell other processes about them. While a WriteBatch is active, that is
+    after the batch was committed, and the callback is dropped if the batch is
+    rolled back. Otherwise the changes were committed already.
+    """
+
+    write_batch = session.info.get(SESSION_KEY)
+    if write_batch is None:
+        callback()
+    else:
+        write_batch.callbacks.append(callback)
+
+
+@contextmanager
+def savepoint(session: Session) -> Iterator[None]:
+    """
+    Wraps the writes of one unit in a savepoint while a WriteBatch is active.
+    If writing fails, only this unit's changes are rolled back and the error
+    is raised, the other units of the batch are kept. Changes are kept if any
+    other exception is raised.
+    """
+    if SESSION_KEY not in session.info:
+        yield
+        return
+
+    transaction = session.begin_nested()
+    try:
+        yield
+    except SQLAlchemyError:
+        transaction.rollback()
+        metrics.incr("write_batch.failed")
+        raise
+    except BaseException:
+        transaction.commit()
+        raise
+
+    try:
+        transaction.commit()
+    except SQLAlchemyError:
+        transaction.rollback()
+        metrics.incr("write_batch.failed")
+        raise
+
+
+class WriteBatch:
+    def __init__(self, session: Session, size: int, interval: float) -> None:
+        """
+        :param session: The session whose commits are batched
+        :param size: Commit after this many units, e.g. accounts
+        :param interval: Commit after this many seconds, even if size was not
+                         reached yet
+        """
+        self.session = session
+        self.size = size
+        self.interval = interval
+
+        self.pending = 0
+        self.started_at = time.monotonic()
+        # See after_commit()
+        self.callbacks: list[Callable[[], None]] = []
+
+    def __enter__(self) -> "WriteBatch":
+        self.session.info[SESSION_KEY] = self
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        del self.session.info[SESSION_KEY]
+        if exc_type is None:
+            self.commit()
+        else:
+            self.session.rollback()
+            self.callbacks.clear()
+
+    def done(self) -> None:
+        """Marks a unit as finished, commits if the batch is full or due"""
+
+        self.pending += 1
+        if (
+            self.pending >= self.size
+            or time.monotonic() - self.started_at >= self.interval
+        ):
+            self.commit()
+
+    def commit(self) -> None:
+        """
+        Commits the pending units. If the commit fails, e.g. due to a deadlock,
+        their changes are discarded and they are processed again next time.
+        """
+        callbacks, self.callbacks = self.callbacks, []
+        try:
+            self.session.commit()
+            metrics.incr("write_batch.committed", self.pending)
+        except SQLAlchemyError:
+            logging.exception(
+                "Failed to commit %s batched changes, discarding them", self.pending
+            )
+            self.session.rollback()
+            metrics.incr("write_batch.discarded", self.pending)
+            callbacks = []
+
+        self.pending = 0
+        self.started_at = time.monotonic()
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logging.exception("Failed to run a callback after committing")
@@ -0,0 +1,73 @@
+"""
+Deadlines for event handlers. The bot opens a scope per event, API and
+ServerQuery calls made inside of it cap their waits to the remaining time and
+fail fast once it ran out.
+"""
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import requests
+
+_current: ContextVar["Deadline | None"] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceededError(requests.Timeout):
+    """The handler's time budget ran out, handled like any other API timeout"""
+
+
+class Deadline:
+    def __init__(self, name: str, seconds: float) -> None:
+        self.name = name
+        self.expires = time.monotonic() + seconds
+        self.exceeded = False
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def check(self) -> float:
+        """
+        :return: Remaining seconds
+        :raises DeadlineExceededError: No time is left
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            self.fail()
+        return remaining
+
+    def fail(self) -> None:
+        self.exceeded = True
+        raise DeadlineExceededError(f"Deadline of {self.name} exceeded")
+
+
+@contextmanager
+def scope(name: str, seconds: float) -> Iterator[Deadline]:
+    """Sets a deadline for all calls made within this context"""
+
+    deadline = Deadline(name, seconds)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current() -> Deadline | None:
+    return _current.get()
+
+
+def cap(timeout: float | None) -> float | None:
+    """
+    Limits a timeout to the current deadline, if there is one
+
+    :raises DeadlineExceededError: No time is left
+    """
+    if (deadline := current()) is None:
+        return timeout
+
+    remaining = deadline.check()
+    if timeout is None:
+        return remaining
+    return min(timeout, remaining)
@@ -33,15 +33,30 @@ class ClientEnterView(Event):
     database_id: str = ""
     id: str = ""
     uid: str = ""
+    nickname: str = "Unknown"
+    country: str = ""
+    # Server group ids, None if the event did not contain them
+    server_groups: list[str] | None = None
+    # -1 if the event did not contain it
+    total_connections: int = -1
 
     @staticmethod
     def from_event(event: ts3.response.TS3Event) -> Optional["ClientEnterView"]:
         try:
+            server_groups = event[0].get("client_servergroups")
             return ClientEnterView(
                 id=event[0]["clid"],
                 database_id=event[0]["client_database_id"],
                 uid=event[0]["client_unique_identifier"],
                 client_type=event[0].get("client_type", "42"),
+                nickname=event[0].get("client_nickname", "Unknown"),
+                country=event[0].get("client_country", ""),
+                server_groups=(
+                    [sgid for sgid in server_groups.split(",") if sgid]
+                    if server_groups is not None
+                    else None
+                ),
+                total_connections=event[0].get("client_totalconnections", -1),
             )
         except KeyError:
             logging.warning("Partial event from TS: %s", event.data)
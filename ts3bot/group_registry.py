@@ -0,0 +1,83 @@
+"""
+Process-wide registry of the server groups managed by the bot. Processes share
+a version counter in a file under data_path(), changes made by one process are
+picked up by the others on their next lookup.
+"""
+
+import logging
+import threading
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from ts3bot import metrics
+from ts3bot.config import env
+from ts3bot.database import enums, models
+from ts3bot.shared_version import SharedVersion
+
+
+class ManagedGroups:
+    def __init__(
+        self, world_groups: dict[enums.World, int], guild_groups: dict[str, int]
+    ) -> None:
+        """
+        :param world_groups: Server group ids by world
+        :param guild_groups: Server group ids by guild GUID
+        """
+        self.world_groups = world_groups
+        self.guild_groups = guild_groups
+
+        self.world_ids = frozenset(world_groups.values())
+        self.guild_ids = frozenset(guild_groups.values())
+        # Every server group that marks a client as known
+        self.known_ids = (
+            self.world_ids
+            | self.guild_ids
+            | {env.generic_world_id, env.generic_guild_id}
+        )
+
+
+class GroupRegistry:
+    def __init__(self, path: Path | None = None) -> None:
+        """
+        :param path: File that holds the shared version, memory-only if None
+        """
+        self.path = path
+        self._groups: ManagedGroups | None = None
+        self._loaded_version = -1
+        self._version = SharedVersion(path)
+        self._lock = threading.Lock()
+
+    def version(self) -> int:
+        return self._version.get()
+
+    def get(self, session: Session) -> ManagedGroups:
+        """Returns the managed groups, they are only loaded if they changed"""
+
+        version = self.version()
+        with self._lock:
+            if self._groups is None or version != self._loaded_version:
+                self._groups = ManagedGroups(
+                    world_groups=dict(
+                        session.query(
+                            models.WorldGroup.world, models.WorldGroup.group_id
+                        )
+                    ),
+                    guild_groups=dict(
+                        session.query(models.Guild.guid, models.Guild.group_id).filter(
+                            models.Guild.group_id.isnot(None)
+                        )
+                    ),
+                )
+                self._loaded_version = version
+                metrics.incr("group_registry.loaded")
+            return self._groups
+
+    def invalidate(self) -> None:
+        """Makes all processes reload the groups, call after changing them"""
+
+        with self._lock:
+            self._groups = None
+            self._version.bump()
+
+        logging.debug("Invalidated managed groups")
@@ -0,0 +1,46 @@
+"""
+Process-local counters and gauges, logged at the end of a cycle and
+periodically by the bot.
+"""
+
+import logging
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+counters: Counter[str] = Counter()
+gauges: dict[str, float] = {}
+
+
+def incr(name: str, amount: int = 1) -> None:
+    """Increases a counter"""
+
+    with _lock:
+        counters[name] += amount
+
+
+def gauge(name: str, value: float) -> None:
+    """Sets a gauge to the current value"""
+
+    with _lock:
+        gauges[name] = value
+
+
+def snapshot(prefix: str = "") -> dict[str, float]:
+    """Returns all counters and gauges starting with prefix"""
+
+    with _lock:
+        values: dict[str, float] = {**counters, **gauges}
+    return {k: v for k, v in sorted(values.items()) if k.startswith(prefix)}
+
+
+def reset() -> None:
+    with _lock:
+        counters.clear()
+        gauges.clear()
+
+
+def log_summary() -> None:
+    values = snapshot()
+    if values:
+        logging.info("Metrics: %s", ", ".join(f"{k}={v:g}" for k, v in values.items()))
@@ -0,0 +1,137 @@
+"""
+Negative cache for API keys the API recently rejected as invalid.
+Only SHA-256 fingerprints of the keys are kept, in a JSON file under
+data_path() that is guarded by an flock and shared by the bot and the cycle.
+Lookups only read the file again after another process changed it.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO
+
+from ts3bot import metrics
+
+
+class NegativeCache:
+    def __init__(self, ttl: float, size: int, path: Path | None = None) -> None:
+        """
+        :param ttl: Seconds a rejected key is remembered
+        :param size: Maximum amount of remembered keys, the oldest are dropped first
+        :param path: File that holds the shared state, memory-only if None
+        """
+        self.ttl = ttl
+        self.size = size
+        self.path = path
+        self._entries: dict[str, float] = {}
+        # Modification time and size of the file the entries were read from
+        self._loaded: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(api_key: str) -> str:
+        return hashlib.sha256(api_key.strip().encode()).hexdigest()
+
+    @staticmethod
+    def _read(fp: IO[str]) -> dict[str, float]:
+        fp.seek(0)
+        try:
+            return {k: float(v) for k, v in json.loads(fp.read()).items()}
+        except (ValueError, TypeError, AttributeError):
+            return {}
+
+    def _reload(self) -> None:
+        """Reads the entries again if another process changed the file"""
+
+        if not self.path:
+            return
+
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._entries, self._loaded = {}, None
+            return
+
+        if self._loaded == (stat.st_mtime_ns, stat.st_size):
+            return
+
+        with self.path.open("r", encoding="utf-8") as fp:
+            fcntl.flock(fp, fcntl.LOCK_SH)
+            try:
+                self._entries = self._read(fp)
+                stat = os.fstat(fp.fileno())
+                self._loaded = (stat.st_mtime_ns, stat.st_size)
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _state(self, prune: bool = False) -> Iterator[dict[str, float]]:
+        """Locks and yields the entries, writes them back after"""
+
+        with self._lock:
+            if not self.path:
+                yield self._entries
+                if prune:
+                    self._prune(self._entries)
+                return
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a+", encoding="utf-8") as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+                try:
+                    entries = self._read(fp)
+
+                    yield entries
+
+                    if prune:
+                        self._prune(entries)
+                    fp.seek(0)
+                    fp.truncate()
+                    fp.write(json.dumps(entries))
+                    fp.flush()
+
+                    stat = os.fstat(fp.fileno())
+                    self._entries = entries
+                    self._loaded = (stat.st_mtime_ns, stat.st_size)
+                finally:
+                    fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def _prune(self, entries: dict[str, float]) -> None:
+        now = time.time()
+        for key in [k for k, expires in entries.items() if expires <= now]:
+            del entries[key]
+
+        # Drop the entries that would expire first
+        for key in sorted(entries, key=entries.__getitem__)[: -self.size or None]:
+            del entries[key]
+
+    def __contains__(self, api_key: str) -> bool:
+        """Whether the key was rejected within the TTL, only reads the file"""
+
+        if self.ttl <= 0:
+            return False
+
+        with self._lock:
+            self._reload()
+            expires = self._entries.get(self.fingerprint(api_key))
+        return expires is not None and expires > time.time()
+
+    def add(self, api_key: str) -> None:
+        if self.ttl <= 0:
+            return
+
+        with self._state(prune=True) as entries:
+            entries[self.fingerprint(api_key)] = time.time() + self.ttl
+            metrics.gauge("api_negative_cache.size", len(entries))
+
+    def discard(self, api_key: str) -> None:
+        """Forgets a key, e.g. after the API accepted it again"""
+
+        with self._state() as entries:
+            entries.pop(self.fingerprint(api_key), None)
@@ -0,0 +1,93 @@
+"""
+Registry of the voice clients that are currently online, by their clid. It is
+loaded in bulk via clientlist, kept up to date by events and reconciled with
+clientlist regularly in case an event was missed.
+"""
+
+import logging
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+from ts3bot import metrics
+
+if TYPE_CHECKING:
+    from ts3bot import User
+
+
+class OnlineClients:
+    def __init__(self, size: int) -> None:
+        """
+        :param size: Maximum amount of clients, the oldest entries are dropped
+        """
+        self.size = size
+        self._clients: OrderedDict[str, "User"] = OrderedDict()
+        # The first reconciliation fills the registry, that is no drift
+        self._filled = False
+
+    def __contains__(self, clid: object) -> bool:
+        return clid in self._clients
+
+    def __getitem__(self, clid: str) -> "User":
+        return self._clients[clid]
+
+    def __setitem__(self, clid: str, user: "User") -> None:
+        self._clients[clid] = user
+        self._clients.move_to_end(clid)
+        while len(self._clients) > self.size:
+            self._clients.popitem(last=False)
+            metrics.incr("online_clients.evicted")
+
+    def __delitem__(self, clid: str) -> None:
+        del self._clients[clid]
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def reconcile(self, users: Iterable["User"]) -> tuple[int, int]:
+        """
+        Replaces the registry with the clients that are online right now.
+        Known clients keep their entry, it may hold more details than clientlist,
+        only their server groups and idle time are updated.
+
+        :return: Amount of added and removed clients
+        """
+        current = {str(user.id): user for user in users}
+        removed = [
+            clid
+            for clid, user in self._clients.items()
+            if clid not in current or user.unique_id != current[clid].unique_id
+        ]
+        for clid in removed:
+            del self._clients[clid]
+
+        added = 0
+        changed_groups = 0
+        for clid, user in current.items():
+            if clid not in self._clients:
+                self[clid] = user
+                added += 1
+                continue
+
+            known = self._clients[clid]
+            if user.server_groups is not None:
+                if known.server_groups is not None and set(known.server_groups) != set(
+                    user.server_groups
+                ):
+                    changed_groups += 1
+                known.server_groups = user.server_groups
+            known.idle_time = user.idle_time
+
+        if added or removed or changed_groups:
+            logging.debug(
+                "Reconciled online clients: %s added, %s removed, %s changed groups",
+                added,
+                len(removed),
+                changed_groups,
+            )
+        if self._filled:
+            metrics.incr("online_clients.drift", added + len(removed))
+            metrics.incr("online_clients.group_drift", changed_groups)
+        self._filled = True
+        metrics.gauge("online_clients.size", len(self._clients))
+        return added, len(removed)
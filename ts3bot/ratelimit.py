@@ -0,0 +1,124 @@
+"""
+Token bucket for the GW2 API that is shared between the bot and the cycle.
+The bucket's state lives in a small JSON file under data_path() and every
+access is guarded by an exclusive flock, so all processes on the host draw
+from the same budget.
+"""
+
+import fcntl
+import json
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TypedDict
+
+
+class BucketState(TypedDict):
+    tokens: float
+    updated: float
+    # No tokens are handed out or refilled before this time, see drain()
+    blocked_until: float
+
+
+class TokenBucket:
+    def __init__(self, path: Path, capacity: int, period: float) -> None:
+        """
+        :param path: File that holds the shared state
+        :param capacity: Amount of requests allowed per period
+        :param period: Length of the period in seconds
+        """
+        self.path = path
+        self.capacity = float(capacity)
+        self.period = period
+        self.rate = capacity / period
+
+    @contextmanager
+    def _state(self) -> Iterator[BucketState]:
+        """Locks the state file and yields the refilled state, writes it back after"""
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self.path.open("a+", encoding="utf-8") as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.seek(0)
+                now = time.time()
+                try:
+                    state = BucketState(
+                        **{"blocked_until": 0.0, **json.loads(fp.read())}
+                    )
+                except (ValueError, TypeError):
+                    # Missing or corrupt state, start with a full bucket
+                    state = BucketState(
+                        tokens=self.capacity, updated=now, blocked_until=0.0
+                    )
+
+                # Refill tokens for the time that has passed since the last
+                # access or the end of the block
+                elapsed = max(0.0, now - max(state["updated"], state["blocked_until"]))
+                state["tokens"] = min(
+                    self.capacity, state["tokens"] + elapsed * self.rate
+                )
+                state["updated"] = now
+
+                yield state
+
+                fp.seek(0)
+                fp.truncate()
+                fp.write(json.dumps(state))
+                fp.flush()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    @property
+    def fill_level(self) -> float:
+        """Tokens currently available, negative if callers are queued"""
+
+        with self._state() as state:
+            return state["tokens"]
+
+    def reserve(self, tokens: int = 1, max_wait: float | None = None) -> float | None:
+        """
+        Takes tokens from the bucket, possibly going into debt.
+
+        :param max_wait: Don't take any tokens if the wait would be longer
+        :return: Seconds the caller has to wait before using the tokens, or None
+                 if that would exceed max_wait
+        """
+        with self._state() as state:
+            wait = max(0.0, state["blocked_until"] - state["updated"]) + max(
+                0.0, (tokens - state["tokens"]) / self.rate
+            )
+            if max_wait is not None and wait > max_wait:
+                return None
+
+            state["tokens"] -= tokens
+            return wait
+
+    def acquire(self, tokens: int = 1, max_wait: float | None = None) -> float | None:
+        """
+        Blocks until the requested amount of tokens is available.
+
+        :param max_wait: Return immediately if the wait would be longer
+        :return: Seconds waited, or None if no tokens were taken
+        """
+        wait = self.reserve(tokens, max_wait)
+        if wait:
+            logging.debug("Waiting %.2fs for API rate limit budget", wait)
+            time.sleep(wait)
+        return wait
+
+    def drain(self, block_for: float = 0) -> None:
+        """
+        Empties the bucket, used when the API reports that the limit was hit
+
+        :param block_for: Seconds until any process gets tokens again
+        """
+
+        with self._state() as state:
+            state["tokens"] = min(state["tokens"], 0.0)
+            state["blocked_until"] = max(
+                state["blocked_until"], state["updated"] + block_for
+            )
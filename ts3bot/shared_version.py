@@ -0,0 +1,153 @@
+"""
+Version counters shared by the bot's processes through files under
+data_path(). A process bumps a version after changing data that the others
+keep in memory, they compare it on their next lookup and reload.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import IO
+
+
+class SharedVersion:
+    def __init__(self, path: Path | None = None) -> None:
+        """
+        :param path: File that holds the version, memory-only if None
+        """
+        self.path = path
+        self._local_version = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> int:
+        if not self.path:
+            return self._local_version
+
+        try:
+            return int(self.path.read_text(encoding="utf-8") or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump(self) -> None:
+        with self._lock:
+            self._local_version += 1
+
+            if not self.path:
+                return
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a+", encoding="utf-8") as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+                try:
+                    fp.seek(0)
+                    try:
+                        version = int(fp.read() or 0)
+                    except ValueError:
+                        version = 0
+
+                    fp.seek(0)
+                    fp.truncate()
+                    fp.write(str(version + 1))
+                    fp.flush()
+                finally:
+                    fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+class SharedVersions:
+    def __init__(self, size: int, path: Path | None = None) -> None:
+        """
+        Versions by key, e.g. one per account, so that changing one entry does
+        not invalidate the others. Keys that were never bumped have version 0.
+
+        :param size: Maximum amount of versions, the oldest are dropped first
+        :param path: File that holds the shared versions, memory-only if None
+        """
+        self.size = size
+        self.path = path
+        self._versions: dict[str, int] = {}
+        # Modification time and size of the file the versions were read from
+        self._loaded: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read(fp: IO[str]) -> dict[str, int]:
+        fp.seek(0)
+        try:
+            return {k: int(v) for k, v in json.loads(fp.read()).items()}
+        except (ValueError, TypeError, AttributeError):
+            return {}
+
+    def _reload(self) -> None:
+        """Reads the versions again if another process changed the file"""
+
+        if not self.path:
+            return
+
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._versions, self._loaded = {}, None
+            return
+
+        if self._loaded == (stat.st_mtime_ns, stat.st_size):
+            return
+
+        with self.path.open("r", encoding="utf-8") as fp:
+            fcntl.flock(fp, fcntl.LOCK_SH)
+            try:
+                self._versions = self._read(fp)
+                stat = os.fstat(fp.fileno())
+                self._loaded = (stat.st_mtime_ns, stat.st_size)
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def get_all(self) -> Mapping[str, int]:
+        """
+        Returns the current versions, the mapping is not changed by later
+        bumps. Read it before loading the data the versions guard.
+        """
+
+        with self._lock:
+            self._reload()
+            return self._versions
+
+    def bump(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+
+        with self._lock:
+            if not self.path:
+                self._versions = self._bumped(dict(self._versions), keys)
+                return
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a+", encoding="utf-8") as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+                try:
+                    versions = self._bumped(self._read(fp), keys)
+                    fp.seek(0)
+                    fp.truncate()
+                    fp.write(json.dumps(versions))
+                    fp.flush()
+
+                    stat = os.fstat(fp.fileno())
+                    self._versions = versions
+                    self._loaded = (stat.st_mtime_ns, stat.st_size)
+                finally:
+                    fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def _bumped(self, versions: dict[str, int], keys: list[str]) -> dict[str, int]:
+        # Versions only grow, the newest one is never dropped
+        version = max(versions.values(), default=0) + 1
+        for key in keys:
+            versions.pop(key, None)
+            versions[key] = version
+
+        # Drop the oldest versions, their keys are loaded again once
+        for key in sorted(versions, key=versions.__getitem__)[: -self.size or None]:
+            del versions[key]
+        return versions
@@ -0,0 +1,58 @@
+"""
+Deduplicates concurrent calls for the same key, callers that arrive while a
+call is in flight wait for it and share its result.
+"""
+
+import threading
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+from ts3bot import metrics
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: T | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self, name: str) -> None:
+        """
+        :param name: Prefix for the metrics of this instance
+        """
+        self.name = name
+        self._calls: dict[str, _Call[T]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Runs fn unless a call for key is already in flight, in which case its
+        result is returned (or its exception raised) instead.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            metrics.incr(f"{self.name}.deduplicated")
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result  # type: ignore
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -15,8 +15,13 @@ except pkg_resources.DistributionNotFound:
     VERSION = "unknown"
 
 
-def data_path(path: Path | str, is_folder: bool = False) -> Path:
-    """Return a valid local data path, docker-aware"""
+def data_path(path: Path | str, is_folder: bool = False, create: bool = True) -> Path:
+    """
+    Return a valid local data path, docker-aware
+
+    :param create: Create the folders now, otherwise the caller creates them
+                   on the first write
+    """
 
     if os.environ.get("RUNNING_IN_DOCKER", False):
         _path = Path("/data") / path
@@ -28,7 +33,7 @@ def data_path(path: Path | str, is_folder: bool = False) -> Path:
         folder = _path.parent
 
     # Create folders if necessarey
-    if not folder.exists():
+    if create and not folder.exists():
         os.makedirs(folder, exist_ok=True)
 
     return _path
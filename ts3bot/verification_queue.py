@@ -0,0 +1,109 @@
+"""
+Join verifications that could not be finished because the API was rate-limited
+or failed. They are retried later from the bot's event loop instead of blocking
+it.
+"""
+
+import heapq
+import logging
+import time
+from typing import TypedDict
+
+from ts3bot import metrics
+
+
+class PendingVerification(TypedDict):
+    uid: str
+    cldbid: str
+    clid: str
+    attempts: int
+    queued_at: float
+
+
+class VerificationQueue:
+    def __init__(
+        self, base_delay: float = 30, max_delay: float = 900, max_attempts: int = 5
+    ) -> None:
+        """
+        :param base_delay: Seconds before the first retry, doubled on every attempt
+        :param max_delay: Upper bound of the delay
+        :param max_attempts: Verifications are dropped after this many attempts
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._heap: list[tuple[float, str]] = []
+        self._pending: dict[str, tuple[float, PendingVerification]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def defer(self, uid: str, cldbid: str, clid: str, attempts: int = 0) -> bool:
+        """
+        Queues a verification, a client is only queued once at a time
+
+        :param attempts: Previous attempts of this verification
+        :return: False if the verification was dropped
+        """
+        if attempts >= self.max_attempts:
+            logging.warning(
+                "Dropping verification of cldbid:%s after %s attempts", cldbid, attempts
+            )
+            metrics.incr("verification_queue.dropped")
+            return False
+
+        if cldbid in self._pending:
+            return True
+
+        due = time.monotonic() + min(self.max_delay, self.base_delay * 2**attempts)
+        self._pending[cldbid] = (
+            due,
+            PendingVerification(
+                uid=uid,
+                cldbid=cldbid,
+                clid=clid,
+                attempts=attempts + 1,
+                queued_at=time.monotonic(),
+            ),
+        )
+        heapq.heappush(self._heap, (due, cldbid))
+
+        logging.info(
+            "Deferred verification of cldbid:%s (attempt %s), %s in queue",
+            cldbid,
+            attempts + 1,
+            len(self),
+        )
+        metrics.incr("verification_queue.deferred")
+        metrics.gauge("verification_queue.depth", len(self))
+        return True
+
+    def next_due(self) -> float | None:
+        """Seconds until the next verification is due, None if the queue is empty"""
+
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def pop_due(self) -> list[PendingVerification]:
+        """Removes and returns all verifications that are due"""
+
+        now = time.monotonic()
+        due: list[PendingVerification] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, cldbid = heapq.heappop(self._heap)
+            _, pending = self._pending.pop(cldbid)
+            due.append(pending)
+
+            waited = now - pending["queued_at"]
+            metrics.incr("verification_queue.retried")
+            metrics.gauge("verification_queue.last_wait_seconds", round(waited, 1))
+            logging.info(
+                "Retrying verification of cldbid:%s after %.0fs, %s left in queue",
+                cldbid,
+                waited,
+                len(self),
+            )
+
+        metrics.gauge("verification_queue.depth", len(self))
+        return due